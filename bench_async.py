@@ -0,0 +1,213 @@
+"""
+Compares the sync (WSGI, gunicorn sync workers) and async (ASGI, uvicorn with
+ASYNC_VIEWS) deployments of the public pages and API: throughput and p50/p99
+latency at increasing concurrency.
+
+    python bench_async.py                          # both modes, default paths
+    python bench_async.py --db-latency-ms 20       # simulate a slow database
+    python bench_async.py --modes asgi --concurrency 1,50,200 --requests 3000
+    python bench_async.py --wsgi-url http://host:8000 --asgi-url http://host:8001
+
+Without --*-url the servers are started locally (gunicorn and uvicorn must be
+installed) against the configured database, so load some data first (e.g.
+populate_data.py). --db-latency-ms adds a sleep before every SQL query in the
+servers, which is where the two modes differ: a sync worker is blocked for the
+whole round-trip while the event loop keeps serving other requests.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ['/points-table/', '/bracket/', '/top-scorers/', '/upcoming/', '/api/v1/standings/']
+
+
+# --- Server side: applications with optional simulated database latency ---
+
+def _setup_django(asgi):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tournament_project.settings")
+    os.environ["ASYNC_VIEWS"] = "true" if asgi else "false"
+    latency = float(os.environ.get("BENCH_DB_LATENCY_MS", "0")) / 1000
+    if latency:
+        from django.db.backends import utils
+
+        original = utils.CursorWrapper._execute
+
+        def slow_execute(self, *args, **kwargs):
+            time.sleep(latency)
+            return original(self, *args, **kwargs)
+
+        utils.CursorWrapper._execute = slow_execute
+
+def __getattr__(name):
+    # gunicorn/uvicorn import `bench_async:wsgi_application` / `bench_async:asgi_application`
+    if name == 'wsgi_application':
+        _setup_django(asgi=False)
+        from django.core.wsgi import get_wsgi_application
+        return get_wsgi_application()
+    if name == 'asgi_application':
+        _setup_django(asgi=True)
+        from django.core.asgi import get_asgi_application
+        return get_asgi_application()
+    raise AttributeError(name)
+
+
+# --- Client side: a minimal keep-alive HTTP/1.1 load generator ---
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'connection' and value.strip().lower() == 'close':
+            # gunicorn's sync workers don't keep connections alive
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+async def _client(host, port, paths, counter, latencies, errors):
+    reader = writer = None
+    index = 0
+    while counter[0] > 0:
+        counter[0] -= 1
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode())
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+            if status != 200:
+                errors.append(status)
+                continue
+            latencies.append(time.perf_counter() - started)
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError, IndexError) as exc:
+            errors.append(type(exc).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+async def run_level(url, paths, concurrency, total):
+    parts = urlsplit(url)
+    counter = [total]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(parts.hostname, parts.port or 80, paths, counter, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    return {
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(0.50),
+        'p99': percentile(0.99),
+        'mean': statistics.fmean(latencies) * 1000 if latencies else float('nan'),
+        'errors': len(errors),
+    }
+
+
+# --- Orchestration ---
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} didn't start")
+
+def start_server(mode, workers, db_latency_ms):
+    port = _free_port()
+    env = dict(os.environ, BENCH_DB_LATENCY_MS=str(db_latency_ms))
+    if mode == 'wsgi':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'bench_async:wsgi_application',
+            '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', 'bench_async:asgi_application',
+            '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+        ]
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        _wait_for(port)
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process, f"http://127.0.0.1:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the WSGI (sync) and ASGI (async) deployments.")
+    parser.add_argument('--modes', default='wsgi,asgi', help="Comma-separated: wsgi, asgi")
+    parser.add_argument('--concurrency', default='1,10,50,100', help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS, help="Paths requested round-robin")
+    parser.add_argument('--workers', type=int, default=2, help="Server worker processes per mode")
+    parser.add_argument('--db-latency-ms', type=float, default=0, help="Simulated latency per SQL query")
+    parser.add_argument('--wsgi-url', help="Benchmark a running WSGI server instead of starting one")
+    parser.add_argument('--asgi-url', help="Benchmark a running ASGI server instead of starting one")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    results = []
+    for mode in args.modes.split(','):
+        url = getattr(args, f'{mode}_url')
+        process = None
+        if not url:
+            process, url = start_server(mode, args.workers, args.db_latency_ms)
+        try:
+            # Warm up caches and connections before measuring
+            asyncio.run(run_level(url, args.paths, 4, 4 * len(args.paths)))
+            for level in levels:
+                stats = asyncio.run(run_level(url, args.paths, level, args.requests))
+                results.append((mode, level, stats))
+                print(
+                    f"{mode:4}  c={level:<4} {stats['rps']:8.1f} req/s  p50 {stats['p50']:7.1f} ms  "
+                    f"p99 {stats['p99']:7.1f} ms  errors {stats['errors']}",
+                    flush=True,
+                )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print()
+    print(f"{'mode':<6}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, level, stats in results:
+        print(f"{mode:<6}{level:>6}{stats['rps']:>10.1f}{stats['p50']:>10.1f}{stats['p99']:>10.1f}{stats['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,134 @@
-from django.contrib import admin
-from .models import Tournament, Team, Match, SingleMatch, TopScorer
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.forms.models import BaseInlineFormSet
+from .models import Tournament, Team, TeamAlias, Match, SingleMatch, GoalEvent, TopScorer, RecomputeJob
+from .bracket import BracketConflict, link_bracket
+from .utils import STANDINGS_FIELDS, record_match_change, schedule_rebuild
 
 @admin.register(Tournament)
 class TournamentAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
+    actions = ['link_knockout_rounds']
+
+    @admin.action(description="Link knockout rounds and move winners on")
+    def link_knockout_rounds(self, request, queryset):
+        for tournament in queryset:
+            try:
+                linked = link_bracket(tournament)
+            except BracketConflict as exc:
+                self.message_user(request, f"{tournament}: not linked. {exc.message}", messages.ERROR)
+            else:
+                self.message_user(request, f"{tournament}: {linked} fixture(s) linked to the next round.")
+
+class BracketConflictMixin:
+    """
+    Shows a result (or a deletion) the bracket refuses (see advance_winner)
+    as an error message instead of a 500.
+    """
+
+    def changeform_view(self, request, *args, **kwargs):
+        try:
+            return super().changeform_view(request, *args, **kwargs)
+        except BracketConflict as exc:
+            # The change view's transaction has rolled the save back
+            self.message_user(request, f"Not saved: {exc.message}", messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def delete_view(self, request, *args, **kwargs):
+        try:
+            return super().delete_view(request, *args, **kwargs)
+        except BracketConflict as exc:
+            self.message_user(request, f"Not deleted: {exc.message}", messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def changelist_view(self, request, *args, **kwargs):
+        # The "delete selected" action; the delete runs in one transaction, so nothing is deleted
+        try:
+            return super().changelist_view(request, *args, **kwargs)
+        except BracketConflict as exc:
+            self.message_user(request, f"Not deleted: {exc.message}", messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+class TeamAliasFormSet(BaseInlineFormSet):
+    def clean(self):
+        # Two new rows of one submission aren't in the table yet for TeamAlias.clean to find
+        super().clean()
+        seen = set()
+        for form in self.forms:
+            if not form.cleaned_data or form.cleaned_data.get('DELETE'):
+                continue
+            if form.instance.normalized in seen:
+                form.add_error('alias', "This alias is entered twice (ignoring case and accents).")
+            seen.add(form.instance.normalized)
+
+class TeamAliasInline(admin.TabularInline):
+    model = TeamAlias
+    formset = TeamAliasFormSet
+    extra = 1
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
     list_display = ('name', 'tournament', 'played', 'wins', 'draws', 'losses', 'points')
     list_filter = ('tournament',)
     search_fields = ('name',)
+    # Stats are materialized from finished matches; editing them by hand would drift the table
+    readonly_fields = STANDINGS_FIELDS
+    inlines = [TeamAliasInline]
 
 @admin.register(Match)
-class MatchAdmin(admin.ModelAdmin):
-    list_display = ('team_a', 'team_b', 'round', 'score_a', 'score_b', 'winner')
+class MatchAdmin(BracketConflictMixin, admin.ModelAdmin):
+    list_display = ('team_a', 'team_b', 'round', 'score_a', 'score_b', 'winner', 'next_match')
     list_filter = ('tournament', 'round')
+    raw_id_fields = ('next_match',)
     search_fields = ('team_a__name', 'team_b__name')
 
+class GoalEventInline(admin.TabularInline):
+    model = GoalEvent
+    extra = 1
+    autocomplete_fields = ('team',)
+
 @admin.register(SingleMatch)
-class SingleMatchAdmin(admin.ModelAdmin):
+class SingleMatchAdmin(BracketConflictMixin, admin.ModelAdmin):
     list_display = ('home_team', 'away_team', 'leg', 'match_datetime', 'status')
-    list_filter = ('status', 'leg')
+    list_filter = ('tournament', 'status', 'leg')
     search_fields = ('home_team__name', 'away_team__name')
+    inlines = [GoalEventInline]
+
+    # Keep the stored standings in sync with results entered through the Django admin
+    def save_model(self, request, obj, form, change):
+        def save():
+            super(SingleMatchAdmin, self).save_model(request, obj, form, change)
+            return obj
+        record_match_change(save, obj if change else None)
+
+    def delete_model(self, request, obj):
+        def delete():
+            super(SingleMatchAdmin, self).delete_model(request, obj)
+        record_match_change(delete, obj)
+
+    def delete_queryset(self, request, queryset):
+        tournaments = {m.home_team.tournament for m in queryset.select_related('home_team__tournament')}
+        super().delete_queryset(request, queryset)
+        for tournament in tournaments:
+            schedule_rebuild(tournament)
+
+@admin.register(GoalEvent)
+class GoalEventAdmin(admin.ModelAdmin):
+    list_display = ('player_name', 'team', 'match', 'minute', 'own_goal')
+    list_filter = ('team__tournament', 'own_goal')
+    search_fields = ('player_name', 'team__name')
+    autocomplete_fields = ('team',)
+    raw_id_fields = ('match',)
 
 @admin.register(TopScorer)
 class TopScorerAdmin(admin.ModelAdmin):
     list_display = ('player_name', 'team', 'goals')
-    list_filter = ('team__tournament',)
+    list_filter = ('tournament',)
     search_fields = ('player_name', 'team__name')
+
+@admin.register(RecomputeJob)
+class RecomputeJobAdmin(admin.ModelAdmin):
+    list_display = ('tournament', 'status', 'events', 'created_at', 'started_at', 'finished_at', 'latency')
+    list_filter = ('status', 'tournament')
+    readonly_fields = ('tournament', 'status', 'events', 'created_at', 'started_at', 'finished_at', 'error')
@@ -0,0 +1,279 @@
+import base64
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, renderer_classes
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .bracket import Bracket
+from .cache import acache_api_by_revision, cache_api_by_revision
+from .models import SingleMatch
+from .serializers import (
+    BracketMatchSerializer, SingleMatchSerializer, StandingSerializer, TopScorerSerializer, TournamentSerializer,
+)
+from .utils import aget_tournament, get_tournament, ordered_standings, top_scorers_leaderboard
+
+# Read-only JSON API (v1). Every endpoint serves the current tournament, or the
+# one addressed by slug under /api/v1/tournaments/<slug>/ (see core.urls).
+
+# Query parameters each endpoint reads; the response cache ignores any others
+FIELDS_PARAMS = ('fields',)
+MATCH_LIST_PARAMS = ('fields', 'cursor', 'page_size')
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (match_datetime, pk). Unlike DRF's CursorPagination
+    it copes with matches that have no date yet (they sort last), and every page
+    is one range scan no matter how deep the client has paged.
+    The cursor is an opaque token for the last row of the previous page.
+    """
+    page_size = 20
+    max_page_size = 100
+
+    def __init__(self, descending=False):
+        self.descending = descending
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.size = self.get_page_size(request)
+        position = self.decode_cursor(request.GET.get('cursor'))
+        if position is not None:
+            queryset = queryset.filter(self.after(*position))
+
+        when = F('match_datetime')
+        if self.descending:
+            queryset = queryset.order_by(when.desc(nulls_last=True), '-pk')
+        else:
+            queryset = queryset.order_by(when.asc(nulls_last=True), 'pk')
+        # One extra row tells whether there is a next page
+        return queryset[:self.size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.size
+        rows = rows[:self.size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET.get('page_size', self.page_size))
+        except ValueError:
+            raise ValidationError({'page_size': "Must be an integer."})
+        return max(1, min(size, self.max_page_size))
+
+    def after(self, when, pk):
+        # Rows strictly past (when, pk) in the list order; undated rows come last either way
+        op = 'lt' if self.descending else 'gt'
+        if when is None:
+            return Q(match_datetime__isnull=True, **{f'pk__{op}': pk})
+        return (
+            Q(**{f'match_datetime__{op}': when})
+            | Q(match_datetime=when, **{f'pk__{op}': pk})
+            | Q(match_datetime__isnull=True)
+        )
+
+    def encode_cursor(self, row):
+        when = row.match_datetime.isoformat() if row.match_datetime else None
+        return base64.urlsafe_b64encode(json.dumps([when, row.pk]).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            when, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return (parse_datetime(when) if when else None), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor.")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        # Relative link, so the cached body doesn't depend on the Host header
+        return replace_query_param(self.request.get_full_path(), 'cursor', self.encode_cursor(self.last))
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'results': data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+def api_endpoint(view_func):
+    # Anonymous, JSON-only GET endpoints: the same body for every client, so it can be cached
+    view_func = renderer_classes([JSONRenderer])(view_func)
+    view_func = authentication_classes([])(view_func)
+    view_func = permission_classes([AllowAny])(view_func)
+    return api_view(['GET'])(view_func)
+
+def requested_fields(request, serializer_class):
+    """Parses ?fields=a,b into a list of field names of the serializer, or None for all."""
+    value = request.GET.get('fields')
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(fields) - set(serializer_class.Meta.fields) - set(serializer_class._declared_fields)
+    if unknown:
+        raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}."})
+    return fields
+
+def get_tournament_or_404(request, slug):
+    tournament = get_tournament(request._request, slug)
+    if tournament is None:
+        raise NotFound("Tournament not found.")
+    return tournament
+
+async def aget_tournament_or_404(request, slug):
+    tournament = await aget_tournament(request, slug)
+    if tournament is None:
+        raise NotFound("Tournament not found.")
+    return tournament
+
+@cache_api_by_revision('tournament')
+@api_endpoint
+def tournament_detail(request, slug=None):
+    tournament = get_tournament_or_404(request, slug)
+    return Response(TournamentSerializer(tournament).data)
+
+@cache_api_by_revision('standings', FIELDS_PARAMS)
+@api_endpoint
+def standings(request, slug=None):
+    tournament = get_tournament_or_404(request, slug)
+    return Response(standings_data(request, list(ordered_standings(tournament))))
+
+@cache_api_by_revision('bracket', FIELDS_PARAMS)
+@api_endpoint
+def bracket(request, slug=None):
+    tournament = get_tournament_or_404(request, slug)
+    return Response(bracket_data(request, Bracket.for_tournament(tournament)))
+
+@cache_api_by_revision('upcoming', MATCH_LIST_PARAMS)
+@api_endpoint
+def upcoming_matches(request, slug=None):
+    return _match_list(request, slug, 'UPCOMING')
+
+@cache_api_by_revision('finished', MATCH_LIST_PARAMS)
+@api_endpoint
+def finished_matches(request, slug=None):
+    return _match_list(request, slug, 'FINISHED')
+
+@cache_api_by_revision('scorers', FIELDS_PARAMS)
+@api_endpoint
+def top_scorers(request, slug=None):
+    tournament = get_tournament_or_404(request, slug)
+    scorers = top_scorers_leaderboard(tournament, settings.TOP_SCORERS_LIMIT)
+    return Response(scorers_data(request, scorers))
+
+def _match_list(request, slug, status):
+    tournament = get_tournament_or_404(request, slug)
+    paginator = KeysetPagination(descending=status == 'FINISHED')
+    page = paginator.paginate_queryset(match_list_queryset(tournament, status), request)
+    return Response(match_list_data(request, paginator, page))
+
+# Serialization shared by the sync views above and the async ones below
+
+def standings_data(request, teams):
+    for position, team in enumerate(teams, start=1):
+        team.position = position
+    fields = requested_fields(request, StandingSerializer)
+    return {'results': StandingSerializer(teams, many=True, fields=fields).data}
+
+def bracket_data(request, tree):
+    fields = requested_fields(request, BracketMatchSerializer)
+    rounds = [
+        {
+            'code': column.code,
+            'label': column.label,
+            'matches': BracketMatchSerializer(column.matches, many=True, fields=fields).data,
+        }
+        for column in tree.columns
+        if column.matches
+    ]
+    return {'rounds': rounds}
+
+def match_list_queryset(tournament, status):
+    return (
+        SingleMatch.objects.filter(tournament=tournament, status=status)
+        .select_related('home_team', 'away_team', 'fixture')
+    )
+
+def match_list_data(request, paginator, page):
+    # Upcoming: soonest first; finished: most recent first (see KeysetPagination)
+    fields = requested_fields(request, SingleMatchSerializer)
+    return paginator.get_paginated_data(SingleMatchSerializer(page, many=True, fields=fields).data)
+
+def scorers_data(request, scorers):
+    fields = requested_fields(request, TopScorerSerializer)
+    return {'results': TopScorerSerializer(scorers, many=True, fields=fields).data}
+
+# --- Async variants (ASYNC_VIEWS, see core.urls) ---
+# DRF has no async views, so these are plain Django async views producing the
+# same JSON bytes, with DRF exceptions turned into the same error responses.
+
+def async_api_endpoint(view_func):
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        try:
+            data = await view_func(request, *args, **kwargs)
+            status = 200
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            status = exc.status_code
+        return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+    return wrapper
+
+@acache_api_by_revision('tournament')
+@async_api_endpoint
+async def tournament_detail_async(request, slug=None):
+    tournament = await aget_tournament_or_404(request, slug)
+    return TournamentSerializer(tournament).data
+
+@acache_api_by_revision('standings', FIELDS_PARAMS)
+@async_api_endpoint
+async def standings_async(request, slug=None):
+    tournament = await aget_tournament_or_404(request, slug)
+    return standings_data(request, [team async for team in ordered_standings(tournament)])
+
+@acache_api_by_revision('bracket', FIELDS_PARAMS)
+@async_api_endpoint
+async def bracket_async(request, slug=None):
+    tournament = await aget_tournament_or_404(request, slug)
+    return bracket_data(request, await Bracket.afor_tournament(tournament))
+
+async def _match_list_async(request, slug, status):
+    tournament = await aget_tournament_or_404(request, slug)
+    paginator = KeysetPagination(descending=status == 'FINISHED')
+    page = await paginator.apaginate_queryset(match_list_queryset(tournament, status), request)
+    return match_list_data(request, paginator, page)
+
+@acache_api_by_revision('upcoming', MATCH_LIST_PARAMS)
+@async_api_endpoint
+async def upcoming_matches_async(request, slug=None):
+    return await _match_list_async(request, slug, 'UPCOMING')
+
+@acache_api_by_revision('finished', MATCH_LIST_PARAMS)
+@async_api_endpoint
+async def finished_matches_async(request, slug=None):
+    return await _match_list_async(request, slug, 'FINISHED')
+
+@acache_api_by_revision('scorers', FIELDS_PARAMS)
+@async_api_endpoint
+async def top_scorers_async(request, slug=None):
+    tournament = await aget_tournament_or_404(request, slug)
+    scorers = [scorer async for scorer in top_scorers_leaderboard(tournament, settings.TOP_SCORERS_LIMIT)]
+    return scorers_data(request, scorers)
@@ -0,0 +1,248 @@
+from collections import defaultdict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .live import publish_bracket
+from .models import Match, SingleMatch, Team
+from .revisions import bump_revision
+
+# Round codes from the first round to the final, e.g. ['R256', ..., 'R16', 'QF', 'SF', 'F']
+ROUND_ORDER = [code for code, label in Match.ROUND_CHOICES]
+ROUND_LABELS = dict(Match.ROUND_CHOICES)
+
+BracketRound = namedtuple('BracketRound', 'code label matches')
+
+def round_code(entrants):
+    """Round code for a round played by `entrants` teams: 2 -> 'F', 8 -> 'QF', 64 -> 'R64'."""
+    code = {2: 'F', 4: 'SF', 8: 'QF'}.get(entrants, f"R{entrants}")
+    if code not in ROUND_LABELS:
+        raise ValueError(f"No knockout round for {entrants} teams")
+    return code
+
+class Bracket:
+    """
+    A tournament's knockout tree, built in memory from a single load of its fixtures.
+
+    Feeders of a fixture are the matches whose next_match points at it, in pk
+    order: the first one's winner plays as team_a, the second as team_b (see
+    advance_winner). Matches of each round come out in bracket order, so the
+    two feeders of a fixture are always adjacent in the column before it.
+    """
+
+    def __init__(self, matches):
+        matches = sorted(matches, key=lambda m: m.pk)
+        by_pk = {m.pk: m for m in matches}
+        self.feeders = defaultdict(list)
+        roots = []
+        for match in matches:
+            if match.next_match_id in by_pk:
+                # Point next_match at the loaded fixture so cards can follow it without a query
+                Match.next_match.field.set_cached_value(match, by_pk[match.next_match_id])
+                self.feeders[match.next_match_id].append(match)
+            else:
+                roots.append(match)
+
+        # Pre-order walk from the final down, so each round fills left to right
+        roots.sort(key=lambda m: (-self.depth_of(m.round), m.pk))
+        self.rounds = defaultdict(list)
+        stack = roots[::-1]
+        while stack:
+            match = stack.pop()
+            self.rounds[match.round].append(match)
+            stack.extend(reversed(self.feeders[match.pk]))
+
+    @staticmethod
+    def queryset(tournament):
+        """
+        Everything a bracket card shows in two queries, whatever the size:
+        fixtures with their teams and winner, and all their legs as `match.legs`.
+        """
+        legs = Prefetch('single_matches', queryset=SingleMatch.objects.order_by('leg', 'pk'), to_attr='legs')
+        return (
+            Match.objects.filter(tournament=tournament)
+            .select_related('team_a', 'team_b', 'winner')
+            .prefetch_related(legs)
+        )
+
+    @classmethod
+    def for_tournament(cls, tournament):
+        return cls(cls.queryset(tournament))
+
+    @classmethod
+    async def afor_tournament(cls, tournament):
+        return cls([match async for match in cls.queryset(tournament)])
+
+    @staticmethod
+    def depth_of(code):
+        return ROUND_ORDER.index(code) if code in ROUND_LABELS else -1
+
+    @property
+    def columns(self):
+        """
+        Rounds to render, from the first round played (Round of 16 at the
+        latest, so an empty bracket still shows its shape) up to the final.
+        """
+        played = [self.depth_of(code) for code in self.rounds if code in ROUND_LABELS]
+        first = min(played + [ROUND_ORDER.index('R16')])
+        return [
+            BracketRound(code, ROUND_LABELS[code], self.rounds.get(code, []))
+            for code in ROUND_ORDER[first:]
+        ]
+
+def feeder_slot(match):
+    # First feeder (by pk) of the next fixture fills team_a, the second team_b
+    feeder_ids = list(
+        Match.objects.filter(next_match_id=match.next_match_id).order_by('pk').values_list('pk', flat=True)[:2]
+    )
+    if match.pk not in feeder_ids:
+        return None
+    return 'team_a' if feeder_ids.index(match.pk) == 0 else 'team_b'
+
+class BracketConflict(ValidationError):
+    """
+    A corrected result would change who went through to a fixture whose legs
+    have already been played. Raised before anything is written; the caller's
+    transaction rolls back the result that caused it.
+    """
+
+def advance_winner(match):
+    """
+    Puts the winner of `match` (or TBD if it has none) into its slot of
+    next_match and brings that fixture's unplayed legs in line. Called from
+    Match.save, so a corrected result moves on through the later rounds too.
+    Once the next fixture has finished legs its teams are fixed: changing one
+    raises BracketConflict instead of handing the new team results it never
+    played. Returns True if the next fixture changed.
+    """
+    if not match.next_match_id:
+        return False
+    slot = feeder_slot(match)
+    if slot is None:
+        return False
+
+    with transaction.atomic():
+        next_match = Match.objects.select_for_update().get(pk=match.next_match_id)
+        previous = getattr(next_match, f"{slot}_id")
+        if previous == match.winner_id:
+            return False
+        if previous is not None and SingleMatch.objects.filter(fixture=next_match, status='FINISHED').exists():
+            team = Team.objects.filter(pk=previous).first()
+            raise BracketConflict(
+                f"{team} has already played in the {ROUND_LABELS.get(next_match.round, next_match.round)} "
+                f"(fixture #{next_match.pk}); correct or delete those results first."
+            )
+        # Nothing has been played with the new pairing: start the fixture from scratch
+        for name in ('score_a', 'score_b', 'score_leg1_a', 'score_leg1_b', 'score_leg2_a', 'score_leg2_b'):
+            setattr(next_match, name, 0)
+        next_match.winner_id = None
+        setattr(next_match, f"{slot}_id", match.winner_id)
+        next_match.save()
+        sync_legs(next_match)
+        publish_bracket(next_match)
+    return True
+
+def sync_legs(fixture):
+    """
+    Creates the SingleMatch legs of a fixture once both teams are known (one leg
+    for the final, two otherwise), and re-points or removes legs that haven't
+    been played yet when its teams change. Finished legs are left alone.
+    """
+    wanted = {}
+    if fixture.team_a_id and fixture.team_b_id:
+        wanted[1] = (fixture.team_a_id, fixture.team_b_id)
+        if fixture.round != 'F':
+            wanted[2] = (fixture.team_b_id, fixture.team_a_id)
+
+    existing = {m.leg: m for m in SingleMatch.objects.filter(fixture=fixture)}
+    for leg, single_match in existing.items():
+        if single_match.status != 'UPCOMING':
+            continue
+        if leg not in wanted:
+            single_match.delete()
+        elif (single_match.home_team_id, single_match.away_team_id) != wanted[leg]:
+            single_match.home_team_id, single_match.away_team_id = wanted[leg]
+            single_match.save(update_fields=['home_team', 'away_team'])
+    for leg, (home_id, away_id) in wanted.items():
+        if leg not in existing:
+            SingleMatch.objects.create(
+                fixture=fixture, home_team_id=home_id, away_team_id=away_id, leg=leg, tournament_id=fixture.tournament_id,
+            )
+
+@transaction.atomic
+def create_bracket(tournament, teams):
+    """
+    Creates the whole knockout tree for `teams` (a power of two, up to 256):
+    the first round with its legs, and empty fixtures for every later round
+    linked through next_match. Teams are paired in the order given.
+    One bulk insert per round.
+    """
+    teams = list(teams)
+    entrants = len(teams)
+    if entrants < 2 or entrants & (entrants - 1):
+        raise ValueError("A knockout bracket needs a power of two teams")
+
+    # Build from the final outwards; each level lists its fixtures left to right
+    level = Match.objects.bulk_create([Match(tournament=tournament, round='F')])
+    size = 2
+    while size < entrants:
+        size *= 2
+        level = Match.objects.bulk_create([
+            Match(tournament=tournament, round=round_code(size), next_match=parent)
+            for parent in level for _ in range(2)
+        ])
+
+    for match, (team_a, team_b) in zip(level, zip(teams[::2], teams[1::2])):
+        match.team_a, match.team_b = team_a, team_b
+    Match.objects.bulk_update(level, ['team_a', 'team_b'])
+
+    legs = [SingleMatch(fixture=m, home_team=m.team_a, away_team=m.team_b, leg=1, tournament=tournament) for m in level]
+    if entrants > 2:
+        legs += [
+            SingleMatch(fixture=m, home_team=m.team_b, away_team=m.team_a, leg=2, tournament=tournament)
+            for m in level
+        ]
+    SingleMatch.objects.bulk_create(legs)
+    # Bulk writes skip the save signals
+    bump_revision(tournament.pk)
+    return level
+
+@transaction.atomic
+def link_bracket(tournament):
+    """
+    Wires up fixtures that were entered round by round without next_match:
+    fixture i of a round feeds fixture i // 2 of the next, in pk order. Missing
+    later rounds are created empty, then existing winners are moved on.
+    Returns the number of fixtures linked.
+    """
+    rounds = defaultdict(list)
+    for match in Match.objects.filter(tournament=tournament).order_by('pk'):
+        rounds[match.round].append(match)
+    played = [code for code in ROUND_ORDER if rounds.get(code)]
+    if not played:
+        return 0
+
+    linked = []
+    codes = ROUND_ORDER[ROUND_ORDER.index(played[0]):]
+    for code, next_code in zip(codes, codes[1:]):
+        current, following = rounds[code], rounds[next_code]
+        expected = (len(current) + 1) // 2
+        if not following:
+            following = rounds[next_code] = Match.objects.bulk_create(
+                [Match(tournament=tournament, round=next_code) for _ in range(expected)]
+            )
+        if len(following) != expected:
+            # Not a regular bracket from here on; leave it to be linked by hand
+            break
+        for index, match in enumerate(current):
+            if match.next_match_id is None:
+                match.next_match = following[index // 2]
+                linked.append(match)
+    Match.objects.bulk_update(linked, ['next_match'])
+
+    for match in linked:
+        if match.winner_id:
+            advance_winner(match)
+    bump_revision(tournament.pk)
+    return len(linked)
@@ -0,0 +1,281 @@
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .utils import aget_tournament, get_tournament
+
+def is_htmx(request):
+    return request.headers.get('HX-Request') == 'true'
+
+def page_cache_key(view_name, tournament, fragment=False, latest=False, slug=None, variant='-'):
+    """
+    latest=True names the slot holding the most recently rendered revision.
+    The slug is part of the key because a tournament's pages link within the
+    URL space they were requested from (/... or /t/<slug>/...); `variant` is
+    the page_variant of the request.
+    """
+    tournament_id = tournament.pk if tournament else 0
+    revision = 'latest' if latest else (tournament.revision if tournament else 0)
+    kind = 'fragment' if fragment else 'page'
+    scope = slug or '-'
+    return f"core:{settings.PAGE_CACHE_SALT}:{view_name}:{kind}:{tournament_id}:{scope}:{variant}:{revision}"
+
+def query_variant(request, params):
+    # Only the parameters the view reads, in a fixed order: any other ones would
+    # let every made-up query string fill the cache with its own entry
+    return urlencode([(name, request.GET.getlist(name)) for name in sorted(params) if name in request.GET], doseq=True)
+
+def page_variant(request, params=()):
+    # The view's query parameters (date window, cursor, team) and the local date
+    # (default windows start today) change what a page shows without a new revision
+    query = query_variant(request, params)
+    return hashlib.md5(f"{timezone.localdate()}?{query}".encode()).hexdigest()[:12]
+
+def drop_other_params(request, params):
+    """
+    Leaves only `params` in the request's query string, so nothing the cache key
+    doesn't cover (e.g. through a next-page link) ends up in a cached body.
+    """
+    if set(request.GET) <= set(params):
+        return
+    query = QueryDict(query_variant(request, params))
+    request.GET = query
+    request.META['QUERY_STRING'] = query.urlencode()
+
+def revision_etag(view_name, request, slug=None, params=()):
+    """
+    Strong ETag for a public page: it only changes when the tournament revision does.
+    Pages and HTMX fragments get different tags since their bodies differ.
+    """
+    tournament = get_tournament(request, slug)
+    variant = page_variant(request, params)
+    key = page_cache_key(view_name, tournament, fragment=is_htmx(request), slug=slug, variant=variant)
+    return key.replace(':', '-')
+
+def revision_last_modified(request, slug=None):
+    tournament = get_tournament(request, slug)
+    return tournament.data_updated_at if tournament else None
+
+def cache_page_by_revision(view_name, params=()):
+    """
+    Serves a public view's rendered page (or its HTMX fragment) from the cache
+    under (view, tournament, revision, `params` query parameters; the view
+    doesn't see any others), and answers If-None-Match /
+    If-Modified-Since with a 304 before the view runs; both checks cost one
+    lookup of the tournament (the default one, or the `slug` URL kwarg's).
+    Invalidation is implicit: once a write bumps the revision, the next request
+    misses and renders the new data while concurrent requests keep getting the
+    previous revision (uncacheable) instead of all rendering at once. Works with
+    any cache backend since stale entries are simply never read again.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def cached_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            key, latest_key = _page_keys(view_name, request, kwargs.get('slug'), params)
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(content)
+
+            # Single flight: after a revision bump only one request renders the new page,
+            # concurrent ones keep serving the previous revision until it is ready
+            lock_key = f"{key}:lock"
+            locked = cache.add(lock_key, 1, settings.PAGE_RENDER_LOCK_TIMEOUT)
+            if not locked:
+                stale = cache.get(latest_key)
+                if stale is not None:
+                    return _stale_response(stale)
+
+            try:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set_many({key: response.content, latest_key: response.content}, settings.PAGE_CACHE_TIMEOUT)
+            finally:
+                # Without a stale page to serve this request rendered too; the lock is still the other one's
+                if locked:
+                    cache.delete(lock_key)
+            return response
+
+        conditional_view = revision_conditions(view_name, params)(cached_view)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            drop_other_params(request, params)
+            return _patch_page_headers(conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+def acache_page_by_revision(view_name, params=()):
+    """
+    cache_page_by_revision for async views (core.views *_async, served under
+    ASGI): the same keys, validators and single-flight lock, through the async
+    cache API. The tournament is loaded asynchronously up front so that the
+    ETag/Last-Modified callbacks, which Django calls synchronously, find it
+    memoized on the request instead of querying from the event loop.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def cached_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view_func(request, *args, **kwargs)
+
+            key, latest_key = _page_keys(view_name, request, kwargs.get('slug'), params)
+            content = await cache.aget(key)
+            if content is not None:
+                return HttpResponse(content)
+
+            lock_key = f"{key}:lock"
+            locked = await cache.aadd(lock_key, 1, settings.PAGE_RENDER_LOCK_TIMEOUT)
+            if not locked:
+                stale = await cache.aget(latest_key)
+                if stale is not None:
+                    return _stale_response(stale)
+
+            try:
+                response = await view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    await cache.aset_many(
+                        {key: response.content, latest_key: response.content}, settings.PAGE_CACHE_TIMEOUT
+                    )
+            finally:
+                if locked:
+                    await cache.adelete(lock_key)
+            return response
+
+        conditional_view = revision_conditions(view_name, params)(cached_view)
+
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            drop_other_params(request, params)
+            await aget_tournament(request, kwargs.get('slug'))
+            return _patch_page_headers(await conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+def _page_keys(view_name, request, slug=None, params=()):
+    tournament = get_tournament(request, slug)
+    fragment = is_htmx(request)
+    variant = page_variant(request, params)
+    return (
+        page_cache_key(view_name, tournament, fragment=fragment, slug=slug, variant=variant),
+        page_cache_key(view_name, tournament, fragment=fragment, latest=True, slug=slug, variant=variant),
+    )
+
+def _stale_response(content):
+    response = HttpResponse(content)
+    response.stale = True
+    return response
+
+def revision_conditions(view_name, params=()):
+    # If-None-Match / If-Modified-Since answered from the tournament revision (see revision_etag)
+    return condition(
+        etag_func=lambda request, *args, slug=None, **kwargs: revision_etag(view_name, request, slug, params),
+        last_modified_func=lambda request, *args, slug=None, **kwargs: revision_last_modified(request, slug),
+    )
+
+def _patch_page_headers(response):
+    patch_vary_headers(response, ('HX-Request',))
+    if getattr(response, 'stale', False):
+        # The previous revision must not be stored under the current validators
+        response.headers.pop('ETag', None)
+        response.headers.pop('Last-Modified', None)
+        patch_cache_control(response, no_store=True)
+    else:
+        # Let browsers and proxies store the page but revalidate on every refresh
+        patch_cache_control(response, no_cache=True)
+    return response
+
+def api_cache_key(view_name, tournament, request, params=()):
+    # The path (next links are relative to it) and the endpoint's query
+    # parameters (cursor, fields, page size) change the body, so they are part of the key
+    query = query_variant(request, params)
+    digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()[:16]
+    return f"{page_cache_key(f'api-{view_name}', tournament)}:{digest}"
+
+def cache_api_by_revision(view_name, params=()):
+    """
+    The JSON API counterpart of cache_page_by_revision, for views taking an
+    optional tournament `slug`: the rendered body is cached per (endpoint,
+    tournament, revision, `params` query parameters), and If-None-Match / If-Modified-Since
+    are answered with a 304 from the same lookup of the tournament.
+    Unknown tournaments fall through to the view, which returns the 404.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def cached_view(request, *args, slug=None, **kwargs):
+            tournament = get_tournament(request, slug)
+            if request.method not in ('GET', 'HEAD') or tournament is None:
+                return view_func(request, *args, slug=slug, **kwargs)
+
+            key = api_cache_key(view_name, tournament, request, params)
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(content, content_type='application/json')
+
+            response = view_func(request, *args, slug=slug, **kwargs)
+            if response.status_code == 200:
+                response.render()
+                cache.set(key, response.content, settings.PAGE_CACHE_TIMEOUT)
+            return response
+
+        conditional_view = _api_conditions(view_name, params)(cached_view)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            drop_other_params(request, params)
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+def acache_api_by_revision(view_name, params=()):
+    # cache_api_by_revision for the async API views; see acache_page_by_revision
+    def decorator(view_func):
+        @wraps(view_func)
+        async def cached_view(request, *args, slug=None, **kwargs):
+            tournament = get_tournament(request, slug)
+            if request.method not in ('GET', 'HEAD') or tournament is None:
+                return await view_func(request, *args, slug=slug, **kwargs)
+
+            key = api_cache_key(view_name, tournament, request, params)
+            content = await cache.aget(key)
+            if content is not None:
+                return HttpResponse(content, content_type='application/json')
+
+            response = await view_func(request, *args, slug=slug, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.content, settings.PAGE_CACHE_TIMEOUT)
+            return response
+
+        conditional_view = _api_conditions(view_name, params)(cached_view)
+
+        @wraps(view_func)
+        async def wrapper(request, *args, slug=None, **kwargs):
+            drop_other_params(request, params)
+            await aget_tournament(request, slug)
+            response = await conditional_view(request, *args, slug=slug, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+def _api_conditions(view_name, params):
+    def etag(request, slug=None, **kwargs):
+        tournament = get_tournament(request, slug)
+        return api_cache_key(view_name, tournament, request, params).replace(':', '-') if tournament else None
+
+    def last_modified(request, slug=None, **kwargs):
+        tournament = get_tournament(request, slug)
+        return tournament.data_updated_at if tournament else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
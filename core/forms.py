@@ -20,6 +20,13 @@ class MatchForm(forms.ModelForm):
             'status': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    def __init__(self, *args, tournament=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the teams of the tournament being administered
+        if tournament is not None:
+            for name in ('home_team', 'away_team'):
+                self.fields[name].queryset = tournament.teams.all()
+
     def clean(self):
         cleaned_data = super().clean()
         home_team = cleaned_data.get('home_team')
@@ -31,3 +38,84 @@ class MatchForm(forms.ModelForm):
         return cleaned_data
 
 
+
+
+class MatchFilterForm(forms.Form):
+    """Filters of the custom admin match list; every field is optional and invalid ones are ignored."""
+    FIELD_CLASS = 'border border-gray-300 rounded px-2 py-1 text-sm'
+
+    q = forms.CharField(required=False, widget=forms.TextInput(attrs={'placeholder': 'Team or #id', 'type': 'search'}))
+    status = forms.ChoiceField(required=False, choices=[('', 'Any status')] + SingleMatch.STATUS_CHOICES)
+    leg = forms.TypedChoiceField(required=False, coerce=int, empty_value=None, choices=[('', 'Any leg'), (1, 'Leg 1'), (2, 'Leg 2')])
+    team = forms.ModelChoiceField(required=False, queryset=Team.objects.none(), empty_label='Any team')
+    date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def __init__(self, *args, tournament=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if tournament is not None:
+            self.fields['team'].queryset = tournament.teams.order_by('name')
+        for field in self.fields.values():
+            field.widget.attrs['class'] = self.FIELD_CLASS
+
+    def filters(self):
+        # The valid filters only, so one bad value doesn't empty the list
+        self.is_valid()
+        return {name: value for name, value in self.cleaned_data.items() if value not in (None, '')}
+
+
+class MatchdayResultForm(forms.Form):
+    """One row of the matchday screen: the score of one upcoming match, or nothing yet."""
+    SCORE_WIDGET = forms.NumberInput(attrs={'class': 'w-16 border border-gray-300 rounded px-2 py-1 text-center', 'min': 0})
+
+    match = forms.IntegerField(widget=forms.HiddenInput)
+    home_goals = forms.IntegerField(required=False, min_value=0, widget=SCORE_WIDGET)
+    away_goals = forms.IntegerField(required=False, min_value=0, widget=SCORE_WIDGET)
+
+    def __init__(self, *args, single_match=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The SingleMatch shown on this row
+        self.single_match = single_match
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if (cleaned_data.get('home_goals') is None) != (cleaned_data.get('away_goals') is None):
+            raise ValidationError("Enter both scores, or leave both empty.")
+        return cleaned_data
+
+
+class BaseMatchdayFormSet(forms.BaseFormSet):
+    """
+    The matchday's rows, checked together against the matches loaded for the
+    page (one query, unlike a model formset which looks each row up): every
+    row must still be one of them, each at most once, and at least one needs
+    a score. After is_valid(), `results` lists (match, home_goals, away_goals).
+    """
+
+    def __init__(self, *args, matches=(), **kwargs):
+        self.matches = list(matches)
+        kwargs.setdefault('initial', [{'match': match.pk} for match in self.matches])
+        super().__init__(*args, **kwargs)
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs['single_match'] = self.matches[index] if index is not None and index < len(self.matches) else None
+        return kwargs
+
+    def clean(self):
+        self.results = []
+        if any(self.errors):
+            return
+        by_id = {match.pk: match for match in self.matches}
+        seen = set()
+        for form in self.forms:
+            match_id = form.cleaned_data.get('match')
+            if match_id not in by_id or match_id in seen:
+                raise ValidationError("These matches changed while you were editing them; reload the page.")
+            seen.add(match_id)
+            if form.cleaned_data.get('home_goals') is not None:
+                self.results.append((by_id[match_id], form.cleaned_data['home_goals'], form.cleaned_data['away_goals']))
+        if not self.results:
+            raise ValidationError("Enter at least one result.")
+
+
+MatchdayFormSet = forms.formset_factory(MatchdayResultForm, formset=BaseMatchdayFormSet, extra=0)
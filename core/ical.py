@@ -0,0 +1,101 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SingleMatch
+
+# iCalendar (RFC 5545) feed of a tournament's fixtures for calendar apps to
+# subscribe to. It is written out event by event while the matches are read
+# in chunks, so a long schedule is never built in memory, and apps polling it
+# get a 304 until the tournament revision changes (see views.upcoming_calendar).
+
+# Calendar slot of a match; eFootball matches don't record an end time
+MATCH_DURATION = timedelta(minutes=30)
+
+def calendar_matches(tournament, team=None):
+    """
+    Dated matches of the tournament, or of one of its teams, kicking off from
+    CALENDAR_LOOKBACK_DAYS ago onwards. Finished ones stay on the calendar
+    with their score.
+    """
+    since = timezone.now() - timedelta(days=settings.CALENDAR_LOOKBACK_DAYS)
+    matches = SingleMatch.objects.filter(tournament=tournament, match_datetime__gte=since)
+    if team is not None:
+        matches = matches.filter(Q(home_team=team) | Q(away_team=team))
+    return matches.select_related('home_team', 'away_team', 'fixture').order_by('match_datetime', 'pk')
+
+def escape_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def content_line(line):
+    # Lines are folded at 75 octets (without splitting a UTF-8 character) and end in CRLF
+    chunks, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            chunks.append(''.join(current))
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    chunks.append(''.join(current))
+    return '\r\n '.join(chunks) + '\r\n'
+
+def format_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+def calendar_header(tournament, team=None):
+    name = f"{tournament.name}: {team.name}" if team is not None else tournament.name
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Kaalapani E-football//Fixtures//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        # Polling hints for calendar apps
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+        'X-PUBLISHED-TTL:PT1H',
+    ]
+    return ''.join(content_line(line) for line in lines)
+
+def match_event(match, host, stamp):
+    home, away = match.home_team.name, match.away_team.name
+    if match.status == 'FINISHED' and match.home_goals is not None and match.away_goals is not None:
+        summary = f"{home} {match.home_goals}-{match.away_goals} {away}"
+    else:
+        summary = f"{home} vs {away}"
+    description = f"Leg {match.leg}"
+    if match.fixture is not None:
+        description = f"{match.fixture.get_round_display()}, leg {match.leg}"
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:singlematch-{match.pk}@{host}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{format_utc(match.match_datetime)}',
+        f'DTEND:{format_utc(match.match_datetime + MATCH_DURATION)}',
+        f'SUMMARY:{escape_text(summary)}',
+        f'DESCRIPTION:{escape_text(description)}',
+        'STATUS:CONFIRMED',
+        'END:VEVENT',
+    ]
+    return ''.join(content_line(line) for line in lines)
+
+def _stamp(tournament):
+    # Same bytes for the same revision, so the ETag describes the body
+    return format_utc(tournament.data_updated_at or timezone.now())
+
+def stream_calendar(tournament, matches, host, team=None):
+    stamp = _stamp(tournament)
+    yield calendar_header(tournament, team)
+    for match in matches.iterator(chunk_size=500):
+        yield match_event(match, host, stamp)
+    yield content_line('END:VCALENDAR')
+
+async def astream_calendar(tournament, matches, host, team=None):
+    stamp = _stamp(tournament)
+    yield calendar_header(tournament, team)
+    async for match in matches.aiterator(chunk_size=500):
+        yield match_event(match, host, stamp)
+    yield content_line('END:VCALENDAR')
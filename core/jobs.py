@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .models import RecomputeJob
+
+def enqueue_rebuild(tournament):
+    """
+    Marks the tournament dirty for the recompute worker. While a job is still
+    pending, further events are folded into it instead of queueing more work.
+    Safe to call inside a transaction: the job only becomes visible on commit.
+    There is at most one pending job per tournament (a partial unique
+    constraint), so when a concurrent writer creates it first this folds into it.
+    """
+    pending = RecomputeJob.objects.filter(tournament=tournament, status='PENDING')
+    if pending.update(events=F('events') + 1):
+        return
+    try:
+        # In a savepoint, so a lost race doesn't break the caller's transaction
+        with transaction.atomic():
+            RecomputeJob.objects.create(tournament=tournament)
+    except IntegrityError:
+        pending.update(events=F('events') + 1)
+
+def claim_next_job():
+    """
+    Claims the oldest pending job, or returns None. The claim is a conditional
+    UPDATE, so several workers can poll the same table without a broker or
+    SELECT ... SKIP LOCKED (which SQLite lacks).
+    """
+    for job in RecomputeJob.objects.filter(status='PENDING').order_by('created_at')[:5]:
+        now = timezone.now()
+        if RecomputeJob.objects.filter(pk=job.pk, status='PENDING').update(status='RUNNING', started_at=now):
+            job.status, job.started_at = 'RUNNING', now
+            return job
+    return None
+
+def finish_job(job, error=None):
+    job.status = 'FAILED' if error else 'DONE'
+    job.error = error or ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+def requeue_stale_jobs(older_than):
+    """
+    Puts jobs left RUNNING by a worker that died mid-rebuild back in the queue.
+    Where the tournament has a pending job already, that one covers the
+    rebuild and the stale job's events are folded into it instead.
+    """
+    now = timezone.now()
+    requeued = 0
+    for job in RecomputeJob.objects.filter(status='RUNNING', started_at__lt=now - older_than):
+        try:
+            with transaction.atomic():
+                requeued += RecomputeJob.objects.filter(pk=job.pk, status='RUNNING').update(status='PENDING', started_at=None)
+        except IntegrityError:
+            with transaction.atomic():
+                if RecomputeJob.objects.filter(pk=job.pk, status='RUNNING').update(
+                    status='FAILED', finished_at=now, error="Worker died; folded into the pending job",
+                ):
+                    RecomputeJob.objects.filter(tournament_id=job.tournament_id, status='PENDING').update(
+                        events=F('events') + job.events
+                    )
+    return requeued
+
+def prune_finished_jobs(older_than=timedelta(days=1)):
+    cutoff = timezone.now() - older_than
+    return RecomputeJob.objects.filter(status__in=['DONE', 'FAILED'], finished_at__lt=cutoff).delete()[0]
+
+def queue_stats(window=timedelta(hours=1)):
+    """
+    Queue depth and job latency (first dirty event -> rebuild done) for monitoring.
+    Latencies are in seconds, over the jobs finished within `window`.
+    """
+    now = timezone.now()
+    pending = RecomputeJob.objects.filter(status='PENDING')
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    finished = RecomputeJob.objects.filter(status__in=['DONE', 'FAILED'], finished_at__gte=now - window)
+    latencies = sorted(
+        (finished_at - created_at).total_seconds()
+        for created_at, finished_at in finished.values_list('created_at', 'finished_at')
+    )
+    return {
+        'depth': pending.count(),
+        'running': RecomputeJob.objects.filter(status='RUNNING').count(),
+        'oldest_pending_age': (now - oldest).total_seconds() if oldest else 0.0,
+        'finished': len(latencies),
+        'failed': finished.filter(status='FAILED').count(),
+        'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+        'latency_max': latencies[-1] if latencies else 0.0,
+    }
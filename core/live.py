@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import LiveEvent, Team
+
+logger = logging.getLogger(__name__)
+
+# Seconds between deletions of events older than LIVE_EVENT_RETENTION
+PRUNE_INTERVAL = 600
+
+# --- Publishing (sync, called from the write paths) ---
+
+def publish(tournament_id, kind, payload):
+    """
+    Records a live feed event. Call it inside the transaction making the change:
+    the event only becomes visible to the feed when that commits.
+    """
+    if tournament_id is None:
+        return None
+    event = LiveEvent.objects.create(tournament_id=tournament_id, kind=kind, payload=payload)
+    # Every writer prunes now and then (once per interval per cache), after its own commit
+    if cache.add('live:prune', 1, PRUNE_INTERVAL):
+        transaction.on_commit(prune_live_events)
+    return event
+
+def prune_live_events():
+    cutoff = timezone.now() - timedelta(hours=settings.LIVE_EVENT_RETENTION)
+    LiveEvent.objects.filter(created_at__lt=cutoff).delete()
+
+def publish_match(match, tournament_id, deleted=False):
+    if deleted:
+        return publish(tournament_id, 'match', {'id': match.pk, 'deleted': True})
+    return publish(tournament_id, 'match', {
+        'id': match.pk,
+        'fixture': match.fixture_id,
+        'leg': match.leg,
+        'status': match.status,
+        'match_datetime': match.match_datetime.isoformat() if match.match_datetime else None,
+        'home_team': match.home_team_id,
+        'away_team': match.away_team_id,
+        'home_goals': match.home_goals,
+        'away_goals': match.away_goals,
+    })
+
+def publish_standings(team_ids):
+    # Only the rows that changed; clients re-sort their table
+    rows = defaultdict(list)
+    teams = (
+        Team.objects.filter(pk__in=team_ids)
+        .annotate(gd=F('goals_scored') - F('goals_conceded'))
+        .values('id', 'tournament_id', 'name', 'played', 'wins', 'draws', 'losses',
+                'goals_scored', 'goals_conceded', 'gd', 'points')
+    )
+    for team in teams:
+        rows[team.pop('tournament_id')].append(team)
+    for tournament_id, changed in rows.items():
+        publish(tournament_id, 'standings', {'rows': changed})
+
+def publish_bracket(fixture):
+    return publish(fixture.tournament_id, 'bracket', {
+        'id': fixture.pk,
+        'round': fixture.round,
+        'team_a': fixture.team_a_id,
+        'team_b': fixture.team_b_id,
+        'winner': fixture.winner_id,
+    })
+
+def publish_refresh(tournament_id):
+    # Too much changed to describe (bulk import, full rebuild): clients reload everything
+    return publish(tournament_id, 'refresh', {})
+
+# --- Fan-out (async, in the web process serving /live/) ---
+
+def format_event(event):
+    data = json.dumps(event.payload, separators=(',', ':'))
+    return f"id: {event.pk}\nevent: {event.kind}\ndata: {data}\n\n"
+
+def commit_window_start():
+    # Ids are handed out before commit, so an event can become visible after one
+    # with a higher id; anything created this recently may still show up
+    return timezone.now() - timedelta(seconds=settings.LIVE_COMMIT_LAG)
+
+def unseen_events_filter(last_id):
+    return Q(pk__gt=last_id) | Q(created_at__gte=commit_window_start())
+
+class Broadcaster:
+    """
+    Fans LiveEvent rows out to the feed clients of this process. A single task
+    polls the table for rows past the last one seen (and re-reads the last
+    LIVE_COMMIT_LAG seconds for rows that committed out of id order), and puts
+    each event on the queue of every client following its tournament, so the
+    database cost is one query per interval per process however many clients
+    are connected, and an idle client is just a suspended coroutine and a queue.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.last_id = None
+        # pk -> created_at of the events delivered within the commit window
+        self.recent = {}
+        self.task = None
+
+    async def subscribe(self, tournament_id):
+        queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.subscribers[tournament_id].add(queue)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            if self.last_id is None:
+                self.last_id = await LiveEvent.objects.order_by('-pk').values_list('pk', flat=True).afirst() or 0
+                self.recent = {
+                    pk: created_at async for pk, created_at in
+                    LiveEvent.objects.filter(created_at__gte=commit_window_start()).values_list('pk', 'created_at')
+                }
+            self.task = loop.create_task(self.poll())
+        return queue
+
+    def unsubscribe(self, tournament_id, queue):
+        queues = self.subscribers.get(tournament_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[tournament_id]
+
+    @property
+    def client_count(self):
+        return sum(len(queues) for queues in self.subscribers.values())
+
+    async def poll(self):
+        # Runs while anyone is listening; the next subscriber restarts it
+        while self.subscribers:
+            delivered = 0
+            try:
+                delivered = await self.poll_once()
+            except Exception:
+                logger.exception("Live feed poll failed")
+            if delivered < 500:
+                await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+
+    async def poll_once(self):
+        """Dispatches up to 500 events not delivered yet; returns how many."""
+        since = commit_window_start()
+        # Just the ids first: most polls find nothing new
+        unseen = LiveEvent.objects.filter(unseen_events_filter(self.last_id))
+        pks = [pk async for pk in unseen.values_list('pk', flat=True)]
+        new = sorted(pk for pk in pks if pk not in self.recent)[:500]
+        if new:
+            async for event in LiveEvent.objects.filter(pk__in=new).order_by('pk'):
+                self.recent[event.pk] = event.created_at
+                self.last_id = max(self.last_id, event.pk)
+                self.dispatch(event)
+        self.recent = {pk: created_at for pk, created_at in self.recent.items() if created_at >= since}
+        return len(new)
+
+    def dispatch(self, event):
+        for queue in list(self.subscribers.get(event.tournament_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client that can't keep up gets one "refresh" instead of an ever-growing backlog
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+broadcaster = Broadcaster()
+
+async def hello_event(tournament):
+    # First message: where the client starts from, so EventSource reconnects with a Last-Event-ID
+    last_id = await LiveEvent.objects.order_by('-pk').values_list('pk', flat=True).afirst() or 0
+    data = json.dumps({'tournament': tournament.pk, 'revision': tournament.revision})
+    return last_id, f"retry: {int(settings.LIVE_POLL_INTERVAL * 1000)}\nid: {last_id}\nevent: hello\ndata: {data}\n\n"
+
+async def missed_events(tournament_id, last_event_id):
+    """
+    Ids and messages of the events a reconnecting client missed, or a single
+    refresh if there are more than it could be sent one by one. Events of the
+    last LIVE_COMMIT_LAG seconds are sent again, since one of them may have
+    committed after the client saw a higher id; each carries the full state of
+    what it describes, so receiving one twice is harmless.
+    """
+    events = [
+        event async for event in
+        LiveEvent.objects.filter(unseen_events_filter(last_event_id), tournament_id=tournament_id)
+        .order_by('pk')[:settings.LIVE_QUEUE_SIZE + 1]
+    ]
+    if len(events) > settings.LIVE_QUEUE_SIZE:
+        return {event.pk for event in events}, ["event: refresh\ndata: {}\n\n"]
+    return {event.pk for event in events}, [format_event(event) for event in events]
+
+async def event_stream(tournament, last_event_id=None):
+    """
+    The SSE stream of one client: catch-up after Last-Event-ID, then events as
+    the broadcaster delivers them, with a heartbeat comment while idle.
+    """
+    queue = await broadcaster.subscribe(tournament.pk)
+    try:
+        last_id, hello = await hello_event(tournament)
+        yield hello
+        # Events the broadcaster may deliver again after the catch-up sent them
+        replayed = set()
+        if last_event_id is not None:
+            replayed, messages = await missed_events(tournament.pk, last_event_id)
+            for message in messages:
+                yield message
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.LIVE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                yield "event: refresh\ndata: {}\n\n"
+            elif event.pk not in replayed:
+                yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(tournament.pk, queue)
+
+async def catch_up_stream(tournament, last_event_id=None):
+    """
+    Finite version of event_stream for WSGI workers, which can't hold a
+    connection open without tying up a thread: the client gets what it missed
+    and reconnects after the retry delay, i.e. it degrades to polling.
+    """
+    seen, hello = await hello_event(tournament)
+    messages = [hello]
+    if last_event_id is not None:
+        messages += (await missed_events(tournament.pk, last_event_id))[1]
+    return messages
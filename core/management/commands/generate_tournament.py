@@ -0,0 +1,129 @@
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.bracket import create_bracket
+from core.models import GoalEvent, SingleMatch, Team, Tournament
+from core.utils import refresh_tournament
+
+# Goals per side, roughly as often as they come up in real results
+GOAL_WEIGHTS = [(0, 24), (1, 31), (2, 23), (3, 12), (4, 6), (5, 3), (6, 1)]
+PLAYERS_PER_TEAM = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates a synthetic tournament for load and scaling tests: bulk-inserted teams, "
+        "random SingleMatch results and fixtures, and a knockout bracket. The same seed "
+        "always produces the same data (dates are relative to --start)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=1000, help="Number of teams (default 1000)")
+        parser.add_argument(
+            '--matches-per-team', type=int, default=20,
+            help="Matches each team plays on average (default 20); there are teams * this / 2 matches",
+        )
+        parser.add_argument('--finished', type=float, default=0.8, help="Share of matches already played (default 0.8)")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default 0)")
+        parser.add_argument('--slug', help="Tournament slug (default bench-<teams>-s<seed>)")
+        parser.add_argument('--start', help="Date the season is centred on, YYYY-MM-DD (default today)")
+        parser.add_argument('--goal-events', action='store_true', help="Also record who scored every goal")
+        parser.add_argument('--no-bracket', action='store_true', help="Skip the knockout bracket")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per bulk insert")
+        parser.add_argument('--replace', action='store_true', help="Delete the tournament first if it exists")
+
+    def handle(self, *args, **options):
+        teams, per_team = options['teams'], options['matches_per_team']
+        if teams < 2:
+            raise CommandError("A tournament needs at least two teams.")
+        if not 0 <= options['finished'] <= 1:
+            raise CommandError("--finished must be between 0 and 1.")
+        slug = options['slug'] or f"bench-{teams}-s{options['seed']}"
+        start = parse_date(options['start']) if options['start'] else timezone.localdate()
+        if start is None:
+            raise CommandError("--start must be a date (YYYY-MM-DD).")
+
+        existing = Tournament.objects.filter(slug=slug)
+        if existing.exists():
+            if not options['replace']:
+                raise CommandError(f"Tournament {slug!r} already exists; pass --replace to recreate it.")
+            existing.delete()
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.anchor = timezone.make_aware(datetime.combine(start, dt_time(18, 0)))
+        started = time.perf_counter()
+
+        tournament = Tournament.objects.create(name=f"Benchmark {teams} teams (seed {options['seed']})", slug=slug)
+        team_ids = self.create_teams(tournament, teams)
+        matches = teams * per_team // 2
+        goals = self.create_matches(tournament, team_ids, matches, options['finished'], options['goal_events'])
+        if not options['no_bracket']:
+            # The largest knockout bracket the teams allow, up to a Round of 256
+            entrants = 1 << (min(teams, 256).bit_length() - 1)
+            create_bracket(tournament, Team.objects.filter(pk__in=team_ids[:entrants]).order_by('pk'))
+        self.stdout.write("  rebuilding standings and top scorers...")
+        refresh_tournament(tournament)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{tournament.slug}: {teams} teams, {matches} matches, {goals} goal events in {elapsed:.1f}s"
+        ))
+
+    def create_teams(self, tournament, count):
+        ids = []
+        for offset in range(0, count, self.batch_size):
+            batch = [
+                Team(tournament=tournament, name=f"Team {number:06d}")
+                for number in range(offset + 1, min(offset + self.batch_size, count) + 1)
+            ]
+            ids += [team.pk for team in Team.objects.bulk_create(batch)]
+        self.stdout.write(f"  {count} teams")
+        return ids
+
+    def create_matches(self, tournament, team_ids, count, finished_share, goal_events):
+        """Bulk-inserts `count` random matches in batches; returns the number of goal events."""
+        rng, created, goals = self.rng, 0, 0
+        scores, weights = zip(*GOAL_WEIGHTS)
+        while created < count:
+            size = min(self.batch_size, count - created)
+            batch = []
+            for _ in range(size):
+                home, away = rng.sample(team_ids, 2)
+                match = SingleMatch(tournament=tournament, home_team_id=home, away_team_id=away, leg=rng.choice((1, 2)))
+                if rng.random() < finished_share:
+                    match.status = 'FINISHED'
+                    match.home_goals, match.away_goals = rng.choices(scores, weights, k=2)
+                    match.match_datetime = self.anchor - timedelta(days=rng.randrange(1, 180), minutes=rng.randrange(0, 240, 15))
+                elif rng.random() < 0.9:
+                    match.match_datetime = self.anchor + timedelta(days=rng.randrange(0, 60), minutes=rng.randrange(0, 240, 15))
+                batch.append(match)
+            with transaction.atomic():
+                batch = SingleMatch.objects.bulk_create(batch)
+                if goal_events:
+                    goals += self.create_goal_events(batch)
+            created += size
+            self.stdout.write(f"  {created} matches", ending='\r')
+        self.stdout.write("")
+        return goals
+
+    def create_goal_events(self, matches):
+        events = []
+        for match in matches:
+            if match.status != 'FINISHED':
+                continue
+            for team_id, count in ((match.home_team_id, match.home_goals), (match.away_team_id, match.away_goals)):
+                for _ in range(count):
+                    events.append(GoalEvent(
+                        match=match, team_id=team_id,
+                        player_name=f"Player {team_id}-{self.rng.randrange(PLAYERS_PER_TEAM) + 1}",
+                        minute=self.rng.randrange(1, 91),
+                    ))
+        GoalEvent.objects.bulk_create(events, batch_size=self.batch_size)
+        return len(events)
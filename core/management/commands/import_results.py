@@ -0,0 +1,255 @@
+import csv
+import json
+import time
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.bracket import BracketConflict
+from core.models import Match, SingleMatch, Tournament
+from core.resolver import TeamResolver
+from core.utils import refresh_tournament, sync_fixture_scores
+
+# SingleMatch columns an import row may set
+MATCH_FIELDS = ('fixture_id', 'match_datetime', 'home_goals', 'away_goals', 'status')
+
+
+class DryRun(Exception):
+    pass
+
+
+def _int_or_none(value):
+    if value is None or str(value).strip() == '':
+        return None
+    return int(value)
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams match results from CSV or JSONL files into SingleMatch/Match rows in batches, "
+        "then rebuilds standings and top scorers once. Re-running the same file is a no-op. "
+        "Columns: home_team, away_team, leg, home_goals, away_goals, "
+        "and optionally status, match_datetime, round (creates the fixture if missing)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help="CSV (with a header row) or JSONL files")
+        parser.add_argument('--tournament', help="Tournament slug (default: the current tournament)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and count changes, then roll everything back")
+
+    def handle(self, *args, **options):
+        if options['tournament']:
+            tournament = Tournament.objects.filter(slug=options['tournament']).first()
+        else:
+            tournament = Tournament.objects.first()
+        if not tournament:
+            raise CommandError("No tournament found!")
+
+        self.tournament = tournament
+        self.resolver = TeamResolver.for_tournament(tournament)
+        self.resolved = {}
+        self.stats = Counter()
+        self.verbosity = options['verbosity']
+        dry_run = options['dry_run']
+        started = time.perf_counter()
+
+        try:
+            # Batches commit on their own; a dry run wraps them all so they can be rolled back
+            with transaction.atomic() if dry_run else nullcontext():
+                for path in options['files']:
+                    rows = self.read_rows(path, options['format'])
+                    while True:
+                        batch = list(islice(rows, options['batch_size']))
+                        if not batch:
+                            break
+                        try:
+                            with transaction.atomic():
+                                self.import_batch(batch)
+                        except BracketConflict as exc:
+                            raise CommandError(
+                                f"{path}: the batch from line {batch[0][0]} was not imported: {exc.message}"
+                            )
+                        self.stdout.write(f"  {self.stats['rows']} rows processed", ending='\r')
+                if dry_run:
+                    raise DryRun
+        except DryRun:
+            pass
+        finally:
+            # Bulk writes skip SingleMatch.save, so rebuild once for the whole import,
+            # including the batches committed before an error stopped it
+            if self.stats['created'] + self.stats['updated'] and not dry_run:
+                refresh_tournament(tournament)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'[dry run] ' if dry_run else ''}{self.stats['rows']} rows in {elapsed:.2f}s "
+            f"({self.stats['rows'] / elapsed if elapsed else 0:.0f} rows/s): "
+            f"{self.stats['created']} created, {self.stats['updated']} updated, "
+            f"{self.stats['unchanged']} unchanged, {self.stats['skipped']} skipped, "
+            f"{self.stats['fixtures_created']} fixtures created"
+        )
+        if self.stats['skipped']:
+            self.stdout.write(self.style.WARNING(f"{self.stats['skipped']} rows skipped, see the warnings above"))
+
+    def read_rows(self, path, fmt):
+        """
+        Yields (line number, row) lazily so files of any size stream through.
+        Lines that aren't valid JSON are reported and skipped here; rows that
+        aren't objects are left to parse_row.
+        """
+        path = Path(path)
+        fmt = fmt or ('jsonl' if path.suffix.lower() in ('.jsonl', '.ndjson') else 'csv')
+        with path.open(newline='', encoding='utf-8') as f:
+            if fmt == 'csv':
+                for line, row in enumerate(csv.DictReader(f), start=2):
+                    yield line, row
+            else:
+                for line, text in enumerate(f, start=1):
+                    if not text.strip():
+                        continue
+                    try:
+                        row = json.loads(text)
+                    except ValueError as exc:
+                        self.stats['rows'] += 1
+                        self.warn(line, f"invalid JSON ({exc})")
+                        continue
+                    yield line, row
+
+    def warn(self, line, message):
+        self.stats['skipped'] += 1
+        self.stderr.write(f"WARNING: line {line}: {message}")
+
+    def resolve_team(self, line, name):
+        # Names repeat across rows, so each distinct spelling is resolved once
+        name = str(name or '')
+        if name not in self.resolved:
+            self.resolved[name] = self.resolver.resolve(name)
+            if self.resolved[name].status == 'fuzzy' and self.verbosity > 1:
+                self.stdout.write(f"  {name!r} matched to team #{self.resolved[name].team_id}")
+        resolution = self.resolved[name]
+        if resolution.status == 'ambiguous':
+            names = ', '.join(key for team_id, key, score in resolution.candidates)
+            self.warn(line, f"{name!r} is ambiguous ({names}); add a team alias to disambiguate")
+        elif not resolution:
+            self.warn(line, f"could not find team for {name!r}")
+        return resolution.team_id
+
+    def parse_row(self, line, row):
+        if not isinstance(row, dict):
+            self.warn(line, f"expected an object with the match columns, got {type(row).__name__}")
+            return None
+        home_id = self.resolve_team(line, row.get('home_team'))
+        away_id = self.resolve_team(line, row.get('away_team')) if home_id else None
+        if not home_id or not away_id:
+            return None
+        if home_id == away_id:
+            self.warn(line, "Home Team and Away Team cannot be the same.")
+            return None
+
+        try:
+            values = {
+                'leg': _int_or_none(row.get('leg')) or 1,
+                'home_goals': _int_or_none(row.get('home_goals')),
+                'away_goals': _int_or_none(row.get('away_goals')),
+            }
+        except (TypeError, ValueError) as exc:
+            self.warn(line, str(exc))
+            return None
+
+        finished = values['home_goals'] is not None and values['away_goals'] is not None
+        values['status'] = str(row.get('status') or ('FINISHED' if finished else 'UPCOMING')).upper()
+        if values['status'] not in dict(SingleMatch.STATUS_CHOICES):
+            self.warn(line, f"unknown status {values['status']!r}")
+            return None
+
+        if row.get('match_datetime'):
+            match_datetime = parse_datetime(str(row['match_datetime']))
+            if match_datetime is None:
+                self.warn(line, f"invalid match_datetime {row['match_datetime']!r}")
+                return None
+            if timezone.is_naive(match_datetime):
+                match_datetime = timezone.make_aware(match_datetime)
+            values['match_datetime'] = match_datetime
+
+        values['round'] = str(row['round']) if row.get('round') else None
+        if values['round'] and values['round'] not in dict(Match.ROUND_CHOICES):
+            self.warn(line, f"unknown round {values['round']!r}")
+            return None
+        return home_id, away_id, values
+
+    def import_batch(self, batch):
+        # Last row wins when a batch repeats the same (home, away, leg)
+        parsed = {}
+        for line, row in batch:
+            self.stats['rows'] += 1
+            result = self.parse_row(line, row)
+            if result:
+                home_id, away_id, values = result
+                parsed[(home_id, away_id, values['leg'])] = values
+        if not parsed:
+            return
+
+        team_ids = {team_id for home_id, away_id, leg in parsed for team_id in (home_id, away_id)}
+        existing = {
+            (m.home_team_id, m.away_team_id, m.leg): m
+            for m in SingleMatch.objects.filter(
+                home_team_id__in=team_ids, away_team_id__in=team_ids, leg__in={key[2] for key in parsed}
+            )
+        }
+        fixtures = {
+            frozenset((f.team_a_id, f.team_b_id)): f
+            for f in Match.objects.filter(tournament=self.tournament, team_a_id__in=team_ids, team_b_id__in=team_ids)
+        }
+
+        # Fixtures for pairs that name a round but don't exist yet
+        new_fixtures = {}
+        for (home_id, away_id, leg), values in parsed.items():
+            pair = frozenset((home_id, away_id))
+            if values['round'] and pair not in fixtures and pair not in new_fixtures:
+                new_fixtures[pair] = Match(
+                    tournament=self.tournament, team_a_id=home_id, team_b_id=away_id, round=values['round']
+                )
+        if new_fixtures:
+            Match.objects.bulk_create(new_fixtures.values())
+            fixtures.update(new_fixtures)
+            self.stats['fixtures_created'] += len(new_fixtures)
+
+        to_create, to_update = [], []
+        for (home_id, away_id, leg), values in parsed.items():
+            fixture = fixtures.get(frozenset((home_id, away_id)))
+            values['fixture_id'] = fixture.pk if fixture else None
+            match = existing.get((home_id, away_id, leg))
+            if match is None:
+                to_create.append(SingleMatch(
+                    home_team_id=home_id, away_team_id=away_id, leg=leg, tournament=self.tournament,
+                    **{field: values[field] for field in MATCH_FIELDS if field in values},
+                ))
+                continue
+
+            if values['fixture_id'] is None:
+                # Keep a manually linked fixture
+                values.pop('fixture_id')
+            changed = False
+            for field in MATCH_FIELDS:
+                if field in values and getattr(match, field) != values[field]:
+                    setattr(match, field, values[field])
+                    changed = True
+            if changed:
+                to_update.append(match)
+            else:
+                self.stats['unchanged'] += 1
+
+        SingleMatch.objects.bulk_create(to_create)
+        SingleMatch.objects.bulk_update(to_update, MATCH_FIELDS)
+        sync_fixture_scores(to_create + to_update)
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
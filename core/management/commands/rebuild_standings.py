@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Tournament
+from core.utils import find_standings_mismatches, refresh_tournament
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the stored points table and top scorers from finished matches (run after bulk imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help="Tournament slugs (default: all tournaments)")
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only verify that the stored standings match the finished matches; exit non-zero if not.",
+        )
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.all()
+        if options['slugs']:
+            tournaments = tournaments.filter(slug__in=options['slugs'])
+
+        inconsistent = 0
+        for tournament in tournaments:
+            if options['check']:
+                mismatches = find_standings_mismatches(tournament)
+                for team, field, stored, expected in mismatches:
+                    self.stdout.write(f"  {tournament.slug}: {team.name}.{field} is {stored}, expected {expected}")
+                if mismatches:
+                    inconsistent += 1
+                    self.stdout.write(self.style.ERROR(f"{tournament.name}: standings out of date"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{tournament.name}: standings consistent"))
+            else:
+                refresh_tournament(tournament)
+                self.stdout.write(self.style.SUCCESS(f"{tournament.name}: standings rebuilt"))
+
+        if inconsistent:
+            raise CommandError(f"{inconsistent} tournament(s) have stale standings; run without --check to repair.")
@@ -0,0 +1,59 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import claim_next_job, finish_job, prune_finished_jobs, queue_stats, requeue_stale_jobs
+from core.utils import refresh_tournament
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Processes queued standings/top-scorer rebuilds (enable with RECOMPUTE_ASYNC=True)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help="Requeue jobs left RUNNING for this many seconds by a dead worker.",
+        )
+        parser.add_argument('--stats', action='store_true', help="Print queue depth and job latency, then exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in queue_stats().items():
+                self.stdout.write(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+            return
+
+        stale_after = timedelta(seconds=options['stale_after'])
+        last_maintenance = 0.0
+        self.stdout.write("Recompute worker started")
+        while True:
+            if time.monotonic() - last_maintenance > 60:
+                requeue_stale_jobs(stale_after)
+                prune_finished_jobs()
+                last_maintenance = time.monotonic()
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                close_old_connections()
+                time.sleep(options['interval'])
+                continue
+
+            try:
+                refresh_tournament(job.tournament)
+            except Exception as exc:
+                logger.exception("Rebuild of %s failed", job.tournament)
+                finish_job(job, error=repr(exc))
+            else:
+                finish_job(job)
+            self.stdout.write(
+                f"{job.tournament}: {job.status} ({job.events} event(s), "
+                f"latency {job.latency.total_seconds():.3f}s)"
+            )
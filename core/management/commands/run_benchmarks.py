@@ -0,0 +1,267 @@
+import csv
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+
+from core.models import SingleMatch, Tournament
+from core.utils import calculate_standings, update_top_scorers
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+# Differences smaller than these are noise, whatever the tolerance
+MIN_SECONDS_DELTA = 0.005
+MIN_MEMORY_DELTA_KB = 256
+
+# Rows in the import benchmark's result file
+IMPORT_ROWS = 2000
+
+
+class RollBack(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the hot paths (standings and top scorer rebuilds, every public page and API "
+        "list, the custom admin and result imports) on generated tournaments of the given "
+        "sizes, with their query counts and peak memory, and compares them with a stored "
+        "baseline (benchmarks/baseline.json). Tournaments are generated (see generate_tournament) "
+        "inside a transaction that is rolled back afterwards, unless --keep-data keeps them "
+        "for later runs. Refuses to run without DEBUG unless --allow-production is passed. "
+        "Exits non-zero on a regression."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000', help="Comma-separated team counts (default 1000), e.g. 1000,10000,100000")
+        parser.add_argument('--matches-per-team', type=int, default=20, help="Passed to generate_tournament (default 20)")
+        parser.add_argument('--goal-events', action='store_true', help="Generate goal events (scorer leaderboard from goals)")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark; the median counts (default 5)")
+        parser.add_argument('--only', help="Comma-separated benchmark names to run")
+        parser.add_argument('--regenerate', action='store_true', help="Recreate the benchmark tournaments")
+        parser.add_argument(
+            '--keep-data', action='store_true',
+            help="Commit the generated tournaments so later runs reuse them (default: roll everything back)",
+        )
+        parser.add_argument(
+            '--allow-production', action='store_true',
+            help="Run even though DEBUG is off, i.e. probably against live data",
+        )
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help=f"Baseline file (default {DEFAULT_BASELINE})")
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help="Allowed slowdown or memory growth over the baseline, as a fraction (default 0.25)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers.")
+        if not settings.DEBUG and not options['allow_production']:
+            raise CommandError(
+                "DEBUG is off, so this may be the production database; benchmarks generate "
+                "large tournaments into it. Pass --allow-production to run anyway."
+            )
+        only = set(options['only'].split(',')) if options['only'] else None
+        params = {
+            'matches_per_team': options['matches_per_team'],
+            'goal_events': options['goal_events'],
+            'seed': options['seed'],
+        }
+        self.repeat = max(options['repeat'], 1)
+        self.verbosity = options['verbosity']
+        self.factory = RequestFactory()
+        # Never saved: the admin views only check the flags
+        self.user = User(username='benchmark', is_staff=True, is_active=True, is_superuser=True)
+
+        results = {}
+        try:
+            # Nothing the benchmarks write (generated tournaments, rebuilt standings) outlives the run
+            with transaction.atomic():
+                for size in sizes:
+                    tournament = self.tournament(size, params, options['regenerate'])
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"{size} teams ({tournament.slug})"))
+                    results[str(size)] = {}
+                    with tempfile.TemporaryDirectory() as directory:
+                        for name, func in self.benchmarks(tournament, directory):
+                            if only and name not in only:
+                                continue
+                            results[str(size)][name] = self.measure(func)
+                            self.stdout.write(self.format_row(name, results[str(size)][name]))
+                if not options['keep_data']:
+                    raise RollBack
+        except RollBack:
+            pass
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps({'params': params, 'results': results}, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path}; pass --save-baseline to store one.")
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('params') != params:
+            self.stdout.write(self.style.WARNING(
+                f"The baseline was recorded with {baseline.get('params')}; not comparing."
+            ))
+            return
+        regressions = self.compare(baseline['results'], results, options['tolerance'])
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) against {baseline_path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
+
+    def tournament(self, size, params, regenerate):
+        slug = f"bench-{size}x{params['matches_per_team']}-s{params['seed']}{'-goals' if params['goal_events'] else ''}"
+        tournament = Tournament.objects.filter(slug=slug).first()
+        if tournament is None or regenerate:
+            self.stdout.write(f"Generating {slug}...")
+            call_command(
+                'generate_tournament', teams=size, matches_per_team=params['matches_per_team'],
+                seed=params['seed'], goal_events=params['goal_events'], slug=slug, replace=True,
+                stdout=self.stdout if self.verbosity > 1 else StringIO(),
+            )
+            tournament = Tournament.objects.get(slug=slug)
+        return tournament
+
+    def benchmarks(self, tournament, directory):
+        """(name, callable) for every hot path, run against `tournament`."""
+        slug = tournament.slug
+        team = tournament.teams.order_by('pk').first()
+        return [
+            ('calculate_standings', lambda: calculate_standings(tournament)),
+            ('update_top_scorers', lambda: update_top_scorers(tournament)),
+            ('page:home', self.view('home', slug=slug)),
+            ('page:standings', self.view('standings', slug=slug)),
+            ('page:bracket', self.view('bracket', slug=slug)),
+            ('page:top_scorers', self.view('top_scorers', slug=slug)),
+            ('page:upcoming', self.view('upcoming', slug=slug)),
+            ('page:upcoming_calendar', self.view('upcoming_calendar', slug=slug)),
+            ('api:standings', self.view('api-tournament:standings', slug=slug)),
+            ('api:bracket', self.view('api-tournament:bracket', slug=slug)),
+            ('api:scorers', self.view('api-tournament:scorers', slug=slug)),
+            ('api:upcoming', self.view('api-tournament:upcoming', slug=slug)),
+            ('api:finished', self.view('api-tournament:finished', slug=slug)),
+            ('admin:match_list', self.view('match_list', slug=slug)),
+            ('admin:match_list_filtered', self.view('match_list', f"?status=FINISHED&team={team.pk}&q=team", slug=slug)),
+            ('admin:matchday', self.view('matchday', slug=slug)),
+            ('import_results', self.import_results(tournament, directory)),
+        ]
+
+    def view(self, name, query='', **kwargs):
+        path = reverse(name, kwargs=kwargs)
+        match = resolve(path)
+        url = path + query
+
+        def call():
+            request = self.factory.get(url)
+            request.user = self.user
+            response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.streaming:
+                for chunk in response.streaming_content:
+                    pass
+            if response.status_code != 200:
+                raise CommandError(f"{url} answered {response.status_code}")
+        return call
+
+    def import_results(self, tournament, directory):
+        # Existing results with new scores: every row is an update, rolled back by --dry-run
+        path = os.path.join(directory, 'results.csv')
+        matches = (
+            SingleMatch.objects.filter(tournament=tournament, status='FINISHED', fixture=None)
+            .select_related('home_team', 'away_team').order_by('pk')[:IMPORT_ROWS]
+        )
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['home_team', 'away_team', 'leg', 'home_goals', 'away_goals'])
+            for match in matches:
+                writer.writerow([match.home_team.name, match.away_team.name, match.leg, match.away_goals + 1, match.home_goals])
+
+        def call():
+            call_command('import_results', path, tournament=tournament.slug, dry_run=True, stdout=StringIO(), stderr=StringIO())
+        return call
+
+    def measure(self, func):
+        # Warm up (imports, template compilation), then count queries and peak
+        # memory on a pass of their own, since recording both slows it down
+        cache.clear()
+        func()
+        cache.clear()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings = []
+        # Without DEBUG's query log, as in production
+        with override_settings(DEBUG=False):
+            for _ in range(self.repeat):
+                cache.clear()
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+        return {
+            'seconds': statistics.median(timings),
+            'min_seconds': min(timings),
+            'queries': len(queries),
+            'peak_kb': peak // 1024,
+        }
+
+    def format_row(self, name, result, note=''):
+        return (
+            f"  {name:<28} {result['seconds'] * 1000:>10.1f} ms {result['queries']:>6} queries "
+            f"{result['peak_kb']:>9} KB peak{note}"
+        )
+
+    def compare(self, baseline, results, tolerance):
+        """Prints the changes against the baseline; returns the number of regressions."""
+        regressions = 0
+        self.stdout.write(self.style.MIGRATE_HEADING("Compared with the baseline"))
+        for size, benchmarks in results.items():
+            for name, result in benchmarks.items():
+                base = baseline.get(size, {}).get(name)
+                if base is None:
+                    self.stdout.write(self.format_row(f"{size}/{name}", result, "  (new)"))
+                    continue
+                problems = []
+                if result['queries'] > base['queries']:
+                    problems.append(f"queries {base['queries']} -> {result['queries']}")
+                if (result['seconds'] > base['seconds'] * (1 + tolerance)
+                        and result['seconds'] - base['seconds'] > MIN_SECONDS_DELTA):
+                    problems.append(f"time {base['seconds'] * 1000:.1f} -> {result['seconds'] * 1000:.1f} ms")
+                if (result['peak_kb'] > base['peak_kb'] * (1 + tolerance)
+                        and result['peak_kb'] - base['peak_kb'] > MIN_MEMORY_DELTA_KB):
+                    problems.append(f"memory {base['peak_kb']} -> {result['peak_kb']} KB")
+                change = (result['seconds'] / base['seconds'] - 1) * 100 if base['seconds'] else 0
+                row = self.format_row(f"{size}/{name}", result, f"  {change:+.0f}%")
+                if problems:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(f"{row}  REGRESSION: {', '.join(problems)}"))
+                else:
+                    self.stdout.write(row)
+        return regressions
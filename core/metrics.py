@@ -0,0 +1,333 @@
+import fcntl
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates, Template
+
+# Per-view request metrics (latency, SQL query count and time, template render
+# time) for Prometheus, without DEBUG. Each process keeps its numbers in memory
+# and writes a snapshot to METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL
+# seconds (and on a timer while idle); /metrics adds up the snapshots of all
+# processes, so gunicorn workers can be scraped through any one of them.
+
+# Upper bounds of the histogram buckets (+Inf is implied)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = {
+    'requests_total': ('counter', "Requests handled, by view, method and status code.", None),
+    'request_duration_seconds': ('histogram', "Time to produce the response.", SECONDS_BUCKETS),
+    'request_queries': ('histogram', "SQL queries per sampled request.", QUERY_BUCKETS),
+    'request_db_seconds': ('histogram', "Time spent in SQL queries per sampled request.", SECONDS_BUCKETS),
+    'request_template_seconds': (
+        'histogram', "Template rendering time per sampled request (including queries run while rendering).",
+        SECONDS_BUCKETS,
+    ),
+}
+PREFIX = 'kaalapani_'
+
+# Totals of exited workers, folded in from their snapshots so counters never go down
+RETIRED_FILE = 'retired.json'
+
+# Collector of the request being handled; copied into sync_to_async threads with the context
+_current = ContextVar('request_metrics', default=None)
+
+class RequestMetrics:
+    """What one sampled request spent on SQL and templates."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template_time * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+class Registry:
+    """Counters and histograms of this process, keyed by metric name and label string."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {name: {} for name in METRICS}
+        self.flushed_at = None
+        # Process that last wrote the snapshot, and the one the heartbeat thread runs in
+        # (a forked worker has neither)
+        self.pid = None
+        self.heartbeat_pid = None
+        self.stopped = threading.Event()
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            series = self.samples[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self.lock:
+            series = self.samples[name].get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum and count
+                series = self.samples[name][labels] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.samples))
+
+    def flush(self, force=False):
+        """Writes this process's snapshot for the other processes' /metrics, at most once per interval."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and self.flushed_at is not None and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        if self.pid != os.getpid():
+            # A snapshot already under this pid was left by an exited process the pid was reused from
+            retire_snapshot(directory, path)
+            self.pid = os.getpid()
+        if self.heartbeat_pid != os.getpid():
+            self.start_heartbeat()
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        # Readers only ever see a complete file
+        os.replace(temporary, path)
+
+    def start_heartbeat(self):
+        # Keeps the snapshot current while the worker is idle, so it reads as alive with its latest numbers
+        self.heartbeat_pid = os.getpid()
+        self.stopped = threading.Event()
+        threading.Thread(target=self.heartbeat, args=(self.stopped,), name='metrics-heartbeat', daemon=True).start()
+
+    def heartbeat(self, stopped):
+        while not stopped.wait(settings.METRICS_FLUSH_INTERVAL):
+            try:
+                self.flush(force=True)
+            except OSError:
+                continue
+
+    def stop_heartbeat(self):
+        self.stopped.set()
+        self.heartbeat_pid = None
+
+registry = Registry()
+
+def merge_snapshots(snapshots):
+    merged = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            if name not in merged:
+                continue
+            for labels, value in series.items():
+                total = merged[name].get(labels)
+                if total is None:
+                    merged[name][labels] = json.loads(json.dumps(value))
+                elif isinstance(value, dict):
+                    if len(value['buckets']) != len(total['buckets']):
+                        # Written with other bucket bounds (before a deploy)
+                        continue
+                    total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+                    total['sum'] += value['sum']
+                    total['count'] += value['count']
+                else:
+                    merged[name][labels] = total + value
+    return merged
+
+def read_snapshot(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process
+        return True
+    return True
+
+def retire_snapshot(directory, path):
+    """Adds the snapshot of an exited process to RETIRED_FILE and removes it."""
+    # Claim it first, so two processes scraping at once don't both count it
+    claimed = f"{path}.{os.getpid()}.retiring"
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return
+    with open(os.path.join(directory, f"{RETIRED_FILE}.lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = os.path.join(directory, RETIRED_FILE)
+        snapshots = [read_snapshot(retired), read_snapshot(claimed)]
+        temporary = f"{retired}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as handle:
+            json.dump(merge_snapshots(snapshot for snapshot in snapshots if snapshot), handle)
+        os.replace(temporary, retired)
+        os.remove(claimed)
+
+def collect():
+    """Samples of every process: the snapshots in METRICS_DIR, with this process's live numbers."""
+    snapshots = [registry.snapshot()]
+    directory = settings.METRICS_DIR
+    own = f"{os.getpid()}.json"
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            pid, extension = os.path.splitext(filename)
+            if extension != '.json' or not pid.isdigit() or filename == own:
+                continue
+            path = os.path.join(directory, filename)
+            if not is_running(int(pid)):
+                retire_snapshot(directory, path)
+                continue
+            snapshots.append(read_snapshot(path))
+        # Read after the loop, so it includes the workers retired just now
+        snapshots.append(read_snapshot(os.path.join(directory, RETIRED_FILE)))
+    return merge_snapshots(snapshot for snapshot in snapshots if snapshot)
+
+def render_metrics(samples):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        full_name = PREFIX + name
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in sorted(samples[name].items()):
+            if kind == 'counter':
+                lines.append(f"{full_name}{{{labels}}} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], value['buckets']):
+                cumulative += count
+                lines.append(f'{full_name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{full_name}_sum{{{labels}}} {value['sum']}")
+            lines.append(f"{full_name}_count{{{labels}}} {value['count']}")
+    return '\n'.join(lines) + '\n'
+
+def label_string(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+# --- Instrumentation ---
+
+def record_query(execute, sql, params, many, context):
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.queries += 1
+        collector.db_time += time.perf_counter() - start
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created receiver: every database connection reports to the current request
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        collector = _current.get()
+        if collector is None:
+            return super().render(context, request)
+        # Only the outermost render counts when a template renders another one
+        collector.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            collector.template_depth -= 1
+            if not collector.template_depth:
+                collector.template_time += time.perf_counter() - start
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for the request metrics (TEMPLATES BACKEND)."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+class MetricsMiddleware:
+    """
+    Records every request's latency and status, plus the SQL and template
+    timings of a METRICS_SAMPLE_RATE share of them, which also get a
+    Server-Timing header for the browser's network panel. Put it first in
+    MIDDLEWARE so the latency covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        collector, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, collector, start)
+
+    async def __acall__(self, request):
+        collector, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, collector, start)
+
+    def start(self):
+        sampled = random.random() < settings.METRICS_SAMPLE_RATE
+        collector = RequestMetrics() if sampled else None
+        return collector, _current.set(collector), time.perf_counter()
+
+    def finish(self, request, response, collector, start):
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.inc('requests_total', label_string(view=view, method=request.method, status=response.status_code))
+        labels = label_string(view=view)
+        registry.observe('request_duration_seconds', labels, total)
+        if collector is not None:
+            registry.observe('request_queries', labels, collector.queries)
+            registry.observe('request_db_seconds', labels, collector.db_time)
+            registry.observe('request_template_seconds', labels, collector.template_time)
+            if settings.METRICS_SERVER_TIMING:
+                timing = collector.server_timing(total)
+                if response.has_header('Server-Timing'):
+                    timing = f"{response['Server-Timing']}, {timing}"
+                response['Server-Timing'] = timing
+        registry.flush()
+        return response
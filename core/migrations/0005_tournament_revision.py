@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_singlematch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_tournament_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='data_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
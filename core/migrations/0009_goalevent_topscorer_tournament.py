@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_scorer_tournament(apps, schema_editor):
+    TopScorer = apps.get_model('core', 'TopScorer')
+    Team = apps.get_model('core', 'Team')
+    TopScorer.objects.update(
+        tournament=Subquery(Team.objects.filter(pk=OuterRef('team_id')).values('tournament_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recomputejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('player_name', models.CharField(max_length=100)),
+                ('minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('own_goal', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['minute', 'pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='topscorer',
+            name='tournament',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scorers', to='core.tournament'),
+        ),
+        migrations.AddIndex(
+            model_name='topscorer',
+            index=models.Index(fields=['tournament', '-goals'], name='topscorer_leaderboard_idx'),
+        ),
+        migrations.RunPython(backfill_scorer_tournament, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='goalevent',
+            name='match',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goals', to='core.singlematch'),
+        ),
+        migrations.AddField(
+            model_name='goalevent',
+            name='team',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_events', to='core.team'),
+        ),
+    ]
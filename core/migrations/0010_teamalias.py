@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_goalevent_topscorer_tournament'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100)),
+                ('normalized', models.CharField(db_index=True, editable=False, max_length=100)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='core.team')),
+            ],
+            options={
+                'verbose_name_plural': 'Team aliases',
+                'constraints': [models.UniqueConstraint(fields=('team', 'normalized'), name='unique_team_alias')],
+            },
+        ),
+    ]
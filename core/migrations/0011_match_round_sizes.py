@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_teamalias'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='match',
+            name='round',
+            field=models.CharField(choices=[('R256', 'Round of 256'), ('R128', 'Round of 128'), ('R64', 'Round of 64'), ('R32', 'Round of 32'), ('R16', 'Round of 16'), ('QF', 'Quarter Final'), ('SF', 'Semi Final'), ('F', 'Final')], max_length=4),
+        ),
+    ]
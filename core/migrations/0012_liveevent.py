@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_match_round_sizes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('match', 'Match'), ('standings', 'Standings'), ('bracket', 'Bracket'), ('refresh', 'Refresh')], max_length=10)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='live_events', to='core.tournament')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', 'id'], name='liveevent_replay_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_match_tournament(apps, schema_editor):
+    SingleMatch = apps.get_model('core', 'SingleMatch')
+    Team = apps.get_model('core', 'Team')
+    SingleMatch.objects.update(
+        tournament=Subquery(Team.objects.filter(pk=OuterRef('home_team_id')).values('tournament_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_liveevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='singlematch',
+            name='tournament',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='single_matches', to='core.tournament'),
+        ),
+        migrations.RunPython(backfill_match_tournament, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'round'], name='match_round_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='singlematch',
+            index=models.Index(fields=['tournament', 'status', 'match_datetime'], name='singlematch_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='singlematch',
+            index=models.Index(fields=['home_team', 'status'], name='singlematch_home_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='singlematch',
+            index=models.Index(fields=['away_team', 'status'], name='singlematch_away_status_idx'),
+        ),
+    ]
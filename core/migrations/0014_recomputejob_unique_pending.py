@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+def merge_pending_jobs(apps, schema_editor):
+    # Jobs queued before the constraint may include several pending ones per tournament
+    RecomputeJob = apps.get_model('core', 'RecomputeJob')
+    pending = RecomputeJob.objects.filter(status='PENDING')
+    for tournament_id in list(pending.values_list('tournament_id', flat=True).distinct()):
+        jobs = list(pending.filter(tournament_id=tournament_id).order_by('created_at', 'pk'))
+        if len(jobs) > 1:
+            first = jobs[0]
+            first.events = sum(job.events for job in jobs)
+            first.save(update_fields=['events'])
+            RecomputeJob.objects.filter(pk__in=[job.pk for job in jobs[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_singlematch_tournament_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_pending_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recomputejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('tournament',), name='unique_pending_recompute_job'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+def merge_duplicate_scorers(apps, schema_editor):
+    # Concurrent first goals of a player could have created two leaderboard rows
+    TopScorer = apps.get_model('core', 'TopScorer')
+    rows = {}
+    for scorer in TopScorer.objects.order_by('pk'):
+        key = (scorer.team_id, scorer.player_name)
+        kept = rows.setdefault(key, scorer)
+        if kept is not scorer:
+            kept.goals += scorer.goals
+            kept.photo = kept.photo or scorer.photo
+            kept.save(update_fields=['goals', 'photo'])
+            scorer.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recomputejob_unique_pending'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_scorers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='topscorer',
+            constraint=models.UniqueConstraint(fields=('team', 'player_name'), name='unique_team_scorer'),
+        ),
+    ]
@@ -1,9 +1,18 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils.text import slugify
 
+# Stands in for a SingleMatch leg result that hasn't been read from the database
+_UNSYNCED = object()
+
 class Tournament(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, blank=True)
+    # Bumped on every write to the tournament's matches, teams or scorers (see core.cache)
+    revision = models.PositiveIntegerField(default=0, editable=False)
+    data_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Revision produced by the last full standings/scorers rebuild, used to coalesce concurrent rebuilds
+    rebuilt_revision = models.PositiveIntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -32,8 +41,43 @@ class Team(models.Model):
     def __str__(self):
         return self.name
 
+class TeamAlias(models.Model):
+    """
+    Another name a team goes by in result sheets (nickname, typo, short form),
+    used by core.resolver.TeamResolver when matching imported names to teams.
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100)
+    normalized = models.CharField(max_length=100, editable=False, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Team aliases"
+        constraints = [models.UniqueConstraint(fields=['team', 'normalized'], name='unique_team_alias')]
+
+    def clean(self):
+        # `normalized` isn't a form field, so forms would skip the constraint on it
+        from .resolver import normalize_name
+        self.normalized = normalize_name(self.alias)
+        try:
+            self.validate_constraints()
+        except ValidationError:
+            raise ValidationError({'alias': "The team already has this alias (ignoring case and accents)."})
+
+    def save(self, *args, **kwargs):
+        from .resolver import normalize_name
+        self.normalized = normalize_name(self.alias)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.alias} -> {self.team}"
+
 class Match(models.Model):
+    # First round to final; brackets start at whichever round fits the number of teams
     ROUND_CHOICES = [
+        ('R256', 'Round of 256'),
+        ('R128', 'Round of 128'),
+        ('R64', 'Round of 64'),
+        ('R32', 'Round of 32'),
         ('R16', 'Round of 16'),
         ('QF', 'Quarter Final'),
         ('SF', 'Semi Final'),
@@ -55,10 +99,13 @@ class Match(models.Model):
     score_leg2_b = models.IntegerField(default=0)
     
     winner = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='matches_won')
-    round = models.CharField(max_length=3, choices=ROUND_CHOICES)
+    round = models.CharField(max_length=4, choices=ROUND_CHOICES)
     next_match = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='previous_matches')
 
-    def save(self, *args, **kwargs):
+    class Meta:
+        indexes = [models.Index(fields=['tournament', 'round'], name='match_round_idx')]
+
+    def update_aggregate(self):
         # Calculate aggregate for two-legged matches
         if self.round != 'F':
             self.score_a = self.score_leg1_a + self.score_leg2_a
@@ -66,11 +113,31 @@ class Match(models.Model):
             
         if self.score_a is not None and self.score_b is not None:
             if self.score_a > self.score_b:
-                self.winner = self.team_a
+                self.winner_id = self.team_a_id
             elif self.score_b > self.score_a:
-                self.winner = self.team_b
-            
-        super().save(*args, **kwargs)
+                self.winner_id = self.team_b_id
+
+    def set_leg_score(self, leg, home_team_id, home_goals, away_goals):
+        # Store a leg result from the home side's perspective on the fixture's A/B sides
+        if home_team_id == self.team_a_id:
+            score_a, score_b = home_goals, away_goals
+        else:
+            score_a, score_b = away_goals, home_goals
+        if leg == 1:
+            self.score_leg1_a, self.score_leg1_b = score_a, score_b
+            if self.round == 'F':
+                # Single-leg final: the leg score is the result
+                self.score_a, self.score_b = score_a, score_b
+        elif leg == 2:
+            self.score_leg2_a, self.score_leg2_b = score_a, score_b
+
+    def save(self, *args, **kwargs):
+        from .bracket import advance_winner
+        self.update_aggregate()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Send the winner on to the next round's fixture
+            advance_winner(self)
 
     def __str__(self):
         return f"{self.team_a} vs {self.team_b} ({self.round})"
@@ -84,6 +151,8 @@ class SingleMatch(models.Model):
     fixture = models.ForeignKey(Match, on_delete=models.SET_NULL, null=True, blank=True, related_name='single_matches')
     home_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='home_matches')
     away_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='away_matches')
+    # Denormalized from home_team so per-tournament match lists don't join through Team
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='single_matches', null=True, editable=False)
     leg = models.IntegerField(default=1)
     match_datetime = models.DateTimeField(null=True, blank=True)
     home_goals = models.IntegerField(null=True, blank=True)
@@ -93,36 +162,157 @@ class SingleMatch(models.Model):
     class Meta:
         verbose_name = "Match (Individual)"
         verbose_name_plural = "Matches (Individual)"
+        indexes = [
+            # Upcoming/finished lists of a tournament, in date order
+            models.Index(fields=['tournament', 'status', 'match_datetime'], name='singlematch_schedule_idx'),
+            # Finished matches of a team on either side (standings)
+            models.Index(fields=['home_team', 'status'], name='singlematch_home_status_idx'),
+            models.Index(fields=['away_team', 'status'], name='singlematch_away_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Sync with Fixture (Match) if linked
-        if self.fixture and self.status == 'FINISHED':
-            if self.leg == 1:
-                # Determine if home_team is team_a or team_b in fixture
-                if self.home_team == self.fixture.team_a:
-                    self.fixture.score_leg1_a = self.home_goals
-                    self.fixture.score_leg1_b = self.away_goals
-                else:
-                    self.fixture.score_leg1_b = self.home_goals
-                    self.fixture.score_leg1_a = self.away_goals
-            elif self.leg == 2:
-                if self.home_team == self.fixture.team_a:
-                    self.fixture.score_leg2_a = self.home_goals
-                    self.fixture.score_leg2_b = self.away_goals
-                else:
-                    self.fixture.score_leg2_b = self.home_goals
-                    self.fixture.score_leg2_a = self.away_goals
-            self.fixture.save()
+        # Follow the home team (free when it was just assigned, e.g. by a form)
+        home_team_field = self._meta.get_field('home_team')
+        if home_team_field.is_cached(self) and self.home_team is not None:
+            self.tournament_id = self.home_team.tournament_id
+        elif self.tournament_id is None and self.home_team_id:
+            self.tournament_id = Team.objects.filter(pk=self.home_team_id).values_list('tournament_id', flat=True).first()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'home_team' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'tournament'}
+        # One transaction, so a result the bracket refuses (BracketConflict) isn't saved either
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Copy a finished leg onto its fixture, unless none of the columns the
+            # fixture depends on changed since the match was loaded or last saved
+            result = self._fixture_result()
+            if result != self._synced_result:
+                from .revisions import bump_revision
+                from .utils import sync_fixture_scores
+                if sync_fixture_scores([self]):
+                    bump_revision(self.tournament_id)
+        self._synced_result = result
+
+    # Leg result as last seen in the database (see _fixture_result); unknown until loaded
+    _synced_result = _UNSYNCED
+    FIXTURE_RESULT_FIELDS = {'fixture_id', 'home_team_id', 'leg', 'status', 'home_goals', 'away_goals'}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.FIXTURE_RESULT_FIELDS.issubset(field_names):
+            instance._synced_result = instance._fixture_result()
+        return instance
+
+    def _fixture_result(self):
+        if not self.fixture_id or self.status != 'FINISHED':
+            return None
+        return (self.fixture_id, self.home_team_id, self.leg, self.home_goals, self.away_goals)
 
     def __str__(self):
         return f"{self.home_team} vs {self.away_team} (Leg {self.leg})"
 
+class GoalEvent(models.Model):
+    """
+    One goal in a SingleMatch. `team` is the side credited with the goal; for an
+    own goal that is the opponent of the player, and it doesn't count for the scorer.
+    The TopScorer leaderboard is kept up to date from these incrementally (core.signals).
+    """
+    match = models.ForeignKey(SingleMatch, on_delete=models.CASCADE, related_name='goals')
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='goal_events')
+    player_name = models.CharField(max_length=100)
+    minute = models.PositiveSmallIntegerField(null=True, blank=True)
+    own_goal = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['minute', 'pk']
+
+    def __str__(self):
+        suffix = " (OG)" if self.own_goal else ""
+        return f"{self.player_name} {self.minute or '?'}'{suffix}"
+
 class TopScorer(models.Model):
     player_name = models.CharField(max_length=100)
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='scorers')
+    # Denormalized from team so the leaderboard is one index range scan
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='scorers', null=True, editable=False)
     goals = models.IntegerField(default=0)
     photo = models.ImageField(upload_to='players/', blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['tournament', '-goals'], name='topscorer_leaderboard_idx')]
+        # One leaderboard row per player, however many goal events arrive at once
+        constraints = [models.UniqueConstraint(fields=['team', 'player_name'], name='unique_team_scorer')]
+
+    def save(self, *args, **kwargs):
+        if self.tournament_id is None and self.team_id:
+            self.tournament_id = self.team.tournament_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.player_name} ({self.goals})"
+
+class RecomputeJob(models.Model):
+    """
+    A "tournament X is dirty" event for the recompute worker (manage.py recompute_worker).
+    Bursts of edits are coalesced into the single PENDING job of the tournament.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='recompute_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    # Number of dirty events folded into this job
+    events = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        constraints = [
+            # What makes coalescing in enqueue_rebuild safe between concurrent writers
+            models.UniqueConstraint(
+                fields=['tournament'], condition=models.Q(status='PENDING'), name='unique_pending_recompute_job',
+            ),
+        ]
+
+    @property
+    def latency(self):
+        # Time from the first dirty event to the rebuild being done
+        if self.finished_at:
+            return self.finished_at - self.created_at
+        return None
+
+    def __str__(self):
+        return f"{self.tournament} rebuild ({self.status})"
+
+class LiveEvent(models.Model):
+    """
+    A change pushed to live feed subscribers (core.live): a match score, some
+    standings rows or a bracket advancement, as a compact JSON diff. Written in
+    the same transaction as the change, and read by every web process, so the
+    feed needs no message broker. Old rows are pruned by the writers (core.live.publish).
+    """
+    KIND_CHOICES = [
+        ('match', 'Match'),
+        ('standings', 'Standings'),
+        ('bracket', 'Bracket'),
+        ('refresh', 'Refresh'),
+    ]
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='live_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['tournament', 'id'], name='liveevent_replay_idx')]
+
+    def __str__(self):
+        return f"{self.tournament} {self.kind} #{self.pk}"
@@ -0,0 +1,149 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Opt-in cProfile captures of the hot views and of the standings/scorers
+# rebuilds, for slowdowns that only show up with production data. A call is
+# profiled when a staff user asks for it (X-Profile: 1 header or ?profile=1) or
+# for a PROFILE_SAMPLE_RATE share of calls. Captures are .prof files (pstats
+# format: snakeviz, or flameprof for a flame graph) in PROFILE_DIR, where only
+# the newest PROFILE_KEEP are kept, listed at /custom-admin/profiles/.
+
+# Set while this thread is being profiled: nested profiled calls are part of that capture
+_state = threading.local()
+
+CAPTURE_ID = re.compile(r'^\d+-\d+-[\w.]+$')
+
+def profile_view(name):
+    """Profiles a sync view when a staff user asks for it, or for a sample of requests."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not (profile_requested(request) or sampled()):
+                return view(request, *args, **kwargs)
+            response, capture_id = run_profiled(name, request.get_full_path(), view, request, *args, **kwargs)
+            if capture_id:
+                response['X-Profile-Id'] = capture_id
+            return response
+        return wrapper
+    return decorator
+
+def profiled(name):
+    """Profiles a sample of calls to a (recompute) function, and every call inside a profiled request."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_state, 'active', False) or not sampled():
+                return func(*args, **kwargs)
+            return run_profiled(name, name, func, *args, **kwargs)[0]
+        return wrapper
+    return decorator
+
+def profile_requested(request):
+    flag = request.headers.get('X-Profile') or request.GET.get('profile')
+    # Only look the user up when asked, so unflagged requests cost nothing
+    return bool(flag) and flag != '0' and request.user.is_staff
+
+def sampled():
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+def run_profiled(name, label, func, *args, **kwargs):
+    """Calls func under cProfile and saves the capture. Returns (result, capture id or None)."""
+    if getattr(_state, 'active', False):
+        return func(*args, **kwargs), None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler owns this thread
+        return func(*args, **kwargs), None
+    _state.active = True
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        _state.active = False
+        duration = time.perf_counter() - start
+    return result, save_capture(profiler, name, label, duration)
+
+def save_capture(profiler, name, label, duration):
+    directory = settings.PROFILE_DIR
+    capture_id = f"{time.time_ns()}-{os.getpid()}-{name}"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, capture_id)
+        profiler.dump_stats(f"{path}.prof.tmp")
+        os.replace(f"{path}.prof.tmp", f"{path}.prof")
+        meta = {
+            'id': capture_id,
+            'name': name,
+            'label': label,
+            'duration': duration,
+            'created_at': timezone.now().isoformat(),
+        }
+        with open(f"{path}.json.tmp", 'w') as handle:
+            json.dump(meta, handle)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+        prune_captures()
+    except OSError:
+        logger.warning("Could not save profile %s", capture_id, exc_info=True)
+        return None
+    return capture_id
+
+def prune_captures():
+    # Ring buffer: the ids sort by creation time, so drop from the front
+    directory = settings.PROFILE_DIR
+    ids = sorted(
+        filename[:-len('.prof')] for filename in os.listdir(directory) if filename.endswith('.prof')
+    )
+    for capture_id in ids[:max(len(ids) - settings.PROFILE_KEEP, 0)]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(directory, capture_id + suffix))
+            except FileNotFoundError:
+                pass
+
+def list_captures():
+    """Metadata of the kept captures, newest first."""
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    captures = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as handle:
+                captures.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return captures
+
+def capture_path(capture_id):
+    """Path of a capture's .prof file, or None if the id is malformed or the capture was dropped."""
+    if not CAPTURE_ID.match(capture_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, f"{capture_id}.prof")
+    return path if os.path.exists(path) else None
+
+def capture_summary(path, limit=40):
+    """The top functions of a capture by cumulative time, as pstats prints them."""
+    stream = io.StringIO()
+    stats = pstats.Stats(path, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
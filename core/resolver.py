@@ -0,0 +1,157 @@
+import unicodedata
+from collections import Counter, defaultdict
+
+def normalize_name(name):
+    """Normalize name for case-, accent- and whitespace-insensitive comparison."""
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(name.lower().replace('.', ' ').split())
+
+def edit_distance(a, b, limit=None):
+    """
+    Levenshtein distance between two strings. With `limit`, gives up early and
+    returns limit + 1 once the distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class Resolution:
+    """
+    Outcome of resolving one name: `team_id` is set for an 'exact' or 'fuzzy'
+    match; 'ambiguous' and 'unknown' leave it None and list the best candidates
+    as (team_id, matched key, score) so the caller can report them.
+    """
+
+    def __init__(self, status, team_id=None, candidates=()):
+        self.status = status
+        self.team_id = team_id
+        self.candidates = list(candidates)
+
+    def __bool__(self):
+        return self.team_id is not None
+
+    def __repr__(self):
+        return f"<Resolution {self.status} team={self.team_id} candidates={self.candidates}>"
+
+class TeamResolver:
+    """
+    Matches free-text team names (import_results, update_results.py) to teams
+    of one tournament; the admin forms pick teams by id and the API is read-only.
+    Built once from the team names and the TeamAlias table, then:
+
+    1. exact lookup of the normalized name in a dict,
+    2. candidate keys from a trigram index plus a word-prefix index,
+    3. ranking of those candidates by edit distance (whole name or any word).
+
+    A fuzzy match is only accepted when one team clearly beats the others;
+    otherwise the result is 'ambiguous' rather than a guess.
+    """
+
+    MIN_SCORE = 0.75
+    # A fuzzy winner must beat the runner-up team by this much
+    MARGIN = 0.05
+    MAX_CANDIDATES = 25
+
+    def __init__(self, names=()):
+        self.exact = defaultdict(set)
+        self.trigram_index = defaultdict(set)
+        self.prefix_index = defaultdict(set)
+        for team_id, name in names:
+            self.add_alias(name, team_id)
+
+    @classmethod
+    def for_tournament(cls, tournament):
+        from .models import Team, TeamAlias
+
+        names = list(Team.objects.filter(tournament=tournament).values_list('pk', 'name'))
+        names += TeamAlias.objects.filter(team__tournament=tournament).values_list('team_id', 'normalized')
+        return cls(names)
+
+    def add_alias(self, name, team_id):
+        key = normalize_name(name)
+        if not key:
+            return
+        self.exact[key].add(team_id)
+        for gram in _trigrams(key):
+            self.trigram_index[gram].add(key)
+        for word in key.split():
+            self.prefix_index[word[:3]].add(key)
+
+    def resolve(self, name):
+        query = normalize_name(name)
+        if not query:
+            return Resolution('unknown')
+
+        team_ids = self.exact.get(query)
+        if team_ids:
+            if len(team_ids) == 1:
+                return Resolution('exact', next(iter(team_ids)))
+            return Resolution('ambiguous', candidates=[(team_id, query, 1.0) for team_id in sorted(team_ids)])
+
+        if len(query) < 3:
+            # Too short to tell teams apart by spelling
+            return Resolution('unknown')
+
+        # Best score per team over all its names and aliases
+        best = {}
+        for key in self._candidate_keys(query):
+            score = self._score(query, key)
+            for team_id in self.exact[key]:
+                if score > best.get(team_id, (0.0, None))[0]:
+                    best[team_id] = (score, key)
+
+        ranked = sorted(((score, key, team_id) for team_id, (score, key) in best.items()), reverse=True)
+        candidates = [(team_id, key, round(score, 3)) for score, key, team_id in ranked[:5]]
+        if not ranked or ranked[0][0] < self.MIN_SCORE:
+            return Resolution('unknown', candidates=candidates)
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < self.MARGIN:
+            close = [c for c in candidates if c[2] >= ranked[0][0] - self.MARGIN]
+            return Resolution('ambiguous', candidates=close)
+        return Resolution('fuzzy', ranked[0][2], candidates=candidates)
+
+    def resolve_id(self, name):
+        return self.resolve(name).team_id
+
+    def _candidate_keys(self, query):
+        shared = Counter()
+        for gram in _trigrams(query):
+            for key in self.trigram_index.get(gram, ()):
+                shared[key] += 1
+        keys = {key for key, count in shared.most_common(self.MAX_CANDIDATES)}
+        for word in query.split():
+            keys |= self.prefix_index.get(word[:3], set())
+        return keys
+
+    def _score(self, query, key):
+        words = key.split()
+        query_words = query.split()
+        # "musthafa" -> "mohammed musthafa v": every query word is a word of the name
+        if all(word in words for word in query_words):
+            return 0.9 + 0.1 * len(query) / len(key)
+
+        def similarity(a, b):
+            longest = max(len(a), len(b))
+            limit = int(longest * (1 - self.MIN_SCORE)) + 1
+            return 1 - edit_distance(a, b, limit) / longest
+
+        score = similarity(query, key)
+        if len(query_words) == 1:
+            # Typo in one word of a longer name: "jisnnu" -> "jishnu s s"
+            score = max([score] + [0.95 * similarity(query, word) for word in words])
+        return score
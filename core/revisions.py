@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.db.models.functions import Now
+
+from .models import Tournament
+
+_state = threading.local()
+
+def bump_revision(tournament_id):
+    """
+    Marks the tournament's public data as changed. Every cached page is keyed by
+    the revision, so bumping it invalidates them across all workers at once.
+    Inside deferred_revision_bump() the bump is collected and applied on exit.
+    """
+    if tournament_id is None:
+        return
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.add(tournament_id)
+        return
+    Tournament.objects.filter(pk=tournament_id).update(revision=F('revision') + 1, data_updated_at=Now())
+
+@contextmanager
+def deferred_revision_bump():
+    """
+    Collapses all revision bumps inside the block into one UPDATE per tournament,
+    so a rebuild that rewrites many rows doesn't hammer the Tournament row.
+    Yields the set of pending tournament ids; discard an id to skip its bump.
+    Use it inside transaction.atomic(): when the block raises, its writes are
+    rolled back and the bumps are dropped with them.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        # Nested: the outermost block applies the bumps
+        yield _state.pending
+        return
+
+    _state.pending = set()
+    try:
+        yield _state.pending
+    except BaseException:
+        # The block's writes are being rolled back, so nothing changed
+        _state.pending = None
+        raise
+    pending, _state.pending = _state.pending, None
+    for tournament_id in pending:
+        bump_revision(tournament_id)
@@ -0,0 +1,75 @@
+from rest_framework import serializers
+
+from .models import Match, SingleMatch, Team, TopScorer, Tournament
+
+class FieldSelectionMixin:
+    """
+    Lets the API trim payloads with ?fields=a,b: pass `fields` to the serializer
+    and every other field is dropped (works with many=True as well).
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class TournamentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tournament
+        fields = ['id', 'name', 'slug', 'revision', 'data_updated_at']
+
+class TeamBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'logo']
+
+class StandingSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    position = serializers.IntegerField(read_only=True)
+    goal_difference = serializers.IntegerField(source='gd', read_only=True)
+
+    class Meta:
+        model = Team
+        fields = [
+            'position', 'id', 'name', 'logo', 'played', 'wins', 'draws', 'losses',
+            'goals_scored', 'goals_conceded', 'goal_difference', 'points',
+        ]
+
+class SingleMatchSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    home_team = TeamBriefSerializer(read_only=True)
+    away_team = TeamBriefSerializer(read_only=True)
+    round = serializers.CharField(source='fixture.round', default=None, read_only=True)
+
+    class Meta:
+        model = SingleMatch
+        fields = [
+            'id', 'fixture', 'round', 'leg', 'match_datetime', 'status',
+            'home_team', 'away_team', 'home_goals', 'away_goals',
+        ]
+
+class LegSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SingleMatch
+        fields = ['id', 'leg', 'match_datetime', 'status', 'home_team', 'away_team', 'home_goals', 'away_goals']
+
+class BracketMatchSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    team_a = TeamBriefSerializer(read_only=True)
+    team_b = TeamBriefSerializer(read_only=True)
+    # Prefetched by Bracket.for_tournament
+    legs = LegSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Match
+        fields = [
+            'id', 'round', 'team_a', 'team_b', 'score_a', 'score_b',
+            'score_leg1_a', 'score_leg1_b', 'score_leg2_a', 'score_leg2_b',
+            'winner', 'next_match', 'legs',
+        ]
+
+class TopScorerSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    team = TeamBriefSerializer(read_only=True)
+
+    class Meta:
+        model = TopScorer
+        fields = ['id', 'player_name', 'team', 'goals', 'photo']
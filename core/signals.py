@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .live import publish_match
+from .revisions import bump_revision
+from .models import GoalEvent, Match, SingleMatch, Team, TopScorer, Tournament
+from .utils import (
+    apply_scorer_delta, clear_tournament_directory, scorer_key, sync_fixture_scores, update_top_scorers,
+)
+
+# Added, renamed or removed tournaments change the per-process slug directory
+# (see core.utils.tournament_directory); drop it now and again once the write
+# commits, in case a concurrent request reloaded it in between.
+
+@receiver([post_save, post_delete], sender=Tournament)
+def clear_directory_on_tournament_write(sender, instance, **kwargs):
+    clear_tournament_directory()
+    transaction.on_commit(clear_tournament_directory)
+
+# Any write that can change a public page bumps its tournament's revision.
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Match)
+def bump_on_tournament_write(sender, instance, **kwargs):
+    bump_revision(instance.tournament_id)
+
+@receiver([post_save, post_delete], sender=SingleMatch)
+def bump_on_single_match_write(sender, instance, signal, **kwargs):
+    tournament_id = instance.tournament_id or _team_tournament_id(instance, 'home_team')
+    bump_revision(tournament_id)
+    # Push the new score (or the removal) to live feed clients, unless the
+    # match goes down with its team or tournament (the event would outlive it)
+    origin = kwargs.get('origin')
+    if signal is post_save or getattr(origin, 'model', type(origin)) is SingleMatch:
+        publish_match(instance, tournament_id, deleted=signal is post_delete)
+
+@receiver(post_delete, sender=SingleMatch)
+def unsync_deleted_leg(sender, instance, **kwargs):
+    # A deleted result stops counting for its fixture (and a winner it decided is
+    # taken back out of the next round), unless it goes down with its team or tournament
+    origin = kwargs.get('origin')
+    if getattr(origin, 'model', type(origin)) is SingleMatch and instance._fixture_result():
+        sync_fixture_scores([], cleared=[instance.fixture_id])
+
+@receiver([post_save, post_delete], sender=TopScorer)
+def bump_on_scorer_write(sender, instance, **kwargs):
+    bump_revision(instance.tournament_id or _team_tournament_id(instance, 'team'))
+
+@receiver([post_save, post_delete], sender=GoalEvent)
+def bump_on_goal_write(sender, instance, **kwargs):
+    bump_revision(_team_tournament_id(instance, 'team'))
+
+# Goal events keep the TopScorer leaderboard up to date one goal at a time.
+
+@receiver(pre_save, sender=GoalEvent)
+def remember_old_scorer(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = GoalEvent.objects.filter(pk=instance.pk).select_related('team').first()
+    instance._old_scorer_key = scorer_key(old)
+
+@receiver(post_save, sender=GoalEvent)
+def count_goal(sender, instance, created, **kwargs):
+    tournament_id = instance.team.tournament_id
+    first_events = GoalEvent.objects.filter(team__tournament_id=tournament_id).values_list('pk', flat=True)[:2]
+    if created and len(first_events) == 1:
+        # First recorded goal: switch the leaderboard over from team goals to goal events
+        update_top_scorers(instance.team.tournament)
+        bump_revision(tournament_id)
+        return
+    apply_scorer_delta(getattr(instance, '_old_scorer_key', None), scorer_key(instance))
+
+@receiver(post_delete, sender=GoalEvent)
+def uncount_goal(sender, instance, **kwargs):
+    apply_scorer_delta(scorer_key(instance), None)
+
+def _team_tournament_id(instance, field_name):
+    # Avoid a query when the related team is already loaded
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name).tournament_id
+    team_id = getattr(instance, field.attname)
+    return Team.objects.filter(pk=team_id).values_list('tournament_id', flat=True).first()
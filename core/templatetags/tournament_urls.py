@@ -0,0 +1,19 @@
+from django import template
+from django.urls import reverse
+
+register = template.Library()
+
+@register.simple_tag(takes_context=True)
+def tournament_url(context, view_name, **kwargs):
+    """
+    {% url %} that stays within the tournament of the current page: under
+    /t/<slug>/ it links to the same tournament's page, elsewhere to the
+    default tournament's top-level URL.
+        {% tournament_url 'match_edit' pk=match.pk %}
+    """
+    request = context.get('request')
+    match = getattr(request, 'resolver_match', None)
+    slug = match.kwargs.get('slug') if match else None
+    if slug:
+        kwargs['slug'] = slug
+    return reverse(view_name, kwargs=kwargs)
@@ -1,3 +1,1075 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, QuerySet
+from django.forms import modelform_factory
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import views
+from .api import KeysetPagination, match_list_queryset
+from .bracket import create_bracket
+from .cache import _page_keys
+from .ical import content_line, escape_text
+from .jobs import enqueue_rebuild, requeue_stale_jobs
+from .live import Broadcaster, format_event, missed_events
+from .metrics import collect, registry as metrics_registry
+from .models import GoalEvent, LiveEvent, Match, RecomputeJob, SingleMatch, Team, TeamAlias, TopScorer, Tournament
+from .profiling import list_captures
+from .resolver import TeamResolver
+from .utils import (
+    STANDINGS_FIELDS, apply_scorer_delta, calculate_standings, find_standings_mismatches, get_tournament,
+    ordered_standings, record_match_change, refresh_tournament, standings_queryset, sync_fixture_scores,
+    tournament_directory, update_single_match_stats, update_top_scorers,
+)
+
+
+class MatchListTests(TestCase):
+    """The custom admin match list reads one page, whatever the size of the table."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.tournament = Tournament.objects.create(name="List Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=f"Team {i}") for i in range(4)])
+
+    def add_matches(self, count):
+        SingleMatch.objects.bulk_create([
+            SingleMatch(
+                tournament=self.tournament, home_team=self.teams[i % 4], away_team=self.teams[(i + 1) % 4],
+                status='FINISHED' if i % 2 else 'UPCOMING', home_goals=1, away_goals=0,
+            )
+            for i in range(count)
+        ])
+
+    def count_queries(self, **headers):
+        url = reverse('match_list') + f"?status=FINISHED&team={self.teams[0].pk}&q=team"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_independent_of_table_size(self):
+        self.add_matches(20)
+        self.count_queries()  # loads the tournament directory
+        page, rows = self.count_queries(), self.count_queries(HTTP_HX_REQUEST='true')
+        self.add_matches(500)
+        self.assertEqual(self.count_queries(), page)
+        self.assertEqual(self.count_queries(HTTP_HX_REQUEST='true'), rows)
+
+    def test_keyset_pages_cover_every_match_once(self):
+        self.add_matches(120)
+        seen, url = [], reverse('match_list')
+        while url:
+            response = self.client.get(url, HTTP_HX_REQUEST='true')
+            self.assertTemplateNotUsed(response, 'core/admin/match_list.html')
+            seen += [match.pk for match in response.context['matches']]
+            older = response.context['older_page']
+            url = reverse('match_list') + older if older else None
+        self.assertEqual(seen, sorted(SingleMatch.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_filters(self):
+        self.add_matches(12)
+        response = self.client.get(reverse('match_list'), {'status': 'UPCOMING', 'leg': 'x'})
+        self.assertTrue(response.context['matches'])
+        self.assertTrue(all(match.status == 'UPCOMING' for match in response.context['matches']))
+        response = self.client.get(reverse('match_list'), {'q': 'Team 3'})
+        self.assertTrue(all(
+            'Team 3' in (match.home_team.name, match.away_team.name) for match in response.context['matches']
+        ))
+
+
+class MatchdayEntryTests(TestCase):
+    """Matchday results are validated together and saved as one batch."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.tournament = Tournament.objects.create(name="Matchday Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=f"Team {i}") for i in range(4)])
+        create_bracket(self.tournament, self.teams)
+        self.url = reverse('matchday') + '?round=SF'
+
+    def post_scores(self, scores):
+        response = self.client.get(self.url)
+        forms = response.context['formset'].forms
+        data = {'form-TOTAL_FORMS': len(forms), 'form-INITIAL_FORMS': len(forms)}
+        for index, form in enumerate(forms):
+            home, away = scores.get(form.single_match.leg, {}).get(form.single_match.home_team.name, ('', ''))
+            data.update({
+                f'form-{index}-match': form.single_match.pk,
+                f'form-{index}-home_goals': home,
+                f'form-{index}-away_goals': away,
+            })
+        return self.client.post(self.url, data)
+
+    def test_saves_the_batch_and_rebuilds_once(self):
+        self.assertEqual(len(self.client.get(self.url).context['formset'].forms), 4)
+        response = self.post_scores({1: {'Team 0': (3, 1), 'Team 2': (0, 0)}})
+        self.assertRedirects(response, self.url + '&saved=2', fetch_redirect_response=False)
+
+        self.assertEqual(SingleMatch.objects.filter(status='FINISHED').count(), 2)
+        fixture = Match.objects.get(round='SF', team_a=self.teams[0])
+        self.assertEqual((fixture.score_leg1_a, fixture.score_leg1_b), (3, 1))
+        points = dict(Team.objects.values_list('name', 'points'))
+        self.assertEqual(points, {'Team 0': 3, 'Team 1': 0, 'Team 2': 1, 'Team 3': 1})
+        # Only the unplayed legs are left on the matchday
+        self.assertEqual(len(self.client.get(self.url).context['formset'].forms), 2)
+
+    def test_rows_are_validated_together(self):
+        response = self.post_scores({1: {'Team 0': (3, '')}})
+        self.assertEqual(response.status_code, 200)
+        response = self.post_scores({})
+        self.assertEqual(response.context['formset'].non_form_errors(), ["Enter at least one result."])
+        self.assertFalse(SingleMatch.objects.filter(status='FINISHED').exists())
+
+
+class FixtureSyncTests(TestCase):
+    """Leg results reach their fixture with one targeted UPDATE, and only when they changed."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Sync Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=f"Team {i}") for i in range(4)])
+        create_bracket(self.tournament, self.teams)
+        self.fixture = Match.objects.get(round='SF', team_a=self.teams[0])
+
+    def play(self, leg, home_goals, away_goals):
+        match = SingleMatch.objects.get(fixture=self.fixture, leg=leg)
+        match.home_goals, match.away_goals, match.status = home_goals, away_goals, 'FINISHED'
+        with CaptureQueriesContext(connection) as queries:
+            match.save()
+        return match, [query['sql'] for query in queries if '"core_match"' in query['sql']]
+
+    def test_only_changed_leg_columns_are_written(self):
+        match, queries = self.play(1, 1, 1)
+        update = [sql for sql in queries if sql.startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('"score_leg1_a"', update[0])
+        self.assertNotIn('"score_leg2_a"', update[0])
+        # Nothing the fixture depends on changed: no fixture query at all
+        match.match_datetime = None
+        with CaptureQueriesContext(connection) as queries:
+            match.save()
+        self.assertFalse([query for query in queries if '"core_match"' in query['sql']])
+        self.assertEqual(self.play(1, 1, 1)[1], [])
+
+        # Leg 2 (home side is team B) decides the tie and sends the winner on
+        self.play(2, 0, 1)
+        self.fixture.refresh_from_db()
+        self.assertEqual(
+            (self.fixture.score_leg1_a, self.fixture.score_leg1_b, self.fixture.score_a, self.fixture.score_b),
+            (1, 1, 2, 1),
+        )
+        self.assertEqual(self.fixture.winner_id, self.teams[0].pk)
+        self.assertEqual(self.fixture.next_match.team_a_id, self.teams[0].pk)
+
+    def test_batch_sync_writes_changed_fixtures_together(self):
+        legs = list(SingleMatch.objects.filter(fixture__round='SF', leg=1))
+        for leg in legs:
+            leg.home_goals, leg.away_goals, leg.status = 1, 1, 'FINISHED'
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(sync_fixture_scores(legs)), 2)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(sync_fixture_scores(legs), [])
+
+
+class MetricsTests(TestCase):
+    """Requests are measured per view and /metrics adds up the numbers of every worker process."""
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(METRICS_DIR=self.directory, METRICS_TOKEN='secret', METRICS_SAMPLE_RATE=1.0))
+        self.addCleanup(metrics_registry.stop_heartbeat)
+        Tournament.objects.create(name="Metrics Cup")
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_timed_per_view(self):
+        response = self.client.get(reverse('standings'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=')
+        body = self.scrape()
+        self.assertIn('kaalapani_requests_total{view="standings",method="GET",status="200"}', body)
+        self.assertIn('kaalapani_request_queries_bucket{view="standings",le="+Inf"}', body)
+        self.assertRegex(body, r'kaalapani_request_template_seconds_sum\{view="standings"\} [1-9\d.e-]+')
+
+    def test_snapshots_of_other_workers_are_added_up(self):
+        self.client.get(reverse('standings'))
+        before = metrics_registry.snapshot()['requests_total']
+        labels = 'view="standings",method="GET",status="200"'
+        with open(os.path.join(self.directory, '1.json'), 'w') as handle:
+            json.dump({'requests_total': {labels: 5}}, handle)
+        self.assertIn(f'kaalapani_requests_total{{{labels}}} {before[labels] + 5}', self.scrape())
+
+    def test_idle_workers_keep_their_counts(self):
+        self.client.get(reverse('standings'))
+        before = metrics_registry.snapshot()['requests_total']
+        labels = 'view="standings",method="GET",status="200"'
+        # A live worker that hasn't served a request (or flushed) for an hour
+        path = os.path.join(self.directory, f'{os.getppid()}.json')
+        with open(path, 'w') as handle:
+            json.dump({'requests_total': {labels: 5}}, handle)
+        written = time.time() - 3600
+        os.utime(path, (written, written))
+        self.assertEqual(collect()['requests_total'][labels], before[labels] + 5)
+        self.assertTrue(os.path.exists(path))
+
+    def test_exited_workers_are_folded_into_the_retired_totals(self):
+        self.client.get(reverse('standings'))
+        before = metrics_registry.snapshot()['requests_total']
+        labels = 'view="standings",method="GET",status="200"'
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        path = os.path.join(self.directory, f'{exited.pid}.json')
+        with open(path, 'w') as handle:
+            json.dump({'requests_total': {labels: 5}}, handle)
+        self.assertEqual(collect()['requests_total'][labels], before[labels] + 5)
+        self.assertFalse(os.path.exists(path))
+        # Still counted on later scrapes
+        self.assertEqual(collect()['requests_total'][labels], before[labels] + 5)
+
+    def test_idle_worker_rewrites_its_snapshot(self):
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with self.settings(METRICS_FLUSH_INTERVAL=0.01):
+            metrics_registry.flush(force=True)
+            os.remove(path)
+            for _ in range(100):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.01)
+        self.assertTrue(os.path.exists(path))
+
+    def test_scraping_needs_the_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403
+        )
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    """Profiles are captured on request or by sampling and kept in a bounded on-disk buffer."""
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(PROFILE_DIR=self.directory, PROFILE_KEEP=2, PROFILE_SAMPLE_RATE=0))
+        self.tournament = Tournament.objects.create(name="Profile Cup")
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_staff_can_profile_a_request(self):
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('standings'), HTTP_X_PROFILE='1'))
+        self.client.force_login(self.staff)
+        capture_id = self.client.get(reverse('standings'), HTTP_X_PROFILE='1')['X-Profile-Id']
+
+        response = self.client.get(reverse('profile_list'), {'show': capture_id})
+        self.assertEqual([capture['id'] for capture in response.context['captures']], [capture_id])
+        self.assertIn('cumulative', response.context['summary'])
+        response = self.client.get(reverse('profile_download', args=[capture_id]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{capture_id}.prof"')
+        self.assertEqual(self.client.get(reverse('profile_download', args=['..-1-x'])).status_code, 404)
+
+    def test_sampled_rebuilds_fill_a_ring_buffer(self):
+        with self.settings(PROFILE_SAMPLE_RATE=1.0):
+            for _ in range(3):
+                refresh_tournament(self.tournament)
+        captures = list_captures()
+        # Nested profiled calls (calculate_standings) belong to the outer capture
+        self.assertEqual([capture['name'] for capture in captures], ['refresh_tournament'] * 2)
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+
+class BenchmarkCommandTests(TestCase):
+    """The synthetic data generator is deterministic and the benchmark suite runs against it."""
+
+    def generate(self, slug, seed):
+        call_command(
+            'generate_tournament', teams=16, matches_per_team=6, seed=seed, slug=slug,
+            goal_events=True, start='2025-05-01', stdout=StringIO(),
+        )
+        return list(
+            SingleMatch.objects.filter(tournament__slug=slug, fixture=None).order_by('pk')
+            .values_list('home_team__name', 'away_team__name', 'leg', 'status', 'home_goals', 'away_goals', 'match_datetime')
+        )
+
+    def test_same_seed_same_data(self):
+        first = self.generate('a', seed=1)
+        self.assertEqual(len(first), 48)
+        self.assertEqual(self.generate('b', seed=1), first)
+        self.assertNotEqual(self.generate('c', seed=2), first)
+        # A 16-team bracket, and standings rebuilt from the generated results
+        self.assertEqual(Match.objects.filter(tournament__slug='a').count(), 15)
+        self.assertEqual(find_standings_mismatches(Tournament.objects.get(slug='a')), [])
+
+    def test_benchmarks_compare_with_the_baseline(self):
+        baseline = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'baseline.json')
+        options = {
+            'sizes': '8', 'matches_per_team': 4, 'repeat': 1, 'baseline': baseline, 'allow_production': True,
+            'stdout': StringIO(),
+        }
+        call_command('run_benchmarks', save_baseline=True, **options)
+        with open(baseline) as handle:
+            stored = json.load(handle)
+        self.assertEqual(stored['results']['8']['page:standings']['queries'], 2)
+
+        # Pretend the page used to take one query fewer
+        stored['results']['8']['page:standings']['queries'] = 1
+        with open(baseline, 'w') as handle:
+            json.dump(stored, handle)
+        with self.assertRaisesMessage(CommandError, "1 regression(s)"):
+            call_command('run_benchmarks', only='page:standings', **options)
+        # The generated tournaments are rolled back
+        self.assertFalse(Tournament.objects.filter(slug__startswith='bench-').exists())
+
+    def test_benchmarks_refuse_to_run_without_debug(self):
+        with self.assertRaisesMessage(CommandError, "--allow-production"):
+            call_command('run_benchmarks', sizes='8', stdout=StringIO())
+        self.assertFalse(Tournament.objects.exists())
+
+
+class BracketQueryCountTests(TestCase):
+    """The bracket page must cost the same number of queries whatever the bracket size."""
+
+    def setUp(self):
+        cache.clear()
+
+    def render_bracket(self, entrants):
+        Tournament.objects.all().delete()
+        tournament = Tournament.objects.create(name=f"Cup of {entrants}")
+        teams = Team.objects.bulk_create(
+            [Team(tournament=tournament, name=f"Team {i}") for i in range(entrants)]
+        )
+        first_round = create_bracket(tournament, teams)
+        # Play a few legs so cards show results, winners and next-round teams
+        for leg in SingleMatch.objects.filter(fixture__in=first_round[:2]):
+            leg.home_goals, leg.away_goals, leg.status = 2, 0, 'FINISHED'
+            leg.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('bracket'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_independent_of_bracket_size(self):
+        small = self.render_bracket(4)
+        self.assertEqual(self.render_bracket(16), small)
+        self.assertEqual(self.render_bracket(128), small)
+
+    def test_htmx_fragment_query_count(self):
+        self.render_bracket(8)
+        cache.clear()
+        # Current tournament, fixtures with teams, legs
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('bracket'), HTTP_HX_REQUEST='true')
+        self.assertContains(response, "FT 2-0")
+        self.assertContains(response, "Winner to Match #")
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite's")
+class QueryPlanTests(TestCase):
+    """The hot queries must be index searches, never full scans of the match tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tournament = Tournament.objects.create(name="Plan Cup")
+        teams = Team.objects.bulk_create([Team(tournament=cls.tournament, name=f"Team {i}") for i in range(8)])
+        create_bracket(cls.tournament, teams)
+
+    def query_plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertSearches(self, plan, table, index):
+        # "SCAN <table>" (with or without an index) reads every row; "SEARCH" is a range lookup
+        scans = [step for step in plan if re.match(rf"SCAN (TABLE )?{table}\b", step)]
+        self.assertEqual(scans, [], plan)
+        self.assertTrue(any(f"USING INDEX {index}" in step for step in plan), plan)
+
+    def test_upcoming_matches(self):
+        queryset = (
+            SingleMatch.objects.filter(tournament=self.tournament, status='UPCOMING')
+            .select_related('home_team', 'away_team').order_by('match_datetime')
+        )
+        plan = self.query_plan(*queryset.query.sql_with_params())
+        self.assertSearches(plan, 'core_singlematch', 'singlematch_schedule_idx')
+        # The index also yields the date order
+        self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+
+    def test_api_match_list_page(self):
+        paginator = KeysetPagination(descending=True)
+        request = RequestFactory().get('/api/v1/matches/finished/')
+        queryset = paginator.page_queryset(match_list_queryset(self.tournament, 'FINISHED'), request)
+        plan = self.query_plan(*queryset.query.sql_with_params())
+        self.assertSearches(plan, 'core_singlematch', 'singlematch_schedule_idx')
+
+    def test_standings(self):
+        # Each team's finished matches on either side: one index per side
+        raw = standings_queryset(self.tournament)
+        plan = self.query_plan(raw.raw_query, raw.params)
+        self.assertSearches(plan, 'm', 'singlematch_home_status_idx')
+        self.assertSearches(plan, 'm', 'singlematch_away_status_idx')
+        self.assertSearches(plan, 't', 'core_team_tournament_id')
+
+    def test_fixtures_of_a_round(self):
+        queryset = Match.objects.filter(tournament=self.tournament, round='QF')
+        plan = self.query_plan(*queryset.query.sql_with_params())
+        self.assertSearches(plan, 'core_match', 'match_round_idx')
+
+    def test_tournament_is_denormalized_onto_matches(self):
+        self.assertFalse(SingleMatch.objects.filter(tournament__isnull=True).exists())
+        self.assertFalse(SingleMatch.objects.exclude(tournament=self.tournament).exists())
+
+
+class StandingsDeltaTests(TestCase):
+    """Single-match edits adjust the stored points table to exactly what a full rebuild gives."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.tournament = Tournament.objects.create(name="Delta Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=f"Team {i}") for i in range(3)])
+
+    def post(self, url, home=0, away=1, home_goals=2, away_goals=1, status='FINISHED'):
+        data = {
+            'home_team': self.teams[home].pk, 'away_team': self.teams[away].pk, 'leg': 1,
+            'home_goals': home_goals, 'away_goals': away_goals, 'status': status,
+        }
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+
+    def assertConsistent(self):
+        self.assertEqual(find_standings_mismatches(self.tournament), [])
+
+    def test_each_kind_of_edit_matches_a_rebuild(self):
+        self.post(reverse('match_add'))
+        self.assertEqual(Team.objects.get(pk=self.teams[0].pk).points, 3)
+        self.assertConsistent()
+        match = SingleMatch.objects.get()
+        edit = reverse('match_edit', args=[match.pk])
+
+        self.post(edit, home_goals=0, away_goals=3)  # goal correction that flips the winner
+        self.assertConsistent()
+        self.post(edit, home_goals=1, away_goals=1)  # to a draw
+        self.assertConsistent()
+        self.post(edit, status='UPCOMING', home_goals='', away_goals='')  # back to upcoming
+        self.assertConsistent()
+        self.post(edit, home=2)  # finished again, with another home team
+        self.assertConsistent()
+        self.assertEqual(Team.objects.get(pk=self.teams[0].pk).played, 0)
+
+        self.assertEqual(self.client.post(reverse('match_delete', args=[match.pk])).status_code, 302)
+        self.assertConsistent()
+        self.assertEqual(set(Team.objects.values_list('played', flat=True)), {0})
+
+    def test_edit_from_a_stale_instance_reverses_the_stored_result(self):
+        self.post(reverse('match_add'))
+        stale = SingleMatch.objects.get()
+        # Another admin corrects the result after `stale` was loaded
+        current = SingleMatch.objects.get()
+        current.home_goals, current.away_goals = 0, 3
+        record_match_change(lambda: current.save() or current, current)
+
+        stale.home_goals, stale.away_goals = 1, 1
+        record_match_change(lambda: stale.save() or stale, stale)
+        self.assertConsistent()
+        self.assertEqual(
+            list(Team.objects.order_by('pk').values_list('draws', 'points')), [(1, 1), (1, 1), (0, 0)]
+        )
+
+
+class StandingsAggregateTests(TestCase):
+    """The grouped SQL query derives the points table from finished matches on either side."""
+
+    def test_aggregate_counts_both_sides_and_skips_unplayed_matches(self):
+        tournament = Tournament.objects.create(name="Aggregate Cup")
+        other = Tournament.objects.create(name="Other Cup")
+        a, b, c = Team.objects.bulk_create([Team(tournament=tournament, name=name) for name in "ABC"])
+        stranger = Team.objects.create(tournament=other, name="D")
+        SingleMatch.objects.bulk_create([
+            SingleMatch(home_team=a, away_team=b, home_goals=2, away_goals=0, status='FINISHED'),
+            SingleMatch(home_team=c, away_team=a, home_goals=1, away_goals=1, status='FINISHED'),
+            SingleMatch(home_team=b, away_team=c, home_goals=0, away_goals=3, status='FINISHED'),
+            SingleMatch(home_team=a, away_team=c, status='UPCOMING'),
+            SingleMatch(home_team=b, away_team=a, status='FINISHED'),  # no score recorded
+            SingleMatch(home_team=stranger, away_team=stranger, home_goals=9, away_goals=0, status='FINISHED'),
+        ])
+
+        rows = [
+            (team.name, team.played, team.wins, team.draws, team.losses, team.goals_scored, team.goals_conceded, team.points)
+            for team in standings_queryset(tournament)
+        ]
+        self.assertEqual(rows, [
+            ('C', 2, 1, 1, 0, 4, 1, 4),
+            ('A', 2, 1, 1, 0, 3, 1, 4),
+            ('B', 2, 0, 0, 2, 0, 5, 0),
+        ])
+
+        refresh_tournament(tournament)
+        self.assertEqual(find_standings_mismatches(tournament), [])
+        self.assertEqual(Team.objects.get(pk=stranger.pk).points, 0)
+
+
+class StandingsTests(TestCase):
+    """The stored points table is the one the per-match Python loop produced, tie-breaks included."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Standings Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=name) for name in "ABCDEFG"])
+        a, b, c, d, e = self.teams[:5]
+        SingleMatch.objects.bulk_create([
+            SingleMatch(home_team=a, away_team=b, home_goals=3, away_goals=1, status='FINISHED'),
+            SingleMatch(home_team=c, away_team=d, home_goals=2, away_goals=0, status='FINISHED'),
+            SingleMatch(home_team=b, away_team=e, home_goals=1, away_goals=1, status='FINISHED'),
+            SingleMatch(home_team=e, away_team=d, home_goals=0, away_goals=0, status='FINISHED'),
+            SingleMatch(home_team=a, away_team=c, status='UPCOMING'),
+        ])
+
+    def python_table(self):
+        # The table as the old calculate_standings built it: one pass over the finished matches
+        teams = {team.pk: Team(pk=team.pk, name=team.name) for team in self.teams}
+        for match in SingleMatch.objects.filter(home_team__tournament=self.tournament, status='FINISHED'):
+            update_single_match_stats(
+                teams[match.home_team_id], match.home_goals, teams[match.away_team_id], match.away_goals,
+            )
+        ordered = sorted(
+            teams.values(),
+            key=lambda team: (-team.points, -(team.goals_scored - team.goals_conceded), -team.goals_scored, team.pk),
+        )
+        return [(team.name, *(getattr(team, field) for field in STANDINGS_FIELDS)) for team in ordered]
+
+    def stored_table(self):
+        return [
+            (team.name, *(getattr(team, field) for field in STANDINGS_FIELDS))
+            for team in ordered_standings(self.tournament)
+        ]
+
+    def test_stored_table_matches_the_python_one(self):
+        calculate_standings(self.tournament)
+        self.assertEqual(self.stored_table(), self.python_table())
+        self.assertEqual(find_standings_mismatches(self.tournament), [])
+
+    def test_ties_are_broken_by_goal_difference_then_goals_scored_then_team(self):
+        calculate_standings(self.tournament)
+        table = [
+            (name, points, scored - conceded, scored)
+            for name, _, _, _, _, scored, conceded, points in self.stored_table()
+        ]
+        self.assertEqual(table, [
+            # Level on points and goal difference: more goals scored first
+            ('A', 3, 2, 3),
+            ('C', 3, 2, 2),
+            ('E', 2, 0, 1),
+            ('B', 1, -2, 2),
+            ('D', 1, -2, 0),
+            # Level on everything: in team order
+            ('F', 0, 0, 0),
+            ('G', 0, 0, 0),
+        ])
+        # The same order straight from the grouped query
+        self.assertEqual([team.name for team in standings_queryset(self.tournament)], list("ACEBDFG"))
+
+
+class PageCacheTests(TestCase):
+    """Pages are cached per revision and rendered by one request at a time after a change."""
+
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name="Cache Cup")
+        self.url = reverse('standings')
+        self.lock_key = _page_keys('standings', RequestFactory().get(self.url))[0] + ':lock'
+
+    def test_a_request_without_the_lock_leaves_it_alone(self):
+        # Another request is rendering and there is no previous page to serve
+        cache.add(self.lock_key, 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache.get(self.lock_key), 1)
+
+        cache.delete(self.lock_key)
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    async def test_async_variant_leaves_the_other_lock_alone(self):
+        await cache.aadd(self.lock_key, 1)
+        response = await views.standings_async(AsyncRequestFactory().get(self.url))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await cache.aget(self.lock_key), 1)
+
+        await cache.adelete(self.lock_key)
+        await views.standings_async(AsyncRequestFactory().get(self.url))
+        self.assertIsNone(await cache.aget(self.lock_key))
+
+    def test_only_the_parameters_a_page_reads_vary_its_cache_entry(self):
+        home, away = Team.objects.bulk_create([Team(tournament=self.tournament, name=name) for name in "HA"])
+        for leg in (1, 2):
+            SingleMatch.objects.create(home_team=home, away_team=away, leg=leg)
+        url = reverse('upcoming')
+
+        def keys(**query):
+            return _page_keys('upcoming', RequestFactory().get(url, query), params=views.UPCOMING_PARAMS)
+        self.assertEqual(keys(page_size=1, x=1), keys(page_size=1, x=2))
+        self.assertEqual(keys(page_size=1, days=7), keys(days=7, page_size=1))
+        self.assertNotEqual(keys(page_size=1), keys(page_size=2))
+
+        first = self.client.get(url, {'page_size': 1, 'x': 'first'})
+        second = self.client.get(url, {'page_size': 1, 'x': 'second'})
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first.content, second.content)
+        # The next page link doesn't carry parameters the cache key ignores
+        self.assertContains(first, 'page_size=1')
+        self.assertNotContains(first, 'x=first')
+
+
+class RecomputeQueueTests(TestCase):
+    """Dirty events of a tournament fold into its one pending rebuild job."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Queue Cup")
+
+    def test_events_coalesce_into_the_pending_job(self):
+        for _ in range(3):
+            enqueue_rebuild(self.tournament)
+        self.assertEqual(list(RecomputeJob.objects.values_list('status', 'events')), [('PENDING', 3)])
+
+    def test_losing_the_race_to_create_the_job_folds_into_the_winner(self):
+        # The pending job appears between this writer's UPDATE and its INSERT
+        original_update = QuerySet.update
+        def update(queryset, **kwargs):
+            rows = original_update(queryset, **kwargs)
+            if queryset.model is RecomputeJob and not RecomputeJob.objects.exists():
+                RecomputeJob.objects.create(tournament=self.tournament)
+            return rows
+        with mock.patch.object(QuerySet, 'update', update), transaction.atomic():
+            enqueue_rebuild(self.tournament)
+        self.assertEqual(list(RecomputeJob.objects.values_list('status', 'events')), [('PENDING', 2)])
+
+    def test_stale_job_requeues_unless_a_job_is_pending(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        stale = RecomputeJob.objects.create(tournament=self.tournament, status='RUNNING', started_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 1)
+        self.assertEqual(RecomputeJob.objects.get(pk=stale.pk).status, 'PENDING')
+
+        RecomputeJob.objects.filter(pk=stale.pk).update(status='RUNNING', started_at=long_ago)
+        enqueue_rebuild(self.tournament)
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 0)
+        self.assertEqual(RecomputeJob.objects.get(pk=stale.pk).status, 'FAILED')
+        self.assertEqual(RecomputeJob.objects.get(status='PENDING').events, 2)
+
+
+class GoalLeaderboardTests(TestCase):
+    """Goal events move the top scorer leaderboard one goal at a time, to what a rebuild gives."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Goals Cup")
+        self.home, self.away = Team.objects.bulk_create([Team(tournament=self.tournament, name=name) for name in "HA"])
+        self.match = SingleMatch.objects.create(
+            home_team=self.home, away_team=self.away, home_goals=3, away_goals=1, status='FINISHED',
+        )
+
+    def leaderboard(self):
+        return sorted(TopScorer.objects.filter(tournament=self.tournament).values_list('team_id', 'player_name', 'goals'))
+
+    def score(self, team, player, own_goal=False):
+        return GoalEvent.objects.create(match=self.match, team=team, player_name=player, own_goal=own_goal)
+
+    def test_incremental_leaderboard_matches_a_rebuild(self):
+        first = self.score(self.home, "Ali")
+        self.score(self.home, "Ali")
+        moved = self.score(self.home, "Ben")
+        self.score(self.home, "Cal", own_goal=True)
+        last = self.score(self.away, "Dev")
+        moved.player_name = "Ali"  # credited to the wrong player at first
+        moved.save()
+        first.delete()
+        last.own_goal = True
+        last.save()
+
+        incremental = self.leaderboard()
+        self.assertEqual(incremental, [(self.home.pk, "Ali", 2)])
+        update_top_scorers(self.tournament)
+        self.assertEqual(self.leaderboard(), incremental)
+
+    def test_one_row_per_player(self):
+        self.score(self.home, "Ali")
+        apply_scorer_delta(None, (self.tournament.pk, self.home.pk, "Ali"))
+        self.assertEqual(self.leaderboard(), [(self.home.pk, "Ali", 2)])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TopScorer.objects.create(team=self.home, player_name="Ali")
+
+
+class ImportResultsTests(TestCase):
+    """Bad lines are reported and skipped, and whatever was committed is rebuilt."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Import Cup")
+        Team.objects.bulk_create([Team(tournament=self.tournament, name=name) for name in ("Lions", "Tigers", "Bears")])
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def write(self, *lines):
+        path = os.path.join(self.directory, 'results.jsonl')
+        with open(path, 'w') as handle:
+            handle.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_malformed_lines_are_skipped_with_a_warning(self):
+        path = self.write(
+            '{"home_team": "Lions", "away_team": "Tigers", "home_goals": 2, "away_goals": 0}',
+            '{"home_team": "Lions",',
+            '[1, 2]',
+            '{"home_team": "Bears", "away_team": "Tigers", "home_goals": [1], "away_goals": 0}',
+        )
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_results', path, stdout=stdout, stderr=stderr)
+        self.assertIn("line 2: invalid JSON", stderr.getvalue())
+        self.assertIn("line 3: expected an object with the match columns, got list", stderr.getvalue())
+        self.assertIn("line 4:", stderr.getvalue())
+        self.assertIn("4 rows", stdout.getvalue())
+        self.assertIn("1 created", stdout.getvalue())
+        self.assertEqual(Team.objects.get(name="Lions").points, 3)
+
+    def test_committed_batches_are_rebuilt_when_the_import_fails(self):
+        path = self.write(
+            '{"home_team": "Lions", "away_team": "Tigers", "home_goals": 2, "away_goals": 0}',
+            '{"home_team": "Bears", "away_team": "Tigers", "home_goals": 1, "away_goals": 1}',
+        )
+        calls = []
+        def sync(matches):
+            calls.append(matches)
+            if len(calls) == 2:
+                raise RuntimeError("database went away")
+            return []
+        with mock.patch('core.management.commands.import_results.sync_fixture_scores', sync):
+            with self.assertRaisesMessage(RuntimeError, "database went away"):
+                call_command('import_results', path, batch_size=1, stdout=StringIO())
+        self.assertEqual(SingleMatch.objects.count(), 1)
+        self.assertEqual(find_standings_mismatches(self.tournament), [])
+        self.assertEqual(Team.objects.get(name="Lions").points, 3)
+
+
+class TeamResolverTests(TestCase):
+    """Imported names resolve through aliases and typo tolerance, or are reported as ambiguous."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Resolver Cup")
+        self.teams = {
+            team.name: team for team in Team.objects.bulk_create([
+                Team(tournament=self.tournament, name=name)
+                for name in ("Mohammed Musthafa V", "Jishnu S S", "Arjun K", "Arjun M")
+            ])
+        }
+
+    def test_exact_alias_fuzzy_and_ambiguous_names(self):
+        TeamAlias.objects.create(team=self.teams["Arjun K"], alias="AK")
+        resolver = TeamResolver.for_tournament(self.tournament)
+
+        resolution = resolver.resolve("  MOHAMMED musthafa v. ")
+        self.assertEqual((resolution.status, resolution.team_id), ('exact', self.teams["Mohammed Musthafa V"].pk))
+        self.assertEqual(resolver.resolve("ak").team_id, self.teams["Arjun K"].pk)
+        resolution = resolver.resolve("Jisnnu")
+        self.assertEqual((resolution.status, resolution.team_id), ('fuzzy', self.teams["Jishnu S S"].pk))
+        self.assertEqual(resolver.resolve_id("Musthafa"), self.teams["Mohammed Musthafa V"].pk)
+
+        resolution = resolver.resolve("Arjun")
+        self.assertEqual(resolution.status, 'ambiguous')
+        self.assertEqual(
+            {team_id for team_id, key, score in resolution.candidates},
+            {self.teams["Arjun K"].pk, self.teams["Arjun M"].pk},
+        )
+        self.assertEqual(resolver.resolve("Zebras FC").status, 'unknown')
+
+    def test_duplicate_alias_is_a_form_error(self):
+        team = self.teams["Arjun K"]
+        TeamAlias.objects.create(team=team, alias="Árjun Kumar")
+        AliasForm = modelform_factory(TeamAlias, fields=['team', 'alias'])
+        form = AliasForm({'team': team.pk, 'alias': "arjun  KUMAR"})
+        self.assertFalse(form.is_valid())
+        self.assertIn('alias', form.errors)
+        self.assertTrue(AliasForm({'team': self.teams["Arjun M"].pk, 'alias': "Arjun Kumar"}).is_valid())
+
+        # Two new rows of one admin inline submission
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(reverse('admin:core_team_change', args=[team.pk]), {
+            'tournament': self.tournament.pk, 'name': team.name,
+            'aliases-TOTAL_FORMS': 3, 'aliases-INITIAL_FORMS': 1,
+            'aliases-0-id': team.aliases.get().pk, 'aliases-0-team': team.pk, 'aliases-0-alias': "Árjun Kumar",
+            'aliases-1-team': team.pk, 'aliases-1-alias': "AK",
+            'aliases-2-team': team.pk, 'aliases-2-alias': "ak",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This alias is entered twice")
+        self.assertEqual(team.aliases.count(), 1)
+
+
+class BracketCorrectionTests(TestCase):
+    """Corrected results move the new winner on, but never onto results another team played."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.tournament = Tournament.objects.create(name="Correction Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=f"AT{i}") for i in range(4)])
+        create_bracket(self.tournament, self.teams)
+        self.semi = Match.objects.get(round='SF', team_a=self.teams[0])
+        self.final = Match.objects.get(round='F')
+        self.play(self.semi, 1, 2, 0)
+        self.play(Match.objects.get(round='SF', team_a=self.teams[2]), 1, 1, 0)
+
+    def play(self, fixture, leg, home_goals, away_goals):
+        match = SingleMatch.objects.get(fixture=fixture, leg=leg)
+        match.home_goals, match.away_goals, match.status = home_goals, away_goals, 'FINISHED'
+        match.save()
+        return match
+
+    def correct_semi(self):
+        leg = SingleMatch.objects.get(fixture=self.semi, leg=1)
+        data = {
+            'home_team': leg.home_team_id, 'away_team': leg.away_team_id, 'leg': 1,
+            'home_goals': 0, 'away_goals': 3, 'status': 'FINISHED',
+        }
+        return self.client.post(reverse('match_edit', args=[leg.pk]), data)
+
+    def test_correction_before_the_next_round_swaps_the_team(self):
+        self.final.refresh_from_db()
+        self.assertEqual((self.final.team_a_id, self.final.team_b_id), (self.teams[0].pk, self.teams[2].pk))
+        self.assertEqual(self.correct_semi().status_code, 302)
+        self.final.refresh_from_db()
+        self.assertEqual(self.final.team_a_id, self.teams[1].pk)
+        self.assertIsNone(self.final.winner_id)
+        self.assertEqual(SingleMatch.objects.get(fixture=self.final).home_team_id, self.teams[1].pk)
+
+    def test_correction_after_the_next_round_was_played_is_refused(self):
+        final_leg = self.play(self.final, 1, 1, 0)
+        self.assertEqual(final_leg.home_team_id, self.teams[0].pk)
+        refresh_tournament(self.tournament)
+        standings = list(Team.objects.order_by('pk').values_list('played', 'points'))
+
+        response = self.correct_semi()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "AT0 has already played in the Final")
+        self.assertEqual(SingleMatch.objects.get(fixture=self.semi, leg=1).home_goals, 2)
+        self.final.refresh_from_db()
+        self.assertEqual((self.final.team_a_id, self.final.winner_id), (self.teams[0].pk, self.teams[0].pk))
+        self.assertEqual(list(Team.objects.order_by('pk').values_list('played', 'points')), standings)
+
+        # The Django admin reports it too, without saving
+        leg = SingleMatch.objects.get(fixture=self.semi, leg=1)
+        response = self.client.post(reverse('admin:core_singlematch_change', args=[leg.pk]), {
+            'fixture': self.semi.pk, 'home_team': leg.home_team_id, 'away_team': leg.away_team_id, 'leg': 1,
+            'status': 'FINISHED', 'home_goals': 0, 'away_goals': 3, 'goals-TOTAL_FORMS': 0, 'goals-INITIAL_FORMS': 0,
+        }, follow=True)
+        self.assertContains(response, "Not saved: AT0 has already played in the Final")
+        self.assertEqual(SingleMatch.objects.get(pk=leg.pk).home_goals, 2)
+
+    def assert_semi_undecided(self):
+        self.semi.refresh_from_db()
+        self.assertEqual((self.semi.score_a, self.semi.score_leg1_a, self.semi.winner_id), (0, 0, None))
+        self.final.refresh_from_db()
+        self.assertEqual((self.final.team_a_id, self.final.team_b_id), (None, self.teams[2].pk))
+        self.assertFalse(SingleMatch.objects.filter(fixture=self.final).exists())
+
+    def test_reverting_the_deciding_leg_takes_the_winner_back(self):
+        leg = SingleMatch.objects.get(fixture=self.semi, leg=1)
+        leg.home_goals = leg.away_goals = None
+        leg.status = 'UPCOMING'
+        leg.save()
+        self.assert_semi_undecided()
+
+    def test_deleting_the_deciding_leg_takes_the_winner_back(self):
+        leg = SingleMatch.objects.get(fixture=self.semi, leg=1)
+        self.assertEqual(self.client.post(reverse('match_delete', args=[leg.pk])).status_code, 302)
+        self.assert_semi_undecided()
+
+    def test_deleting_a_leg_after_the_next_round_was_played_is_refused(self):
+        self.play(self.final, 1, 1, 0)
+        leg = SingleMatch.objects.get(fixture=self.semi, leg=1)
+        response = self.client.post(reverse('match_delete', args=[leg.pk]))
+        self.assertContains(response, "AT0 has already played in the Final")
+        self.assertTrue(SingleMatch.objects.filter(pk=leg.pk).exists())
+        self.semi.refresh_from_db()
+        self.assertEqual(self.semi.winner_id, self.teams[0].pk)
+
+        response = self.client.post(reverse('admin:core_singlematch_delete', args=[leg.pk]), {'post': 'yes'}, follow=True)
+        self.assertContains(response, "Not deleted: AT0 has already played in the Final")
+        self.assertTrue(SingleMatch.objects.filter(pk=leg.pk).exists())
+
+
+class ApiTests(TestCase):
+    """The v1 API pages match lists by keyset, trims fields on request and answers conditional GETs."""
+
+    def setUp(self):
+        cache.clear()
+        self.tournament = Tournament.objects.create(name="Api Cup")
+        self.teams = Team.objects.bulk_create([Team(tournament=self.tournament, name=f"Team {i}") for i in range(4)])
+        kickoff = timezone.now()
+        # Shared kickoff times and undated matches, which the cursor has to step through
+        SingleMatch.objects.bulk_create([
+            SingleMatch(
+                tournament=self.tournament, home_team=self.teams[i % 4], away_team=self.teams[(i + 1) % 4],
+                match_datetime=None if i % 5 == 0 else kickoff + timedelta(hours=i // 3),
+            )
+            for i in range(23)
+        ])
+
+    def test_keyset_pages_cover_every_match_once_in_order(self):
+        seen, url = [], reverse('api:upcoming') + '?page_size=4'
+        while url:
+            body = self.client.get(url).json()
+            self.assertLessEqual(len(body['results']), 4)
+            seen += [match['id'] for match in body['results']]
+            url = body['next']
+        expected = SingleMatch.objects.order_by(F('match_datetime').asc(nulls_last=True), 'pk')
+        self.assertEqual(seen, list(expected.values_list('pk', flat=True)))
+        self.assertEqual(self.client.get(reverse('api:upcoming') + '?cursor=garbage').status_code, 404)
+
+    def test_field_selection(self):
+        body = self.client.get(reverse('api:standings'), {'fields': 'name,points'}).json()
+        self.assertEqual([set(row) for row in body['results']], [{'name', 'points'}] * 4)
+        response = self.client.get(reverse('api:upcoming'), {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.json()['fields'])
+
+    def test_conditional_get_until_the_data_changes(self):
+        etag = self.client.get(reverse('api:standings'))['ETag']
+        self.assertEqual(self.client.get(reverse('api:standings'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        match = SingleMatch.objects.first()
+        match.home_goals, match.away_goals, match.status = 1, 0, 'FINISHED'
+        match.save()
+        self.assertEqual(self.client.get(reverse('api:standings'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class LiveFeedTests(TestCase):
+    """Saved results become live feed events, which reconnecting clients catch up on."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Live Cup")
+        self.home, self.away = Team.objects.bulk_create([Team(tournament=self.tournament, name=name) for name in "HA"])
+
+    def feed(self, **headers):
+        response = self.client.get(reverse('live_feed'), **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_events_are_formatted_as_server_sent_events(self):
+        event = LiveEvent(pk=7, kind='match', payload={'id': 3, 'home_goals': 1})
+        self.assertEqual(format_event(event), 'id: 7\nevent: match\ndata: {"id":3,"home_goals":1}\n\n')
+
+    def test_reconnecting_client_gets_what_it_missed(self):
+        hello = self.feed()
+        last_id = int(re.search(r'^id: (\d+)$', hello, re.M).group(1))
+        self.assertIn('event: hello', hello)
+
+        match = SingleMatch.objects.create(home_team=self.home, away_team=self.away)
+        match.home_goals, match.away_goals, match.status = 2, 1, 'FINISHED'
+        record_match_change(lambda: match.save() or match, match)
+        body = self.feed(HTTP_LAST_EVENT_ID=str(last_id))
+        self.assertEqual(re.findall(r'^event: (\w+)$', body, re.M), ['hello', 'match', 'match', 'standings'])
+        self.assertIn('"home_goals":2', body)
+        self.assertNotIn('event: refresh', body)
+
+        # Further behind than a client queue holds: one refresh instead of the backlog
+        with self.settings(LIVE_QUEUE_SIZE=1):
+            body = self.feed(HTTP_LAST_EVENT_ID=str(last_id))
+        self.assertEqual(re.findall(r'^event: (\w+)$', body, re.M), ['hello', 'refresh'])
+
+    def test_writers_prune_old_events(self):
+        old = LiveEvent.objects.create(tournament=self.tournament, kind='refresh')
+        LiveEvent.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=7))
+        match = SingleMatch.objects.create(home_team=self.home, away_team=self.away)
+        match.home_goals, match.away_goals, match.status = 1, 0, 'FINISHED'
+        cache.delete('live:prune')
+        with self.captureOnCommitCallbacks(execute=True):
+            record_match_change(lambda: match.save() or match, match)
+        self.assertFalse(LiveEvent.objects.filter(pk=old.pk).exists())
+        self.assertTrue(LiveEvent.objects.filter(kind='match').exists())
+
+    async def test_events_committed_out_of_id_order_are_delivered(self):
+        earlier = await LiveEvent.objects.acreate(tournament=self.tournament, kind='match', payload={'id': 1})
+        later = await LiveEvent.objects.acreate(tournament=self.tournament, kind='match', payload={'id': 2})
+        # The broadcaster already polled while only the later event had committed
+        broadcaster = Broadcaster()
+        broadcaster.last_id, broadcaster.recent = later.pk, {later.pk: later.created_at}
+        queue = asyncio.Queue()
+        broadcaster.subscribers[self.tournament.pk].add(queue)
+
+        self.assertEqual(await broadcaster.poll_once(), 1)
+        self.assertEqual((await queue.get()).pk, earlier.pk)
+        self.assertEqual(await broadcaster.poll_once(), 0)
+        self.assertTrue(queue.empty())
+
+        # A client that reconnects after the later id gets the earlier one too
+        replayed, messages = await missed_events(self.tournament.pk, later.pk)
+        self.assertEqual(replayed, {earlier.pk, later.pk})
+
+        # Outside the commit window only ids past the last one are read
+        with self.settings(LIVE_COMMIT_LAG=0):
+            replayed, messages = await missed_events(self.tournament.pk, earlier.pk)
+        self.assertEqual(replayed, {later.pk})
+
+
+class TournamentDirectoryTests(TestCase):
+    """Slugs resolve from a per-process directory that tournament writes invalidate."""
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="Directory Cup")
+
+    def test_directory_is_reused_until_a_tournament_changes(self):
+        tournament_directory()
+        with self.assertNumQueries(0):
+            self.assertEqual(tournament_directory()['by_slug']['directory-cup'], self.tournament.pk)
+
+        self.tournament.slug = 'renamed-cup'
+        self.tournament.save()
+        self.assertEqual(get_tournament(slug='renamed-cup'), self.tournament)
+        self.assertIsNone(get_tournament(slug='directory-cup'))
+
+        added = Tournament.objects.create(name="Added Cup")
+        self.assertEqual(get_tournament(slug='added-cup'), added)
+
+        added.delete()
+        self.assertIsNone(get_tournament(slug='added-cup'))
+
+    def test_get_tournament_is_memoized_on_the_request(self):
+        request = RequestFactory().get('/')
+        self.assertEqual(get_tournament(request, 'directory-cup'), self.tournament)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_tournament(request, 'directory-cup'), self.tournament)
+
+
+class CalendarFormatTests(TestCase):
+    """iCalendar text is escaped and folded as RFC 5545 requires."""
+
+    def test_escape_text(self):
+        self.assertEqual(escape_text('a\\b;c,d\ne'), 'a\\\\b\\;c\\,d\\ne')
+
+    def test_short_lines_are_not_folded(self):
+        self.assertEqual(content_line('SUMMARY:Home vs Away'), 'SUMMARY:Home vs Away\r\n')
+
+    def test_long_lines_fold_at_75_octets(self):
+        line = 'DESCRIPTION:' + 'x' * 200
+        folded = content_line(line)
+        self.assertTrue(folded.endswith('\r\n'))
+        parts = folded[:-2].split('\r\n')
+        self.assertEqual(len(parts[0].encode()), 75)
+        self.assertTrue(all(part.startswith(' ') and len(part.encode()) <= 75 for part in parts[1:]))
+        self.assertEqual(parts[0] + ''.join(part[1:] for part in parts[1:]), line)
+
+    def test_folding_keeps_multibyte_characters_whole(self):
+        line = 'SUMMARY:' + 'é' * 100
+        parts = content_line(line)[:-2].split('\r\n')
+        for part in parts:
+            self.assertLessEqual(len(part.encode()), 75)
+        self.assertEqual(parts[0] + ''.join(part[1:] for part in parts[1:]), line)
@@ -1,17 +1,48 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import include, path
+from . import api, views
 
-urlpatterns = [
+def public(module, name):
+    # Under an ASGI server (ASYNC_VIEWS) public pages and the API use their async ORM variants
+    return getattr(module, f"{name}_async" if settings.ASYNC_VIEWS else name)
+
+# Read-only JSON API, mounted for the current tournament and for /tournaments/<slug>/
+api_v1 = [
+    path('', public(api, 'tournament_detail'), name='tournament'),
+    path('standings/', public(api, 'standings'), name='standings'),
+    path('bracket/', public(api, 'bracket'), name='bracket'),
+    path('matches/upcoming/', public(api, 'upcoming_matches'), name='upcoming'),
+    path('matches/finished/', public(api, 'finished_matches'), name='finished'),
+    path('scorers/', public(api, 'top_scorers'), name='scorers'),
+]
+
+# Pages of one tournament: served for the default tournament at the top level
+# and for any tournament under /t/<slug>/ (same names; pass slug= to reverse)
+tournament_pages = [
     path('', views.home, name='home'),
-    path('points-table/', views.standings, name='standings'),
-    path('bracket/', views.bracket, name='bracket'),
-    path('top-scorers/', views.top_scorers, name='top_scorers'),
-    path('upcoming/', views.upcoming_matches, name='upcoming'),
+    path('points-table/', public(views, 'standings'), name='standings'),
+    path('bracket/', public(views, 'bracket'), name='bracket'),
+    path('top-scorers/', public(views, 'top_scorers'), name='top_scorers'),
+    path('upcoming/', public(views, 'upcoming_matches'), name='upcoming'),
+    path('upcoming.ics', public(views, 'upcoming_calendar'), name='upcoming_calendar'),
+    path('live/', views.live_feed, name='live_feed'),
     
     # Custom Admin
     path('custom-admin/matches/', views.match_list, name='match_list'),
     path('custom-admin/matches/add/', views.match_add, name='match_add'),
     path('custom-admin/matches/<int:pk>/edit/', views.match_edit, name='match_edit'),
     path('custom-admin/matches/<int:pk>/delete/', views.match_delete, name='match_delete'),
+    path('custom-admin/matchday/', views.matchday, name='matchday'),
     path('match-generator/', views.match_generator, name='match_generator'),
 ]
+
+urlpatterns = tournament_pages + [
+    path('t/<slug:slug>/', include(tournament_pages)),
+    path('metrics', views.metrics, name='metrics'),
+    path('custom-admin/profiles/', views.profile_list, name='profile_list'),
+    path('custom-admin/profiles/<str:capture_id>.prof', views.profile_download, name='profile_download'),
+
+    # API v1
+    path('api/v1/', include((api_v1, 'api'), namespace='api')),
+    path('api/v1/tournaments/<slug:slug>/', include((api_v1, 'api'), namespace='api-tournament')),
+]
@@ -1,49 +1,427 @@
-from .models import SingleMatch, Team, TopScorer
+import time
+from collections import defaultdict
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Now
+
+from .bracket import advance_winner
+from .jobs import enqueue_rebuild
+from .live import publish_refresh, publish_standings
+from .models import GoalEvent, Match, SingleMatch, Team, TopScorer, Tournament
+from .profiling import profiled
+from .revisions import bump_revision, deferred_revision_bump
+
+# Per-process directory of tournaments: slug -> pk, plus the default tournament
+# (the first one), so working out which tournament a request addresses costs no
+# query. core.signals clears it on Tournament writes in this process; other
+# processes pick those up within TOURNAMENT_CACHE_TTL seconds.
+_tournament_directory = {'by_slug': {}, 'names': [], 'default': None, 'loaded_at': None}
+
+def _directory_is_stale():
+    loaded_at = _tournament_directory['loaded_at']
+    return loaded_at is None or time.monotonic() - loaded_at > settings.TOURNAMENT_CACHE_TTL
+
+def _fill_directory(rows):
+    _tournament_directory.update(
+        by_slug={slug: pk for pk, slug, name in rows},
+        names=[(slug, name) for pk, slug, name in rows],
+        default=rows[0][0] if rows else None,
+        loaded_at=time.monotonic(),
+    )
+    return _tournament_directory
+
+def _directory_rows():
+    return Tournament.objects.order_by('pk').values_list('pk', 'slug', 'name')
+
+def tournament_directory():
+    if _directory_is_stale():
+        return _fill_directory(list(_directory_rows()))
+    return _tournament_directory
+
+async def atournament_directory():
+    if _directory_is_stale():
+        return _fill_directory([row async for row in _directory_rows()])
+    return _tournament_directory
+
+def tournament_choices():
+    # (slug, name) of every tournament, for pickers
+    return tournament_directory()['names']
+
+def clear_tournament_directory():
+    _tournament_directory['loaded_at'] = None
+
+def _tournament_pk(directory, slug):
+    return directory['default'] if slug is None else directory['by_slug'].get(slug)
+
+def get_tournament(request=None, slug=None):
+    """
+    The tournament addressed by slug, or the default (first) one without a slug;
+    None if there is no such tournament. Memoized on the request.
+    The row itself is still read by pk, which keeps its revision (the page and
+    API cache keys) exact across processes; unknown slugs cost no query.
+    """
+    memo = getattr(request, '_tournaments', {}) if request is not None else {}
+    if slug not in memo:
+        pk = _tournament_pk(tournament_directory(), slug)
+        memo[slug] = Tournament.objects.filter(pk=pk).first() if pk is not None else None
+        if request is not None:
+            request._tournaments = memo
+    return memo[slug]
+
+async def aget_tournament(request=None, slug=None):
+    # Async get_tournament, sharing its memo so sync helpers called later don't query
+    memo = getattr(request, '_tournaments', {}) if request is not None else {}
+    if slug not in memo:
+        pk = _tournament_pk(await atournament_directory(), slug)
+        memo[slug] = await Tournament.objects.filter(pk=pk).afirst() if pk is not None else None
+        if request is not None:
+            request._tournaments = memo
+    return memo[slug]
+
+def get_current_tournament(request=None):
+    # The default tournament, served at the top-level URLs
+    return get_tournament(request)
+
+async def aget_current_tournament(request=None):
+    return await aget_tournament(request)
+
+# Match (fixture) columns that are derived from its legs
+FIXTURE_SCORE_FIELDS = (
+    'score_a', 'score_b', 'score_leg1_a', 'score_leg1_b', 'score_leg2_a', 'score_leg2_b', 'winner',
+)
+FIXTURE_SCORE_ATTNAMES = tuple(Match._meta.get_field(name).attname for name in FIXTURE_SCORE_FIELDS)
+
+# Team columns that are derived from finished matches
+STANDINGS_FIELDS = ('played', 'wins', 'draws', 'losses', 'goals_scored', 'goals_conceded', 'points')
+
+def ordered_standings(tournament):
+    """
+    Returns the stored points table for the tournament as a single query,
+    sorted by Points, then Goal Difference, then Goals Scored (all desc).
+    This is a pure read: the Team rows are only written when results change.
+    """
+    return (
+        Team.objects.filter(tournament=tournament)
+        .annotate(gd=F('goals_scored') - F('goals_conceded'))
+        .order_by('-points', '-gd', '-goals_scored', 'pk')
+    )
+
+def standings_queryset(tournament):
+    """
+    Derives the points table for every team of the tournament in one grouped query.
+    Each team is joined to the finished matches it played on either side and the
+    home/away columns are picked with conditional aggregation, using the same
+    W/D/L/points rules as update_single_match_stats (3 for a win, 1 for a draw).
+    Returns Team instances whose STANDINGS_FIELDS hold the computed values
+    (plus `gd`), already ordered by Points, Goal Difference and Goals Scored;
+    works on both SQLite and Postgres.
+    """
+    team_table = Team._meta.db_table
+    match_table = SingleMatch._meta.db_table
+    goals_for = "CASE WHEN m.home_team_id = t.id THEN m.home_goals ELSE m.away_goals END"
+    goals_against = "CASE WHEN m.home_team_id = t.id THEN m.away_goals ELSE m.home_goals END"
+
+    sql = f"""
+        SELECT
+            t.id, t.tournament_id, t.name, t.logo,
+            COUNT(m.id) AS played,
+            COALESCE(SUM(CASE WHEN {goals_for} > {goals_against} THEN 1 ELSE 0 END), 0) AS wins,
+            COALESCE(SUM(CASE WHEN {goals_for} = {goals_against} THEN 1 ELSE 0 END), 0) AS draws,
+            COALESCE(SUM(CASE WHEN {goals_for} < {goals_against} THEN 1 ELSE 0 END), 0) AS losses,
+            COALESCE(SUM({goals_for}), 0) AS goals_scored,
+            COALESCE(SUM({goals_against}), 0) AS goals_conceded,
+            COALESCE(SUM({goals_for}), 0) - COALESCE(SUM({goals_against}), 0) AS gd,
+            COALESCE(SUM(CASE WHEN {goals_for} > {goals_against} THEN 3
+                              WHEN {goals_for} = {goals_against} THEN 1
+                              ELSE 0 END), 0) AS points
+        FROM {team_table} t
+        LEFT JOIN {match_table} m
+            ON m.status = %s
+            AND m.home_goals IS NOT NULL
+            AND m.away_goals IS NOT NULL
+            AND (m.home_team_id = t.id OR m.away_team_id = t.id)
+        WHERE t.tournament_id = %s
+        GROUP BY t.id, t.tournament_id, t.name, t.logo
+        ORDER BY points DESC, gd DESC, goals_scored DESC, t.id
+    """
+    return Team.objects.raw(sql, ['FINISHED', tournament.pk])
+
+def compute_standings(tournament):
+    """
+    Computes fresh standings from the finished matches without saving them.
+    Returns a dict of team id -> Team with the STANDINGS_FIELDS recalculated.
+    """
+    return {team.id: team for team in standings_queryset(tournament)}
+
+@profiled('calculate_standings')
 def calculate_standings(tournament):
     """
     Recalculates standings for all teams in the tournament based on finished matches.
     Updates the Team model fields: played, wins, draws, losses, goals_scored, goals_conceded, points.
+    The numbers come from one aggregate query and are written back with one bulk_update.
+    """
+    if not tournament:
+        return
+
+    teams = list(standings_queryset(tournament))
+    Team.objects.bulk_update(teams, STANDINGS_FIELDS)
+
+def find_standings_mismatches(tournament):
+    """
+    Compares the stored points table with one recomputed from the finished matches.
+    Returns a list of (team, field, stored, expected) tuples; empty when consistent.
+    """
+    if not tournament:
+        return []
+
+    expected = compute_standings(tournament)
+    mismatches = []
+    for team in Team.objects.filter(tournament=tournament):
+        fresh = expected[team.id]
+        for field in STANDINGS_FIELDS:
+            if getattr(team, field) != getattr(fresh, field):
+                mismatches.append((team, field, getattr(team, field), getattr(fresh, field)))
+    return mismatches
+
+@profiled('refresh_tournament')
+def refresh_tournament(tournament):
+    """
+    Rebuilds standings and top scorers from scratch; the verification/repair
+    fallback for record_match_change and the path used after bulk imports.
+    Both tables are rebuilt in one transaction so readers never see a half-written state.
+
+    Rebuilds are single-flight per tournament: callers queue on the Tournament row
+    lock, and a caller whose data was already covered by a rebuild that finished
+    while it waited returns without redoing the work. Returns True if it rebuilt.
+    """
+    if not tournament:
+        return False
+
+    # The data version this rebuild has to cover
+    requested = Tournament.objects.filter(pk=tournament.pk).values_list('revision', flat=True).first()
+    if requested is None:
+        return False
+
+    with transaction.atomic():
+        locked = Tournament.objects.select_for_update().get(pk=tournament.pk)
+        if locked.rebuilt_revision > requested:
+            return False
+
+        with deferred_revision_bump() as pending:
+            calculate_standings(locked)
+            update_top_scorers(locked)
+            # Stamped below together with rebuilt_revision
+            pending.discard(locked.pk)
+
+        revision = locked.revision + 1
+        Tournament.objects.filter(pk=locked.pk).update(
+            revision=revision, rebuilt_revision=revision, data_updated_at=Now()
+        )
+        publish_refresh(locked.pk)
+    return True
+
+def schedule_rebuild(tournament):
+    """
+    Full standings/scorers rebuild after results change: queued for the
+    recompute worker when RECOMPUTE_ASYNC is on, otherwise run inline.
     """
     if not tournament:
         return
+    if settings.RECOMPUTE_ASYNC:
+        enqueue_rebuild(tournament)
+    else:
+        refresh_tournament(tournament)
+
+def sync_fixture_scores(single_matches, cleared=()):
+    """
+    Copies finished leg results onto their fixtures: one query to load the
+    fixtures, then an UPDATE of only the leg/aggregate/winner columns that
+    actually changed, skipping fixtures that are already in sync. Used by
+    SingleMatch.save, and directly by bulk imports and matchday entry.
+
+    A fixture that lost a leg result (the leg was reverted to unplayed, moved
+    to another fixture or leg, or deleted; pass deleted legs' fixture ids as
+    `cleared`) is recomputed from the legs it still has, and a winner it no
+    longer has is taken back out of the next round (see advance_winner).
+    Returns the fixtures that changed; bumping the revision is up to the caller.
+    """
+    cleared = set(cleared)
+    for m in single_matches:
+        # Leg result as last read from the database, if the match was loaded
+        old = getattr(m, '_synced_result', None)
+        new = m._fixture_result()
+        if isinstance(old, tuple) and (new is None or new[:3] != old[:3]):
+            cleared.add(old[0])
+    legs = [
+        m for m in single_matches
+        if m.fixture_id and m.status == 'FINISHED' and m.home_goals is not None and m.away_goals is not None
+    ]
+    if not legs and not cleared:
+        return []
+
+    fixtures = Match.objects.in_bulk({m.fixture_id for m in legs} | cleared)
+    old_scores = {pk: fixture_scores(fixture) for pk, fixture in fixtures.items()}
+    if cleared:
+        # Start those fixtures over from the legs they still have (as saved)
+        for pk in cleared & fixtures.keys():
+            for attname in FIXTURE_SCORE_ATTNAMES:
+                setattr(fixtures[pk], attname, None if attname == 'winner_id' else 0)
+        legs = [m for m in legs if m.fixture_id not in cleared] + list(
+            SingleMatch.objects.filter(
+                fixture_id__in=cleared, status='FINISHED', home_goals__isnull=False, away_goals__isnull=False,
+            )
+        )
+    for m in legs:
+        fixture = fixtures.get(m.fixture_id)
+        if fixture:
+            fixture.set_leg_score(m.leg, m.home_team_id, m.home_goals, m.away_goals)
+
+    changes = {}
+    for pk, fixture in fixtures.items():
+        fixture.update_aggregate()
+        new_scores = fixture_scores(fixture)
+        changed = {attname: value for attname, value in new_scores.items() if value != old_scores[pk][attname]}
+        if changed:
+            changes[pk] = changed
+    if len(changes) == 1:
+        # A single result: UPDATE just its changed columns
+        [(pk, changed)] = changes.items()
+        Match.objects.filter(pk=pk).update(**changed)
+    elif changes:
+        attnames = set().union(*changes.values())
+        Match.objects.bulk_update(
+            [fixtures[pk] for pk in changes],
+            [name for name, attname in zip(FIXTURE_SCORE_FIELDS, FIXTURE_SCORE_ATTNAMES) if attname in attnames],
+        )
+    for pk, changed in changes.items():
+        if 'winner_id' in changed:
+            advance_winner(fixtures[pk])
+    return [fixtures[pk] for pk in changes]
+
+def fixture_scores(fixture):
+    return {attname: getattr(fixture, attname) for attname in FIXTURE_SCORE_ATTNAMES}
+
+def save_match_results(tournament, results):
+    """
+    Records the scores of many upcoming SingleMatches at once (matchday entry),
+    given as (match, home_goals, away_goals): one bulk_update and one bulk
+    fixture sync in a single transaction, then one standings/scorers rebuild
+    for the whole batch instead of one per match. Returns the saved matches.
+    """
+    matches = []
+    for match, home_goals, away_goals in results:
+        match.home_goals, match.away_goals, match.status = home_goals, away_goals, 'FINISHED'
+        matches.append(match)
+    with transaction.atomic():
+        SingleMatch.objects.bulk_update(matches, ['home_goals', 'away_goals', 'status'])
+        sync_fixture_scores(matches)
+        # bulk_update skips the save signals
+        bump_revision(tournament.pk)
+    schedule_rebuild(tournament)
+    return matches
+
+def match_result(match):
+    """
+    Returns the part of a SingleMatch that counts towards the points table as
+    (home_team_id, home_goals, away_team_id, away_goals), or None if it doesn't count
+    (not finished, missing goals, or deleted).
+    """
+    if match is None or match.status != 'FINISHED':
+        return None
+    if match.home_goals is None or match.away_goals is None:
+        return None
+    return (match.home_team_id, match.home_goals, match.away_team_id, match.away_goals)
+
+class StatsDelta:
+    """Zeroed stand-in for a Team so update_single_match_stats can compute one match's contribution."""
+
+    def __init__(self):
+        for field in STANDINGS_FIELDS:
+            setattr(self, field, 0)
+
+def apply_match_delta(old_result, new_result):
+    """
+    Incrementally updates the stored standings for a single match change:
+    the old contribution is reversed and the new one applied, touching only
+    the affected Team rows with F-expression updates.
+    Covers status flips, goal corrections, team swaps (old_result/new_result
+    may involve different teams) and deletion (new_result is None).
+    """
+    totals = defaultdict(StatsDelta)
+    for result, sign in ((old_result, -1), (new_result, 1)):
+        if result is None:
+            continue
+        home_id, home_goals, away_id, away_goals = result
+        home, away = StatsDelta(), StatsDelta()
+        update_single_match_stats(home, home_goals, away, away_goals)
+        for team_id, contribution in ((home_id, home), (away_id, away)):
+            total = totals[team_id]
+            for field in STANDINGS_FIELDS:
+                setattr(total, field, getattr(total, field) + sign * getattr(contribution, field))
+
+    with transaction.atomic():
+        for team_id, total in totals.items():
+            changes = {
+                field: F(field) + getattr(total, field)
+                for field in STANDINGS_FIELDS
+                if getattr(total, field)
+            }
+            if changes:
+                Team.objects.filter(pk=team_id).update(**changes)
+
+def record_match_change(write, match=None):
+    """
+    Runs `write`, which adds, edits or deletes one SingleMatch and returns the
+    saved match (None for a delete), and applies the change to the standings and
+    top scorers of the affected tournaments. `match` is the instance being
+    edited or deleted. Use refresh_tournament for a full rebuild instead.
+
+    The old result is read from the match row locked with select_for_update in
+    the same transaction as the write, so two concurrent edits of one match
+    reverse each other's result in turn rather than both reversing the same one.
+    With RECOMPUTE_ASYNC the scorers are left to the recompute worker, so the
+    admin request only pays for the two-row standings delta.
+    """
+    with transaction.atomic(), deferred_revision_bump():
+        old = None
+        if match is not None and match.pk is not None:
+            old = SingleMatch.objects.select_for_update().filter(pk=match.pk).first()
+            if old is not None:
+                # Sync the fixture against the row as it is now, not as the caller loaded it
+                match._synced_result = old._fixture_result()
+        old_result = match_result(old)
+        saved = write()
+        new_result = match_result(saved)
 
-    teams = Team.objects.filter(tournament=tournament)
-    
-    # Reset stats
-    for team in teams:
-        team.played = 0
-        team.wins = 0
-        team.draws = 0
-        team.losses = 0
-        team.goals_scored = 0
-        team.goals_conceded = 0
-        team.points = 0
-    
-    team_stats = {team.id: team for team in teams}
-    
-    matches = SingleMatch.objects.filter(home_team__tournament=tournament, status='FINISHED')
-
-    for m in matches:
-        t1 = team_stats.get(m.home_team_id)
-        t2 = team_stats.get(m.away_team_id)
-        
-        if t1 and t2:
-            update_single_match_stats(t1, m.home_goals, t2, m.away_goals)
-
-    # Save all
-    for team in team_stats.values():
-        team.save()
+        # Serialize with other writers and rebuilds of the same tournaments (in pk order to avoid deadlocks)
+        tournament_ids = sorted({m.tournament_id for m in (old, saved) if m is not None})
+        tournaments = list(Tournament.objects.select_for_update().filter(pk__in=tournament_ids).order_by('pk'))
+        apply_match_delta(old_result, new_result)
+        publish_standings({
+            team_id for result in (old_result, new_result) if result
+            for team_id in (result[0], result[2])
+        })
+        for tournament in tournaments:
+            if settings.RECOMPUTE_ASYNC:
+                enqueue_rebuild(tournament)
+            elif not has_goal_events(tournament):
+                # Scorers derived from team goals; goal events maintain their own leaderboard
+                update_top_scorers(tournament)
+            # The F-expression updates above don't fire signals
+            bump_revision(tournament.pk)
+    return saved
 
 def update_single_match_stats(team_a, score_a, team_b, score_b):
     team_a.played += 1
     team_b.played += 1
-    
+
     team_a.goals_scored += score_a
     team_a.goals_conceded += score_b
     team_b.goals_scored += score_b
     team_b.goals_conceded += score_a
-    
+
     if score_a > score_b:
         team_a.wins += 1
         team_a.points += 3
@@ -58,23 +436,91 @@ def update_single_match_stats(team_a, score_a, team_b, score_b):
         team_b.draws += 1
         team_b.points += 1
 
+def has_goal_events(tournament):
+    return GoalEvent.objects.filter(team__tournament=tournament).exists()
+
+def top_scorers_leaderboard(tournament, limit=None):
+    """
+    Reads the top `limit` scorers of the tournament straight off the
+    (tournament, -goals) index, without scanning or sorting the whole table.
+    """
+    scorers = TopScorer.objects.filter(tournament=tournament).select_related('team').order_by('-goals', 'pk')
+    return scorers[:limit] if limit else scorers
+
+def scorer_key(event):
+    """
+    Returns the leaderboard entry a GoalEvent counts for as
+    (tournament_id, team_id, player_name), or None (no event, or an own goal).
+    """
+    if event is None or event.own_goal:
+        return None
+    return (event.team.tournament_id, event.team_id, event.player_name)
+
+def apply_scorer_delta(old_key, new_key):
+    """
+    Moves one goal on the leaderboard from old_key to new_key (either may be None),
+    touching at most two TopScorer rows with F-expression updates.
+    """
+    if old_key == new_key:
+        return
+
+    with transaction.atomic(), deferred_revision_bump():
+        if new_key is not None:
+            tournament_id, team_id, player_name = new_key
+            # Under the (team, player_name) constraint a concurrent first goal gets the same row
+            scorer, created = TopScorer.objects.get_or_create(
+                team_id=team_id, player_name=player_name, defaults={'tournament_id': tournament_id, 'goals': 0}
+            )
+            TopScorer.objects.filter(pk=scorer.pk).update(goals=F('goals') + 1)
+            bump_revision(tournament_id)
+
+        if old_key is not None:
+            tournament_id, team_id, player_name = old_key
+            scorers = TopScorer.objects.filter(team_id=team_id, player_name=player_name)
+            scorers.update(goals=F('goals') - 1)
+            scorers.filter(goals__lte=0).delete()
+            bump_revision(tournament_id)
+
+@profiled('update_top_scorers')
 def update_top_scorers(tournament):
     """
-    Recalculates top scorers based on team goals.
-    Since we don't have individual player goal data in the Match model,
-    we assume Team Name = Player Name (as per user context).
+    Rebuilds the top scorers of the tournament in one transaction.
+    Built from the recorded goal events (own goals excluded) when the tournament has any;
+    otherwise, without individual player goal data, we assume Team Name = Player Name
+    (as per user context) and use the team's goals.
+    Uploaded photos are carried over to the rebuilt rows.
     """
     if not tournament:
         return
-        
-    # Clear existing
-    TopScorer.objects.filter(team__tournament=tournament).delete()
-    
-    teams = Team.objects.filter(tournament=tournament)
-    for team in teams:
-        if team.goals_scored > 0:
-            TopScorer.objects.create(
-                player_name=team.name,
-                team=team,
-                goals=team.goals_scored
+
+    with transaction.atomic():
+        existing = TopScorer.objects.filter(tournament=tournament)
+        photos = {
+            (team_id, player_name): photo
+            for team_id, player_name, photo in existing.exclude(photo='').values_list('team_id', 'player_name', 'photo')
+        }
+        existing.delete()
+
+        if has_goal_events(tournament):
+            rows = (
+                GoalEvent.objects.filter(team__tournament=tournament, own_goal=False)
+                .values_list('team_id', 'player_name')
+                .annotate(goals=Count('pk'))
+                .order_by()
+            )
+        else:
+            rows = (
+                Team.objects.filter(tournament=tournament, goals_scored__gt=0)
+                .values_list('pk', 'name', 'goals_scored')
+            )
+
+        TopScorer.objects.bulk_create([
+            TopScorer(
+                tournament=tournament,
+                team_id=team_id,
+                player_name=player_name,
+                goals=goals,
+                photo=photos.get((team_id, player_name)),
             )
+            for team_id, player_name, goals in rows
+        ])
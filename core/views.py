@@ -1,131 +1,565 @@
-from django.shortcuts import render
-from .models import Tournament, Team, Match, SingleMatch, TopScorer
+from collections import namedtuple
+from datetime import datetime, time, timedelta
 
-def get_current_tournament():
-    # Helper to get the first tournament or None
-    return Tournament.objects.first()
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import APIException
+from .models import Team, Match, SingleMatch
+from .api import KeysetPagination
+from .bracket import Bracket, BracketConflict
+from .cache import cache_page_by_revision, is_htmx, revision_conditions
+from .ical import astream_calendar, calendar_matches, stream_calendar
+from .metrics import collect, registry, render_metrics
+from .profiling import capture_path, capture_summary, list_captures, profile_view
+from .utils import aget_tournament, get_tournament, top_scorers_leaderboard
 
-def home(request):
+# Every page below is served for the default tournament at the top-level URLs
+# and for any tournament under /t/<slug>/ (see core.urls); views take the slug
+# as an optional keyword.
+
+def tournament_or_404(request, slug):
+    # Without a slug a site with no tournament yet renders empty pages; an unknown slug is a 404
+    tournament = get_tournament(request, slug)
+    if tournament is None and slug is not None:
+        raise Http404("No such tournament")
+    return tournament
+
+async def atournament_or_404(request, slug):
+    tournament = await aget_tournament(request, slug)
+    if tournament is None and slug is not None:
+        raise Http404("No such tournament")
+    return tournament
+
+def tournament_kwargs(slug):
+    # URL kwargs that keep redirects within the tournament's URL space
+    return {'slug': slug} if slug else {}
+
+def home(request, slug=None):
     # Home is now a dashboard
+    tournament_or_404(request, slug)
     return render(request, 'core/home.html')
 
-from .utils import calculate_standings
+from .utils import ordered_standings
 
-def standings(request):
-    tournament = get_current_tournament()
+@profile_view('standings')
+@cache_page_by_revision('standings')
+def standings(request, slug=None):
+    tournament = tournament_or_404(request, slug)
     teams = []
     if tournament:
-        # Calculate standings on the fly to ensure accuracy
-        calculate_standings(tournament)
-        
-        # Sort by Points (desc), then Goal Difference (desc), then Goals Scored (desc)
-        teams = tournament.teams.all()
-        teams = sorted(teams, key=lambda t: (t.points, t.goal_difference, t.goals_scored), reverse=True)
+        # Standings are materialized whenever a result changes (see refresh_tournament),
+        # so this is a single read of the stored, already-sorted points table.
+        teams = ordered_standings(tournament)
     
     context = {
         'tournament': tournament,
         'teams': teams,
         'page': 'standings'
     }
-    return render(request, 'core/standings.html', context)
+    # HTMX swaps only need the table fragment
+    template = 'core/includes/standings_content.html' if is_htmx(request) else 'core/standings.html'
+    return render(request, template, context)
 
-def match_generator(request):
-    tournament = get_current_tournament()
+def match_generator(request, slug=None):
+    tournament = tournament_or_404(request, slug)
     teams = []
     if tournament:
         teams = list(tournament.teams.values_list('name', flat=True))
     return render(request, 'core/match_generator.html', {'teams': teams})
 
-def bracket(request):
-    tournament = get_current_tournament()
-    matches = []
-    if tournament:
-        # Use Match (Fixture) model for bracket
-        matches = Match.objects.filter(tournament=tournament).select_related('team_a', 'team_b', 'winner')
-    
-    # Organize matches by round for easier template rendering
-    rounds = {
-        'R16': [],
-        'QF': [],
-        'SF': [],
-        'F': []
-    }
-    for m in matches:
-        if m.round in rounds:
-            rounds[m.round].append(m)
-            
+@profile_view('bracket')
+@cache_page_by_revision('bracket')
+def bracket(request, slug=None):
+    tournament = tournament_or_404(request, slug)
+    # Whole fixture tree with legs in a fixed number of queries, organized into rounds in bracket order
+    columns = Bracket.for_tournament(tournament).columns if tournament else Bracket([]).columns
+
     context = {
         'tournament': tournament,
-        'rounds': rounds,
+        'columns': columns,
         'page': 'bracket'
     }
-    return render(request, 'core/bracket.html', context)
+    template = 'core/includes/bracket_content.html' if is_htmx(request) else 'core/bracket.html'
+    return render(request, template, context)
 
-def top_scorers(request):
-    tournament = get_current_tournament()
+@profile_view('top_scorers')
+@cache_page_by_revision('top_scorers')
+def top_scorers(request, slug=None):
+    tournament = tournament_or_404(request, slug)
     scorers = []
     if tournament:
-        scorers = TopScorer.objects.filter(team__tournament=tournament).order_by('-goals')
+        scorers = top_scorers_leaderboard(tournament, settings.TOP_SCORERS_LIMIT)
         
     context = {
         'tournament': tournament,
         'scorers': scorers,
         'page': 'scorers'
     }
-    return render(request, 'core/top_scorers.html', context)
+    template = 'core/includes/scorers_content.html' if is_htmx(request) else 'core/top_scorers.html'
+    return render(request, template, context)
+
+# --- Upcoming matches: a date window, paged by (match_datetime, id) ---
+
+UpcomingWindow = namedtuple('UpcomingWindow', 'first_day days start end explicit')
+UPCOMING_MAX_WINDOW_DAYS = 92
+# Query parameters of the upcoming page (window and KeysetPagination); the page cache ignores any others
+UPCOMING_PARAMS = ('from', 'days', 'cursor', 'page_size')
+
+def upcoming_window(request):
+    """
+    The dates the upcoming page covers, in the site's time zone: ?from=YYYY-MM-DD
+    for ?days= days (default UPCOMING_WINDOW_DAYS). Without ?from it is
+    everything still to be played up to that many days from today, followed by
+    the matches that have no date yet.
+    """
+    try:
+        first_day = parse_date(request.GET.get('from', ''))
+    except ValueError:
+        first_day = None
+    try:
+        days = int(request.GET.get('days', settings.UPCOMING_WINDOW_DAYS))
+    except ValueError:
+        days = settings.UPCOMING_WINDOW_DAYS
+    days = max(1, min(days, UPCOMING_MAX_WINDOW_DAYS))
+
+    explicit = first_day is not None
+    first_day = first_day or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(first_day + timedelta(days=days), time.min))
+    return UpcomingWindow(first_day, days, start, end, explicit)
+
+def upcoming_queryset(tournament, window):
+    # Each match carries its local day (computed in the database) for the page's day headings
+    dates = Q(match_datetime__lt=window.end)
+    if window.explicit:
+        dates &= Q(match_datetime__gte=window.start)
+    else:
+        dates |= Q(match_datetime__isnull=True)
+    return (
+        SingleMatch.objects.filter(dates, tournament=tournament, status='UPCOMING')
+        .annotate(match_day=TruncDate('match_datetime'))
+        .select_related('home_team', 'away_team')
+    )
+
+def upcoming_days(tournament, window):
+    # Number of matches on each local day of the window, grouped by the database
+    matches = SingleMatch.objects.filter(tournament=tournament, status='UPCOMING', match_datetime__lt=window.end)
+    if window.explicit:
+        matches = matches.filter(match_datetime__gte=window.start)
+    return (
+        matches.annotate(match_day=TruncDate('match_datetime'))
+        .values('match_day').annotate(matches=Count('id')).order_by('match_day')
+    )
+
+def upcoming_context(tournament, window, paginator, matches, days):
+    return {
+        'tournament': tournament,
+        'matches': matches,
+        'days': days,
+        'window': window,
+        'last_day': window.first_day + timedelta(days=window.days - 1),
+        'earlier_from': window.first_day - timedelta(days=window.days) if window.explicit else None,
+        'later_from': window.first_day + timedelta(days=window.days),
+        'next_page': paginator.get_next_link() if paginator else None,
+        'page': 'upcoming',
+    }
+
+@profile_view('upcoming')
+@cache_page_by_revision('upcoming', UPCOMING_PARAMS)
+def upcoming_matches(request, slug=None):
+    # Upcoming matches of the tournament in kick-off order, one keyset page of
+    # a date window at a time (see KeysetPagination), grouped by match day
+    tournament = tournament_or_404(request, slug)
+    window = upcoming_window(request)
+    paginator, matches, days = None, [], []
+    if tournament:
+        paginator = KeysetPagination()
+        try:
+            matches = paginator.paginate_queryset(upcoming_queryset(tournament, window), request)
+        except APIException:
+            raise Http404("Invalid page")
+        days = list(upcoming_days(tournament, window))
+    context = upcoming_context(tournament, window, paginator, matches, days)
+    template = 'core/includes/upcoming_content.html' if is_htmx(request) else 'core/upcoming.html'
+    return render(request, template, context)
+
+def calendar_team_id(request):
+    # ?team=<id> narrows the calendar to one team
+    team_id = request.GET.get('team')
+    if not team_id:
+        return None
+    try:
+        return int(team_id)
+    except ValueError:
+        raise Http404("No such team")
+
+def calendar_response(tournament, stream):
+    response = StreamingHttpResponse(stream, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{tournament.slug}.ics"'
+    patch_cache_control(response, no_cache=True)
+    return response
+
+@revision_conditions('calendar', ['team'])
+def upcoming_calendar(request, slug=None):
+    """
+    iCalendar feed of the tournament's fixtures (?team=<id> for one team's) to
+    subscribe to from a calendar app. Streamed from the database in chunks;
+    re-fetches answer 304 until the tournament revision changes.
+    """
+    tournament = get_tournament(request, slug)
+    if tournament is None:
+        raise Http404("No such tournament")
+    team_id, team = calendar_team_id(request), None
+    if team_id is not None:
+        team = get_object_or_404(Team, pk=team_id, tournament=tournament)
+    matches = calendar_matches(tournament, team)
+    return calendar_response(tournament, stream_calendar(tournament, matches, request.get_host(), team))
+
+# --- Async variants (served instead of the views above when ASYNC_VIEWS is on, see core.urls) ---
+# Same pages, caches and templates, but every query goes through the async ORM,
+# so under an ASGI server a slow database round-trip suspends the request
+# instead of pinning a worker. Querysets are evaluated before rendering.
+from .cache import acache_page_by_revision
+
+@acache_page_by_revision('standings')
+async def standings_async(request, slug=None):
+    tournament = await atournament_or_404(request, slug)
+    teams = [team async for team in ordered_standings(tournament)] if tournament else []
+    context = {'tournament': tournament, 'teams': teams, 'page': 'standings'}
+    template = 'core/includes/standings_content.html' if is_htmx(request) else 'core/standings.html'
+    return render(request, template, context)
+
+@acache_page_by_revision('bracket')
+async def bracket_async(request, slug=None):
+    tournament = await atournament_or_404(request, slug)
+    bracket = await Bracket.afor_tournament(tournament) if tournament else Bracket([])
+    context = {'tournament': tournament, 'columns': bracket.columns, 'page': 'bracket'}
+    template = 'core/includes/bracket_content.html' if is_htmx(request) else 'core/bracket.html'
+    return render(request, template, context)
+
+@acache_page_by_revision('top_scorers')
+async def top_scorers_async(request, slug=None):
+    tournament = await atournament_or_404(request, slug)
+    scorers = []
+    if tournament:
+        scorers = [scorer async for scorer in top_scorers_leaderboard(tournament, settings.TOP_SCORERS_LIMIT)]
+    context = {'tournament': tournament, 'scorers': scorers, 'page': 'scorers'}
+    template = 'core/includes/scorers_content.html' if is_htmx(request) else 'core/top_scorers.html'
+    return render(request, template, context)
+
+@acache_page_by_revision('upcoming', UPCOMING_PARAMS)
+async def upcoming_matches_async(request, slug=None):
+    tournament = await atournament_or_404(request, slug)
+    window = upcoming_window(request)
+    paginator, matches, days = None, [], []
+    if tournament:
+        paginator = KeysetPagination()
+        try:
+            matches = await paginator.apaginate_queryset(upcoming_queryset(tournament, window), request)
+        except APIException:
+            raise Http404("Invalid page")
+        days = [day async for day in upcoming_days(tournament, window)]
+    context = upcoming_context(tournament, window, paginator, matches, days)
+    template = 'core/includes/upcoming_content.html' if is_htmx(request) else 'core/upcoming.html'
+    return render(request, template, context)
+
+async def upcoming_calendar_async(request, slug=None):
+    # Loads the tournament first so the (sync) ETag callbacks don't query from the event loop
+    tournament = await aget_tournament(request, slug)
+    return await _upcoming_calendar_async(request, tournament, slug=slug)
 
-def upcoming_matches(request):
-    # Fetch matches that are scheduled but not finished (winner is None)
-    # Using new SingleMatch model
-    matches = SingleMatch.objects.filter(status='UPCOMING').select_related('home_team', 'away_team').order_by('match_datetime')
-    return render(request, 'core/upcoming.html', {'matches': matches})
+@revision_conditions('calendar', ['team'])
+async def _upcoming_calendar_async(request, tournament, slug=None):
+    if tournament is None:
+        raise Http404("No such tournament")
+    team_id, team = calendar_team_id(request), None
+    if team_id is not None:
+        team = await Team.objects.filter(pk=team_id, tournament=tournament).afirst()
+        if team is None:
+            raise Http404("No such team")
+    matches = calendar_matches(tournament, team)
+    return calendar_response(tournament, astream_calendar(tournament, matches, request.get_host(), team))
+
+# --- Live Feed ---
+from django.core.handlers.asgi import ASGIRequest
+from .live import catch_up_stream, event_stream
+
+async def live_feed(request, slug=None):
+    # Server-Sent Events: match scores, standings rows and bracket changes as they are saved
+    tournament = await aget_tournament(request, slug)
+    if tournament is None:
+        raise Http404("No tournament")
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    if isinstance(request, ASGIRequest):
+        stream = event_stream(tournament, last_event_id)
+    else:
+        # A WSGI worker can't hold the connection open; send what's new and let the client reconnect
+        stream = await catch_up_stream(tournament, last_event_id)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def metrics(request):
+    # Prometheus scrape endpoint: request metrics of every worker process (core.metrics)
+    token = settings.METRICS_TOKEN
+    authorized = token and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    if not (authorized or request.user.is_staff):
+        return HttpResponseForbidden()
+    registry.flush(force=True)
+    return HttpResponse(render_metrics(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # --- Custom Admin Views ---
-from django.shortcuts import redirect, get_object_or_404
+from django.shortcuts import redirect
 from django.contrib.admin.views.decorators import staff_member_required
-from .forms import MatchForm
-from .utils import calculate_standings, update_top_scorers
+from django.urls import reverse
+from .forms import MatchdayFormSet, MatchFilterForm, MatchForm
+from .utils import record_match_change, save_match_results, tournament_choices
+
+# Rows per page of the match list
+MATCH_LIST_PAGE_SIZE = 50
 
 @staff_member_required
-def match_list(request):
-    matches = SingleMatch.objects.all().select_related('home_team', 'away_team').order_by('-id')
-    return render(request, 'core/admin/match_list.html', {'matches': matches})
+@profile_view('match_list')
+def match_list(request, slug=None):
+    """
+    The tournament's matches, newest first, one keyset page on id at a time
+    (?after=<id> for older, ?before=<id> for newer) narrowed by MatchFilterForm.
+    HTMX requests from the filters and the pager get only the table rows back.
+    The number of queries doesn't depend on how many matches there are.
+    """
+    tournament = tournament_or_404(request, slug)
+    switch_to = request.GET.get('tournament')
+    if tournament and switch_to and switch_to != tournament.slug:
+        return switch_tournament(request, switch_to)
+
+    form = MatchFilterForm(request.GET, tournament=tournament)
+    matches = filter_matches(
+        SingleMatch.objects.filter(tournament=tournament).select_related('home_team', 'away_team'),
+        form.filters(),
+    )
+    rows, older, newer = id_keyset_page(matches, request.GET.get('after'), request.GET.get('before'))
+    context = {
+        'matches': rows,
+        'older_page': page_query(request, after=rows[-1].pk) if older else None,
+        'newer_page': page_query(request, before=rows[0].pk) if newer and rows else None,
+        'tournament': tournament,
+    }
+    if is_htmx(request) and not request.headers.get('HX-History-Restore-Request'):
+        return render(request, 'core/admin/includes/match_rows.html', context)
+    context.update(form=form, tournaments=tournament_choices())
+    return render(request, 'core/admin/match_list.html', context)
+
+def switch_tournament(request, slug):
+    # The tournament picker: same filters, that tournament's list (a full page load, its teams differ)
+    query = request.GET.copy()
+    for name in ('tournament', 'team', 'after', 'before'):
+        query.pop(name, None)
+    url = reverse('match_list', kwargs={'slug': slug})
+    if query:
+        url = f"{url}?{query.urlencode()}"
+    if is_htmx(request):
+        response = HttpResponse()
+        response['HX-Redirect'] = url
+        return response
+    return redirect(url)
+
+def filter_matches(matches, filters):
+    if 'status' in filters:
+        matches = matches.filter(status=filters['status'])
+    if 'leg' in filters:
+        matches = matches.filter(leg=filters['leg'])
+    if 'team' in filters:
+        matches = matches.filter(Q(home_team=filters['team']) | Q(away_team=filters['team']))
+    if 'date' in filters:
+        # One local day
+        start = timezone.make_aware(datetime.combine(filters['date'], time.min))
+        matches = matches.filter(match_datetime__gte=start, match_datetime__lt=start + timedelta(days=1))
+    if 'q' in filters:
+        text = filters['q'].strip()
+        search = Q(home_team__name__icontains=text) | Q(away_team__name__icontains=text)
+        if text.lstrip('#').isdigit():
+            search |= Q(pk=int(text.lstrip('#')))
+        matches = matches.filter(search)
+    return matches
+
+def id_keyset_page(queryset, after=None, before=None, size=None):
+    """
+    One page of `queryset` in descending id order, starting below id `after`
+    or ending above id `before`. Returns (rows, has_older, has_newer); every
+    page is a single index range read, however deep.
+    """
+    size = size or MATCH_LIST_PAGE_SIZE
+    try:
+        after = int(after) if after else None
+        before = int(before) if before else None
+    except ValueError:
+        after = before = None
+
+    if before is not None:
+        rows = list(queryset.filter(pk__gt=before).order_by('pk')[:size + 1])
+        has_newer = len(rows) > size
+        return rows[:size][::-1], True, has_newer
+
+    if after is not None:
+        queryset = queryset.filter(pk__lt=after)
+    rows = list(queryset.order_by('-pk')[:size + 1])
+    return rows[:size], len(rows) > size, after is not None
+
+def page_query(request, **cursor):
+    # The current filters with the pager cursor replaced
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query.update(cursor)
+    return f"?{query.urlencode()}"
 
 @staff_member_required
-def match_add(request):
+@profile_view('matchday')
+def matchday(request, slug=None):
+    """
+    Result entry for a whole matchday: the UPCOMING matches of one local date
+    (?date=, by default the next date with matches) or of one knockout round
+    (?round=) as a formset, validated together and saved in one transaction
+    with a single standings/scorers rebuild (see save_match_results).
+    """
+    tournament = tournament_or_404(request, slug)
+    upcoming = SingleMatch.objects.filter(tournament=tournament, status='UPCOMING')
+    day, round_code = matchday_selection(request, upcoming)
+
+    matches = upcoming.select_related('home_team', 'away_team', 'fixture').order_by(F('match_datetime').asc(nulls_last=True), 'pk')
+    if round_code:
+        matches = matches.filter(fixture__round=round_code)
+    elif day:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        matches = matches.filter(match_datetime__gte=start, match_datetime__lt=start + timedelta(days=1))
+    else:
+        matches = matches.none()
+
+    formset = MatchdayFormSet(request.POST or None, matches=matches)
+    if request.method == 'POST' and formset.is_valid():
+        try:
+            saved = save_match_results(tournament, formset.results)
+        except BracketConflict as exc:
+            formset.non_form_errors().extend(exc.messages)
+        else:
+            query = request.GET.copy()
+            query['saved'] = len(saved)
+            return redirect(f"{request.path}?{query.urlencode()}")
+
+    open_rounds = set(upcoming.exclude(fixture=None).values_list('fixture__round', flat=True).distinct())
+    context = {
+        'tournament': tournament,
+        'formset': formset,
+        'day': day,
+        'round': round_code,
+        'round_label': dict(Match.ROUND_CHOICES).get(round_code),
+        # Other matchdays to pick from
+        'days': (
+            upcoming.filter(match_datetime__isnull=False).annotate(match_day=TruncDate('match_datetime'))
+            .values_list('match_day', flat=True).distinct().order_by('match_day')[:30]
+        ),
+        'rounds': [(code, label) for code, label in Match.ROUND_CHOICES if code in open_rounds],
+        'saved': request.GET.get('saved'),
+    }
+    return render(request, 'core/admin/matchday.html', context)
+
+def matchday_selection(request, upcoming):
+    # (day, round code) the matchday screen shows; at most one of them is set
+    round_code = request.GET.get('round')
+    if round_code in dict(Match.ROUND_CHOICES):
+        return None, round_code
+    try:
+        day = parse_date(request.GET.get('date', ''))
+    except ValueError:
+        day = None
+    if day is None:
+        kickoff = (
+            upcoming.filter(match_datetime__isnull=False).order_by('match_datetime')
+            .values_list('match_datetime', flat=True).first()
+        )
+        day = timezone.localdate(kickoff) if kickoff else None
+    return day, None
+
+@staff_member_required
+def match_add(request, slug=None):
+    tournament = tournament_or_404(request, slug)
     if request.method == 'POST':
-        form = MatchForm(request.POST)
+        form = MatchForm(request.POST, tournament=tournament)
         if form.is_valid():
-            match = form.save()
-            # Auto-recalculate
-            calculate_standings(match.home_team.tournament)
-            update_top_scorers(match.home_team.tournament)
-            return redirect('match_list')
+            try:
+                # Apply just this result to the stored standings
+                record_match_change(form.save)
+            except BracketConflict as exc:
+                form.add_error(None, exc)
+            else:
+                return redirect('match_list', **tournament_kwargs(slug))
     else:
-        form = MatchForm()
+        form = MatchForm(tournament=tournament)
     return render(request, 'core/admin/match_form.html', {'form': form, 'title': 'Add Match'})
 
 @staff_member_required
-def match_edit(request, pk):
-    match = get_object_or_404(SingleMatch, pk=pk)
+def match_edit(request, pk, slug=None):
+    tournament = tournament_or_404(request, slug)
+    match = get_object_or_404(SingleMatch, pk=pk, tournament=tournament)
     if request.method == 'POST':
-        form = MatchForm(request.POST, instance=match)
+        form = MatchForm(request.POST, instance=match, tournament=tournament)
         if form.is_valid():
-            match = form.save()
-            calculate_standings(match.home_team.tournament)
-            update_top_scorers(match.home_team.tournament)
-            return redirect('match_list')
+            try:
+                # The result being replaced is read from the locked row, not from this possibly stale instance
+                record_match_change(form.save, match)
+            except BracketConflict as exc:
+                form.add_error(None, exc)
+            else:
+                return redirect('match_list', **tournament_kwargs(slug))
     else:
-        form = MatchForm(instance=match)
+        form = MatchForm(instance=match, tournament=tournament)
     return render(request, 'core/admin/match_form.html', {'form': form, 'title': 'Edit Match'})
 
 @staff_member_required
-def match_delete(request, pk):
-    match = get_object_or_404(SingleMatch, pk=pk)
+def match_delete(request, pk, slug=None):
+    tournament = tournament_or_404(request, slug)
+    match = get_object_or_404(SingleMatch, pk=pk, tournament=tournament)
     if request.method == 'POST':
-        tournament = match.home_team.tournament
-        match.delete()
-        calculate_standings(tournament)
-        update_top_scorers(tournament)
-        return redirect('match_list')
+        def delete():
+            match.delete()
+        try:
+            record_match_change(delete, match)
+        except BracketConflict as exc:
+            return render(request, 'core/admin/match_confirm_delete.html', {'match': match, 'error': exc.message})
+        return redirect('match_list', **tournament_kwargs(slug))
     return render(request, 'core/admin/match_confirm_delete.html', {'match': match})
+
+@staff_member_required
+def profile_list(request):
+    # Profiles captured by core.profiling, newest first
+    captures = list_captures()
+    selected = request.GET.get('show')
+    path = capture_path(selected) if selected else None
+    context = {
+        'captures': captures,
+        'selected': selected if path else None,
+        'summary': capture_summary(path) if path else None,
+    }
+    return render(request, 'core/admin/profiles.html', context)
+
+@staff_member_required
+def profile_download(request, capture_id):
+    path = capture_path(capture_id)
+    if path is None:
+        raise Http404("No such profile")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f"{capture_id}.prof")
@@ -0,0 +1,451 @@
+"""
+Load test of a whole deployment, for sizing instances before a tournament:
+boots the app under gunicorn (as in the Procfile) or uvicorn against a
+generated tournament, drives a mix of public page reads, HTMX fragment polls,
+admin reads and admin result entry from concurrent virtual users, and reports
+throughput and p50/p95/p99 latency per endpoint.
+
+    python loadtest.py                                         # gunicorn, 2 sync workers, 1000 teams
+    python loadtest.py --server asgi --workers 4 --users 100 --duration 60
+    python loadtest.py --worker-class gthread --threads 8 --env CACHE_URL=filecache:///tmp/kp-cache
+    python loadtest.py --mix read=90,fragment=10,admin=0,write=0 --json before.json
+    python loadtest.py --url https://staging.example.com --slug summer-cup --admin admin:secret
+
+Without --url the dataset lives in its own database (--database-url, by
+default a SQLite file in the temp directory) and is generated once per
+--teams/--seed with `manage.py generate_tournament`, with a staff user for the
+admin actions. SQLite serializes writers, so use PostgreSQL to size a
+deployment that takes results during the event.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ADMIN_USERNAME = 'loadtest'
+ADMIN_PASSWORD = 'loadtest-password'
+
+DEFAULT_MIX = 'read=70,fragment=20,admin=7,write=3'
+
+
+# --- Dataset (in this process, against the load test database) ---
+
+def prepare_dataset(database_url, teams, seed, matches_per_team):
+    """Migrates the database and generates the tournament and staff user once. Returns the slug."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tournament_project.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from core.models import Tournament
+
+    call_command('migrate', verbosity=0)
+    # The server runs without DEBUG, which serves static files from the collected manifest
+    call_command('collectstatic', interactive=False, verbosity=0)
+    slug = f"loadtest-{teams}x{matches_per_team}-s{seed}"
+    if not Tournament.objects.filter(slug=slug).exists():
+        print(f"Generating {slug}...", flush=True)
+        call_command('generate_tournament', teams=teams, matches_per_team=matches_per_team, seed=seed, slug=slug, goal_events=True)
+    user, _ = User.objects.get_or_create(username=ADMIN_USERNAME, defaults={'is_staff': True, 'is_superuser': True})
+    user.set_password(ADMIN_PASSWORD)
+    user.save()
+    return slug
+
+
+# --- Server ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("the server exited during startup")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} didn't start")
+
+def start_server(args, env):
+    port = free_port()
+    if args.server == 'wsgi':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'tournament_project.wsgi',
+            '--workers', str(args.workers), '--worker-class', args.worker_class,
+            '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+        ]
+        if args.threads:
+            command += ['--threads', str(args.threads)]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', 'tournament_project.asgi:application',
+            '--workers', str(args.workers), '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+        ]
+    process = subprocess.Popen(command, env=env, cwd=BASE_DIR)
+    try:
+        wait_for(port, process)
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process, f"http://127.0.0.1:{port}"
+
+
+# --- Client: a minimal keep-alive HTTP/1.1 client ---
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status, self.headers, self.body = status, headers, body
+
+    def cookies(self):
+        cookies = {}
+        for value in self.headers.get('set-cookie', []):
+            name, _, rest = value.partition('=')
+            cookies[name.strip()] = rest.split(';', 1)[0]
+        return cookies
+
+class Connection:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.tls = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.tls else 80)
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        if self.writer is None:
+            context = ssl.create_default_context() if self.tls else None
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        try:
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await self.writer.drain()
+            response, keep_alive = await self.read_response()
+        except BaseException:
+            self.close()
+            raise
+        if not keep_alive:
+            # gunicorn's sync workers close the connection after each response
+            self.close()
+        return response
+
+    async def read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers = defaultdict(list)
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()].append(value.strip())
+        keep_alive = 'close' not in [value.lower() for value in headers.get('connection', [])]
+        if 'chunked' in ','.join(headers.get('transfer-encoding', [])).lower():
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if not size:
+                    while (await self.reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    break
+                chunks.append(await self.reader.readexactly(size + 2))
+            body = b''.join(chunk[:-2] for chunk in chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length'][0]))
+        else:
+            body, keep_alive = await self.reader.read(), False
+        return Response(status, headers, body), keep_alive
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+# --- Scenario ---
+
+class Scenario:
+    """The weighted mix of actions a virtual user picks from, and the shared admin session."""
+
+    def __init__(self, url, slug, mix, admin):
+        self.url, self.admin, self.cookies = url, admin, {}
+        self.targets = []
+        prefix = f"/t/{slug}"
+        api = f"/api/v1/tournaments/{slug}"
+        hx = {'HX-Request': 'true'}
+        self.actions = {
+            'read': [
+                ('page:home', f"{prefix}/", {}),
+                ('page:standings', f"{prefix}/points-table/", {}),
+                ('page:bracket', f"{prefix}/bracket/", {}),
+                ('page:top_scorers', f"{prefix}/top-scorers/", {}),
+                ('page:upcoming', f"{prefix}/upcoming/", {}),
+                ('api:standings', f"{api}/standings/", {}),
+                ('api:upcoming', f"{api}/matches/upcoming/", {}),
+            ],
+            # What the pages' HTMX polling asks for
+            'fragment': [
+                ('fragment:standings', f"{prefix}/points-table/", hx),
+                ('fragment:bracket', f"{prefix}/bracket/", hx),
+                ('fragment:top_scorers', f"{prefix}/top-scorers/", hx),
+                ('fragment:upcoming', f"{prefix}/upcoming/", hx),
+            ],
+            'admin': [
+                ('admin:match_list', f"{prefix}/custom-admin/matches/", {}),
+                ('admin:match_rows', f"{prefix}/custom-admin/matches/?status=UPCOMING", hx),
+                ('admin:matchday', f"{prefix}/custom-admin/matchday/", {}),
+            ],
+        }
+        self.edit_path = f"{prefix}/custom-admin/matches/{{pk}}/edit/"
+        self.api = api
+        self.weights = {category: weight for category, weight in mix.items() if weight > 0}
+        if not admin:
+            self.weights.pop('admin', None)
+            self.weights.pop('write', None)
+
+    async def login(self):
+        # Through the admin login form, once; all virtual users share the session
+        connection = Connection(self.url)
+        try:
+            response = await connection.request('GET', '/admin/login/')
+            self.cookies.update(response.cookies())
+            username, password = self.admin
+            body = urlencode({
+                'username': username, 'password': password,
+                'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''), 'next': '/admin/',
+            }).encode()
+            response = await connection.request('POST', '/admin/login/', self.admin_headers(form=True), body)
+            self.cookies.update(response.cookies())
+        finally:
+            connection.close()
+        if response.status != 302 or 'sessionid' not in self.cookies:
+            raise RuntimeError(f"admin login failed ({response.status}); check --admin")
+
+    async def load_targets(self):
+        # Matches to enter results for, from the API (upcoming first, then corrections)
+        connection = Connection(self.url)
+        try:
+            for kind in ('upcoming', 'finished'):
+                response = await connection.request('GET', f"{self.api}/matches/{kind}/?page_size=100")
+                if response.status == 200:
+                    self.targets += json.loads(response.body)['results']
+        finally:
+            connection.close()
+        if not self.targets:
+            self.weights.pop('write', None)
+
+    def admin_headers(self, form=False):
+        headers = {'Cookie': '; '.join(f"{name}={value}" for name, value in self.cookies.items())}
+        if 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+            headers['Referer'] = self.url + '/'
+        if form:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        return headers
+
+    def pick(self, rng):
+        """(name, method, path, headers, body) of the next request."""
+        category = rng.choices(list(self.weights), list(self.weights.values()))[0]
+        if category == 'write':
+            return self.result_entry(rng)
+        name, path, headers = rng.choice(self.actions[category])
+        if category == 'admin':
+            headers = {**headers, **self.admin_headers()}
+        return name, 'GET', path, headers, b''
+
+    def result_entry(self, rng):
+        # What the custom admin's edit form posts when a score is entered
+        match = rng.choice(self.targets)
+        kickoff = ''
+        if match['match_datetime']:
+            value = datetime.fromisoformat(match['match_datetime'].replace('Z', '+00:00'))
+            kickoff = value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M')
+        body = urlencode({
+            'home_team': match['home_team']['id'],
+            'away_team': match['away_team']['id'],
+            'leg': match['leg'],
+            'match_datetime': kickoff,
+            'home_goals': rng.randint(0, 4),
+            'away_goals': rng.randint(0, 4),
+            'status': 'FINISHED',
+        }).encode()
+        return 'admin:save_result', 'POST', self.edit_path.format(pk=match['id']), self.admin_headers(form=True), body
+
+
+# --- Load generation ---
+
+async def virtual_user(scenario, seed, deadline, think, results):
+    rng = random.Random(seed)
+    connection = Connection(scenario.url)
+    try:
+        while time.monotonic() < deadline:
+            name, method, path, headers, body = scenario.pick(rng)
+            started = time.perf_counter()
+            try:
+                response = await connection.request(method, path, headers, body)
+                ok = response.status == 200 or (method == 'POST' and response.status == 302)
+                outcome = None if ok else response.status
+            except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError, IndexError) as exc:
+                outcome = type(exc).__name__
+            if results is not None:
+                if outcome is None:
+                    results[name]['latencies'].append(time.perf_counter() - started)
+                else:
+                    results[name]['errors'][outcome] += 1
+            if think:
+                await asyncio.sleep(rng.expovariate(1 / think))
+    finally:
+        connection.close()
+
+async def run(scenario, users, duration, warmup, think, seed):
+    if scenario.admin:
+        await scenario.login()
+        await scenario.load_targets()
+    if warmup:
+        deadline = time.monotonic() + warmup
+        await asyncio.gather(*(virtual_user(scenario, seed + i, deadline, think, None) for i in range(users)))
+    results = defaultdict(lambda: {'latencies': [], 'errors': Counter()})
+    started = time.monotonic()
+    await asyncio.gather(*(
+        virtual_user(scenario, seed + users + i, started + duration, think, results) for i in range(users)
+    ))
+    return results, time.monotonic() - started
+
+
+# --- Report ---
+
+def percentile(values, p):
+    # Nearest rank on sorted values
+    return values[max(math.ceil(len(values) * p) - 1, 0)] * 1000 if values else float('nan')
+
+def summarize(results, elapsed):
+    rows = {}
+    for name in sorted(results):
+        latencies = sorted(results[name]['latencies'])
+        errors = results[name]['errors']
+        rows[name] = {
+            'requests': len(latencies),
+            'errors': sum(errors.values()),
+            'error_kinds': {str(kind): count for kind, count in errors.items()},
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] * 1000 if latencies else float('nan'),
+        }
+    every = sorted(latency for result in results.values() for latency in result['latencies'])
+    rows['TOTAL'] = {
+        'requests': len(every),
+        'errors': sum(row['errors'] for row in rows.values()),
+        'error_kinds': {},
+        'rps': len(every) / elapsed,
+        'p50': percentile(every, 0.50),
+        'p95': percentile(every, 0.95),
+        'p99': percentile(every, 0.99),
+        'max': every[-1] * 1000 if every else float('nan'),
+    }
+    return rows
+
+def print_report(rows):
+    print()
+    print(f"{'endpoint':<24}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, row in rows.items():
+        print(
+            f"{name:<24}{row['requests']:>10}{row['errors']:>8}{row['rps']:>9.1f}"
+            f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}{row['max']:>9.1f}"
+        )
+    for name, row in rows.items():
+        if row['error_kinds']:
+            kinds = ', '.join(f"{kind} x{count}" for kind, count in row['error_kinds'].items())
+            print(f"  {name} errors: {kinds}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        category, _, weight = part.partition('=')
+        if category not in ('read', 'fragment', 'admin', 'write'):
+            raise argparse.ArgumentTypeError(f"unknown action category {category!r}")
+        mix[category] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the deployment with a realistic request mix.")
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi', help="gunicorn (wsgi) or uvicorn (asgi)")
+    parser.add_argument('--workers', type=int, default=2, help="Server worker processes")
+    parser.add_argument('--worker-class', default='sync', help="gunicorn worker class (sync, gthread, ...)")
+    parser.add_argument('--threads', type=int, default=0, help="Threads per gunicorn worker (gthread)")
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help="Setting for the server, e.g. CACHE_URL=...")
+    parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds measured")
+    parser.add_argument('--warmup', type=float, default=5, help="Seconds of unmeasured load first")
+    parser.add_argument('--think-ms', type=float, default=0, help="Mean pause between a user's requests")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Action weights (default {DEFAULT_MIX})")
+    parser.add_argument('--teams', type=int, default=1000, help="Size of the generated tournament")
+    parser.add_argument('--matches-per-team', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--database-url',
+        default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'kaalapani-loadtest.sqlite3')}",
+        help="Database of the generated dataset (default a SQLite file in the temp directory)",
+    )
+    parser.add_argument('--url', help="Load test a running deployment instead of starting one")
+    parser.add_argument('--slug', help="Tournament to load test with --url")
+    parser.add_argument('--admin', metavar='USER:PASSWORD', help="Staff login for the admin actions with --url")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        if not args.slug:
+            parser.error("--url needs --slug")
+        url, slug = args.url.rstrip('/'), args.slug
+        admin = tuple(args.admin.split(':', 1)) if args.admin else None
+    else:
+        slug = prepare_dataset(args.database_url, args.teams, args.seed, args.matches_per_team)
+        env = dict(os.environ, DATABASE_URL=args.database_url, DEBUG='false')
+        env.update(item.split('=', 1) for item in args.env)
+        process, url = start_server(args, env)
+        admin = (ADMIN_USERNAME, ADMIN_PASSWORD)
+
+    scenario = Scenario(url, slug, args.mix, admin)
+    try:
+        print(f"{args.users} users for {args.duration:g}s against {url} ({slug}), mix {scenario.weights}", flush=True)
+        results, elapsed = asyncio.run(run(scenario, args.users, args.duration, args.warmup, args.think_ms / 1000, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    rows = summarize(results, elapsed)
+    print_report(rows)
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ('admin', 'json')}
+        with open(args.json, 'w') as handle:
+            json.dump({'config': config, 'elapsed': elapsed, 'endpoints': rows}, handle, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tournament_project.settings")
+# Public views use the async ORM under ASGI (set ASYNC_VIEWS=false to serve the sync ones)
+os.environ.setdefault("ASYNC_VIEWS", "true")
 
 application = get_asgi_application()
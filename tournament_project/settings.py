@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 import environ
 from pathlib import Path
 
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the other middleware (see core.metrics)
+    "core.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -61,7 +64,8 @@ ROOT_URLCONF = "tournament_project.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates, also timing renders for the request metrics
+        "BACKEND": "core.metrics.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / 'templates'],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -86,6 +90,81 @@ DATABASES = {
 }
 
 
+# Cache
+# Public pages are cached per tournament revision, so any backend works without
+# explicit invalidation: locmemcache://, filecache:///path, dbcache://table_name, redis://...
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": env.cache('CACHE_URL', default='locmemcache://')
+}
+
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=60 * 60)
+# How long one request may hold the right to render a new page revision before others retry
+PAGE_RENDER_LOCK_TIMEOUT = env.int('PAGE_RENDER_LOCK_TIMEOUT', default=10)
+
+# Changes on every deploy so cached pages and ETags from old templates are never reused
+PAGE_CACHE_SALT = env('RENDER_GIT_COMMIT', default='dev')[:12]
+
+
+# Standings/top-scorer rebuilds after admin edits: inline by default, or queued
+# for `manage.py recompute_worker` so admin saves return immediately.
+RECOMPUTE_ASYNC = env.bool('RECOMPUTE_ASYNC', default=False)
+
+
+# Number of entries shown on the top scorers leaderboard
+TOP_SCORERS_LIMIT = env.int('TOP_SCORERS_LIMIT', default=50)
+
+# Days of fixtures on one page of /upcoming/ (?days= overrides it)
+UPCOMING_WINDOW_DAYS = env.int('UPCOMING_WINDOW_DAYS', default=14)
+# How far back the .ics calendar feed keeps finished matches
+CALENDAR_LOOKBACK_DAYS = env.int('CALENDAR_LOOKBACK_DAYS', default=30)
+
+# Seconds a web process trusts its cached slug -> tournament directory
+# (core.utils) before re-reading it; writes in the same process clear it at once.
+TOURNAMENT_CACHE_TTL = env.int('TOURNAMENT_CACHE_TTL', default=60)
+
+
+# Serve the public pages and the API from their async ORM variants (core.urls).
+# On by default under ASGI (tournament_project/asgi.py); WSGI keeps the sync views.
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+
+# Live score feed (/live/, see core.live). Each web process polls the LiveEvent
+# table once per interval and fans the events out to its connected clients.
+LIVE_POLL_INTERVAL = env.float('LIVE_POLL_INTERVAL', default=1.0)
+# Comment sent to idle clients so proxies don't close the connection
+LIVE_HEARTBEAT_INTERVAL = env.int('LIVE_HEARTBEAT_INTERVAL', default=15)
+# Events buffered per client; a client that falls further behind is told to refresh
+LIVE_QUEUE_SIZE = env.int('LIVE_QUEUE_SIZE', default=100)
+# Seconds a change's transaction may take to commit: ids are allocated before
+# commit, so the feed re-reads events this recent in case one landed out of order
+LIVE_COMMIT_LAG = env.float('LIVE_COMMIT_LAG', default=10.0)
+# Hours of events kept for clients reconnecting with Last-Event-ID
+LIVE_EVENT_RETENTION = env.int('LIVE_EVENT_RETENTION', default=6)
+
+
+# Request metrics (core.metrics): per-view latency, SQL and template time as
+# Prometheus histograms at /metrics, and a Server-Timing header on sampled requests.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+# Share of requests whose SQL and template time is measured (latency is always recorded)
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', default=1.0)
+METRICS_SERVER_TIMING = env.bool('METRICS_SERVER_TIMING', default=True)
+# Where each worker process leaves its snapshot for /metrics to add up (empty: this process only)
+METRICS_DIR = env('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'kaalapani-metrics'))
+METRICS_FLUSH_INTERVAL = env.float('METRICS_FLUSH_INTERVAL', default=5.0)
+# Bearer token for scrapers; without one /metrics is only shown to staff users
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+
+# Opt-in cProfile captures (core.profiling) of the hot views and of standings
+# rebuilds: on request by staff (X-Profile: 1 or ?profile=1) or for a random share of calls.
+PROFILE_SAMPLE_RATE = env.float('PROFILE_SAMPLE_RATE', default=0.0)
+PROFILE_DIR = env('PROFILE_DIR', default=os.path.join(tempfile.gettempdir(), 'kaalapani-profiles'))
+# Captures kept on disk; older ones are deleted as new ones come in
+PROFILE_KEEP = env.int('PROFILE_KEEP', default=50)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -6,50 +6,37 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tournament_project.settings")
 django.setup()
 
 from core.models import Team, Match, TopScorer, Tournament
+from core.resolver import TeamResolver
 
-def normalize_name(name):
-    """Normalize name for case-insensitive comparison."""
-    return name.strip().lower()
+# Nicknames used in the result sheet for specific cases mentioned by user
+ALIASES = {
+    "musthafa": "Mohammed Musthafa V",
+    "fayas": "MOHEMMAD FAYAS A A",
+    "safvan": "Saffvan",
+    "jisnnu": "Jishnu S S",
+    "mohammed riyan": "Mohamed Riyan",
+    "jigmat": "Jigmat Nurboo",
+}
 
-def get_canonical_team(name, all_teams):
+def build_resolver(tournament):
+    """Index the tournament's teams (plus the sheet's nicknames) once for all lookups."""
+    resolver = TeamResolver.for_tournament(tournament)
+    for alias, target_name in ALIASES.items():
+        team_id = resolver.resolve_id(target_name)
+        if team_id:
+            resolver.add_alias(alias, team_id)
+    return resolver
+
+def get_canonical_team(name, resolver, teams_by_id):
     """Find the canonical team object from the DB."""
-    norm_name = normalize_name(name)
-    
-    # Direct mapping for specific cases mentioned by user
-    mapping = {
-        "vasco": "Vasco",
-        "musthafa": "Mohammed Musthafa V",
-        "fayas": "MOHEMMAD FAYAS A A",
-        "safvan": "Saffvan",
-        "jisnnu": "Jishnu S S",
-        "mohammed riyan": "Mohamed Riyan",
-        "jigmat": "Jigmat Nurboo",
-        "hassan": "Hassan", # Assuming direct match
-        "ashwajith": "Ashwajith",
-        "abin": "Abin",
-        "hisham": "Hisham",
-        "saad": "Saad",
-        "vishnu": "Vishnu",
-        "irshad": "Irshad",
-    }
-    
-    # Check manual mapping first
-    if norm_name in mapping:
-        target_name = mapping[norm_name]
-        for team in all_teams:
-            if team.name == target_name:
-                return team
-                
-    # Fuzzy/Direct search in all teams
-    for team in all_teams:
-        if normalize_name(team.name) == norm_name:
-            return team
-        # Check if input is a substring of canonical name (e.g. "Musthafa" in "Mohammed Musthafa V")
-        if norm_name in normalize_name(team.name):
-            return team
-            
-    print(f"WARNING: Could not find team for '{name}'")
-    return None
+    resolution = resolver.resolve(name)
+    if resolution.status == 'ambiguous':
+        print(f"WARNING: '{name}' is ambiguous: {[key for _, key, _ in resolution.candidates]}")
+        return None
+    if not resolution:
+        print(f"WARNING: Could not find team for '{name}'")
+        return None
+    return teams_by_id[resolution.team_id]
 
 def update_results():
     tournament = Tournament.objects.first()
@@ -58,6 +45,8 @@ def update_results():
         return
 
     all_teams = list(Team.objects.filter(tournament=tournament))
+    teams_by_id = {team.id: team for team in all_teams}
+    resolver = build_resolver(tournament)
     
     # Match Data from User
     # Format: (Home, Away, Leg, HomeGoals, AwayGoals)
@@ -77,8 +66,8 @@ def update_results():
 
     print("Processing matches...")
     for home_name, away_name, leg, home_goals, away_goals in matches_data:
-        home_team = get_canonical_team(home_name, all_teams)
-        away_team = get_canonical_team(away_name, all_teams)
+        home_team = get_canonical_team(home_name, resolver, teams_by_id)
+        away_team = get_canonical_team(away_name, resolver, teams_by_id)
         
         if not home_team or not away_team:
             continue